@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from bobATC_codec import *
+
+# Timestamped captures of the traffic between a host and bobATC, and replay
+# of a capture against the board or the Python model. The cocotb testbench
+# replays captures in replay_test.
+#
+# A capture is a 16 byte header followed by one 10 byte record for every
+# byte on the wire, in the order the host saw them:
+#
+# | magic "BOBATCAP" | version u16 | reserved u16 | baud rate u32 |
+# | monotonic time in ns i64 | direction u8 | byte u8 |
+#
+# All fields are little endian. Records are fixed size so a capture can be
+# memory mapped straight into a NumPy array.
+
+MAGIC = b"BOBATCAP"
+VERSION = 1
+
+TX = 0 # Host to bobATC
+RX = 1 # bobATC to host
+
+HEADER = struct.Struct("<8sHHI")
+RECORD = struct.Struct("<qBB")
+RECORD_DTYPE = np.dtype([("time", "<i8"), ("direction", "u1"), ("byte", "u1")])
+
+class CaptureWriter:
+  def __init__(self, filename, baudrate=BAUD_RATE):
+    self.file = open(filename, "wb")
+    self.file.write(HEADER.pack(MAGIC, VERSION, 0, baudrate))
+
+  def write(self, direction, data, timestamp=None):
+    if timestamp is None:
+      timestamp = time.monotonic_ns()
+    self.file.write(b"".join(RECORD.pack(timestamp, direction, byte) for byte in data))
+
+  def sent(self, data):
+    self.write(TX, data)
+
+  def received(self, data):
+    self.write(RX, data)
+
+  def close(self):
+    self.file.close()
+
+# Returns (baud rate, records), records is a read-only memory map
+def open_capture(filename):
+  with open(filename, "rb") as fh:
+    magic, version, reserved, baudrate = HEADER.unpack(fh.read(HEADER.size))
+  if magic != MAGIC or version != VERSION:
+    raise ValueError(f"{filename} is not a version {VERSION} bobATC capture")
+  if os.path.getsize(filename) == HEADER.size:
+    return baudrate, np.zeros(0, dtype=RECORD_DTYPE)
+  return baudrate, np.memmap(filename, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size)
+
+def is_capture(filename):
+  with open(filename, "rb") as fh:
+    return fh.read(len(MAGIC)) == MAGIC
+
+def split(records):
+  return records[records["direction"] == TX], records[records["direction"] == RX]
+
+# Index of the first byte where two reply streams differ, None if equal
+def first_difference(expected, got):
+  length = min(len(expected), len(got))
+  differ = np.flatnonzero(np.frombuffer(expected, np.uint8)[:length] != np.frombuffer(got, np.uint8)[:length])
+  if len(differ):
+    return int(differ[0])
+  return None if len(expected) == len(got) else length
+
+def replay_model(records):
+  from bobATC_model import BobModel
+
+  model = BobModel()
+  replies = bytearray()
+  for packet in split(records)[0]["byte"].tolist():
+    replies += bytes(model.request(packet))
+  return bytes(replies)
+
+# Sends the recorded requests with their original spacing divided by speed,
+# or back to back with speed 0, and returns every reply that arrives until
+# the line has been quiet for idle seconds.
+async def replay_board(client, records, speed, idle):
+  requests = split(records)[0]
+  start = time.monotonic_ns()
+  first = int(requests["time"][0]) if len(requests) else 0
+  for timestamp, packet in zip(requests["time"].tolist(), requests["byte"].tolist()):
+    if speed > 0:
+      delay = (start + (timestamp - first) / speed - time.monotonic_ns()) / 1e9
+      if delay > 0:
+        await asyncio.sleep(delay)
+    client.send_nowait(packet)
+
+  replies = bytearray()
+  while True:
+    try:
+      replies.append(await asyncio.wait_for(client.replies.get(), idle))
+    except asyncio.TimeoutError:
+      return bytes(replies)
+
+def compare(expected, got):
+  index = first_difference(expected, got)
+  if index is None:
+    print(f"All {len(got)} replies match the capture")
+    return 0
+  print(f"Replies differ from the capture at reply {index} of {len(expected)}")
+  for i in range(max(0, index - 2), min(max(len(expected), len(got)), index + 3)):
+    want = f"{expected[i]:#04x}" if i < len(expected) else "----"
+    have = f"{got[i]:#04x}" if i < len(got) else "----"
+    print(f"{'>' if i == index else ' '} {i:>8}  capture {want}  replay {have}")
+  return 1
+
+def info(baudrate, records):
+  requests, replies = split(records)
+  duration = (records["time"][-1] - records["time"][0]) / 1e9 if len(records) else 0
+  print(f"{len(requests)} requests and {len(replies)} replies over {duration:.3f} s at {baudrate} baud")
+
+async def replay_to_board(args, records):
+  from bobATC_helper import BobClient
+
+  async with BobClient(args.port, args.baudrate, verbose=False, capture=args.capture) as client:
+    return await replay_board(client, records, args.speed, args.idle)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Inspect or replay a bobATC capture")
+
+  parser.add_argument('capture_file', help="capture recorded with bobATC_helper.py --capture")
+  parser.add_argument('--target', help="where to replay the requests", choices=["info", "model", "board"], default="info")
+  parser.add_argument('--port', help="serial port bobATC is on, for --target board")
+  parser.add_argument('--baudrate', help="UART baud rate, defaults to the one in the capture", type=int)
+  parser.add_argument('--speed', help="divide the recorded gaps by this, 0 sends back to back", type=float, default=1.0)
+  parser.add_argument('--idle', help="seconds of silence that end a board replay", type=float, default=1.0)
+  parser.add_argument('--capture', help="record the board replay to this file")
+
+  args = parser.parse_args()
+  baudrate, records = open_capture(args.capture_file)
+  recorded = split(records)[1]["byte"].tobytes()
+
+  if args.target == "info":
+    info(baudrate, records)
+    sys.exit(0)
+  elif args.target == "model":
+    sys.exit(compare(recorded, replay_model(records)))
+
+  if args.baudrate is None:
+    args.baudrate = baudrate
+  if args.port is None:
+    from bobATC_helper import PORT
+    args.port = PORT
+  sys.exit(compare(recorded, asyncio.run(replay_to_board(args, records))))
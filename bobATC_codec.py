@@ -0,0 +1,184 @@
+from collections import namedtuple
+
+# bobATC packet format, shared by bobATC_helper.py, the Python model and the
+# testbench. Every one of the 256 possible bytes is decoded once at import,
+# so decoding or logging a packet is a single table lookup.
+#
+# | Aircraft ID | Message Type | Action |
+# | 4 bits      | 3 bits       | 1 bit  |
+#
+# sent as 8N1 UART frames, so one packet takes 10 bit times on the wire.
+
+BAUD_RATE    = 115200
+FRAME_BITS   = 10
+
+T_REQUEST    = 0b000
+T_DECLARE    = 0b001
+T_EMERGENCY  = 0b010
+T_CLEAR      = 0b011
+T_HOLD       = 0b100
+T_SAY_AGAIN  = 0b101
+T_DIVERT     = 0b110
+T_ID_PLEASE  = 0b111
+
+C_RUNWAY_0   = 0b0 # Cleared
+C_RUNWAY_1   = 0b1
+
+R_TAKEOFF    = 0b0 # Request
+R_LANDING    = 0b1
+
+D_RUNWAY_0  = 0b0 # Declare
+D_RUNWAY_1  = 0b1
+
+E_DECLARE    = 0b1
+E_RESOLVE    = 0b0
+
+I_VALID      = 0b0 # ID reply
+I_FULL       = 0b1
+
+# Only Bob sends SAY_AGAIN, the host sends it with action 1 as a status query
+S_STATUS     = 0b1
+
+# Performance counters a status query names by its ID. Bob answers with a
+# SAY_AGAIN header with the action bit set, then the 16 bit counter in
+# status_packets packets of status_bits each, most significant first. The
+# event counters wrap, the high-water marks are two 8 bit counts packed
+# into one, {request FIFO, reply FIFO} and {takeoff queue, landing queue}.
+STAT_REQUESTS       = 0
+STAT_HOLDS          = 1
+STAT_DIVERTS        = 2
+STAT_SAY_AGAINS     = 3
+STAT_FRAMING_ERRORS = 4
+STAT_REQUEST_DROPS  = 5
+STAT_FIFO_HIGH      = 6
+STAT_QUEUE_HIGH     = 7
+
+STAT_NAMES = ("requests", "holds", "diverts", "say_agains", "framing_errors", "request_drops", "fifo_high",
+              "queue_high")
+STATUS_WIDTH = 16
+
+TYPE_NAMES = ("REQUEST", "DECLARE", "EMERGENCY", "CLEAR", "HOLD", "SAY_AGAIN", "DIVERT", "ID_PLEASE")
+
+Packet = namedtuple("Packet", "byte id type action")
+
+def encode(id, type, action):
+  return (id << 4) | (type << 1) | action
+
+def request_text(packet):
+  plane = "{:02d}".format(packet.id)
+  if packet.type == T_SAY_AGAIN and packet.action == S_STATUS:
+    return "Operator", f"Requesting status counter {packet.id}"
+  elif packet.type == T_ID_PLEASE:
+    return "New Plane", "Requesting ID for entry"
+  elif packet.type == T_REQUEST:
+    return f"Plane {plane}", "Requesting landing" if packet.action == R_LANDING else "Requesting takeoff"
+  elif packet.type == T_DECLARE:
+    return f"Plane {plane}", f"Declaring takeoff/landing runway {packet.action}"
+  elif packet.type == T_EMERGENCY:
+    return f"Plane {plane}", "Declaring emergency" if packet.action == E_DECLARE else "Resolving emergency"
+  return f"Plane {plane}", "Making invalid request"
+
+# None for message types Bob never sends
+def reply_text(packet):
+  plane = "{:02d}".format(packet.id)
+  if packet.type == T_CLEAR:
+    return f"Plane {plane} cleared runway {packet.action}"
+  elif packet.type == T_HOLD:
+    return f"Plane {plane} hold"
+  elif packet.type == T_ID_PLEASE:
+    return "My airspace is full" if packet.action == I_FULL else f"ID {packet.id} is available"
+  elif packet.type == T_DIVERT:
+    return f"Plane {plane} divert due to congestion or emergency"
+  elif packet.type == T_SAY_AGAIN and packet.action == 1:
+    return f"Status counter {packet.id} follows"
+  elif packet.type == T_SAY_AGAIN:
+    return f"Plane {plane} say again"
+  return None
+
+PACKETS = tuple(Packet(byte, byte >> 4, (byte >> 1) & 0b111, byte & 0b1) for byte in range(256))
+REQUEST_TEXT = tuple(request_text(packet) for packet in PACKETS)
+REPLY_TEXT = tuple(reply_text(packet) for packet in PACKETS)
+
+def decode(byte):
+  return PACKETS[byte]
+
+def decode_bytes(data):
+  return [PACKETS[byte] for byte in data]
+
+# Log lines for every byte with the speaker padded to width, e.g.
+# "Plane 03     : Requesting takeoff" for width 13
+def request_log(width):
+  return tuple(f"{speaker:<{width}}: {text}" for speaker, text in REQUEST_TEXT)
+
+def reply_log(width, speaker="Bob"):
+  return tuple(None if text is None else f"{speaker:<{width}}: {text}" for text in REPLY_TEXT)
+
+# Packet format of a Bob built with other ID_WIDTH and RUNWAYS parameters.
+#
+# | Aircraft ID | Message Type | Action       |
+# | id_width    | 3 bits       | action_width |
+#
+# where the action is clog2(runways) bits, at least 1, so that it can name
+# any runway. It is sent as as many bytes as it takes, most significant byte
+# first. The default format keeps the table lookup above.
+class PacketFormat:
+  def __init__(self, id_width=4, runways=2):
+    self.id_width = id_width
+    self.runways = runways
+    self.action_width = max(1, (runways - 1).bit_length())
+    self.width = id_width + 3 + self.action_width
+    self.bytes = (self.width + 7) // 8
+    self.ids = 1 << id_width
+    self.mask = (1 << self.width) - 1
+    self.status_bits = min(8, self.width)
+    self.status_packets = -(-STATUS_WIDTH // self.status_bits)
+
+  def __str__(self):
+    return f"{self.id_width} bit IDs, {self.runways} runways, {self.bytes} byte packets"
+
+  @property
+  def default(self):
+    return self.id_width == 4 and self.action_width == 1
+
+  def encode(self, id, type, action):
+    return (id << (self.action_width + 3)) | (type << self.action_width) | action
+
+  def decode(self, word):
+    if self.default:
+      return PACKETS[word]
+    return Packet(word, word >> (self.action_width + 3), (word >> self.action_width) & 0b111,
+                  word & ((1 << self.action_width) - 1))
+
+  def status_query(self, counter):
+    return self.encode(counter, T_SAY_AGAIN, S_STATUS)
+
+  def is_status_header(self, word):
+    packet = self.decode(word)
+    return packet.type == T_SAY_AGAIN and packet.action == 1
+
+  # Counter value from the status_packets packets after a header
+  def status_value(self, words):
+    value = 0
+    for word in words:
+      value = (value << self.status_bits) | (word & ((1 << self.status_bits) - 1))
+    return value >> (self.status_packets * self.status_bits - STATUS_WIDTH)
+
+  def to_bytes(self, word):
+    return (word & self.mask).to_bytes(self.bytes, "big")
+
+  # Splits a byte stream into packets, a trailing partial packet is dropped
+  def from_bytes(self, data):
+    return [int.from_bytes(data[i:i + self.bytes], "big")
+            for i in range(0, len(data) - self.bytes + 1, self.bytes)]
+
+DEFAULT_FORMAT = PacketFormat()
+
+# Named fields of the eight counters, in STAT_ order, with the packed
+# high-water marks split apart
+def status_fields(counters):
+  fields = dict(zip(STAT_NAMES[:STAT_FIFO_HIGH], counters))
+  fields["request_fifo_high"] = counters[STAT_FIFO_HIGH] >> 8
+  fields["reply_fifo_high"] = counters[STAT_FIFO_HIGH] & 0xff
+  fields["takeoff_queue_high"] = counters[STAT_QUEUE_HIGH] >> 8
+  fields["landing_queue_high"] = counters[STAT_QUEUE_HIGH] & 0xff
+  return fields
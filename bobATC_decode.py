@@ -0,0 +1,203 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from bobATC_codec import *
+from bobATC_capture import is_capture, open_capture, split
+
+# Offline analysis of serial captures from bobATC. decode() splits a whole
+# capture into a structured array in a few NumPy operations and the
+# statistics below work on that array without a Python loop per byte, so
+# captures of many megabytes decode in milliseconds. The statistics expect
+# the bytes Bob sent, i.e. a capture of its TX line. Packets wider than a
+# byte are assembled most significant byte first, packet_format is the
+# PacketFormat of the design that was captured.
+#
+# A status query (bobATC_helper.py --stats) is answered with a SAY_AGAIN
+# header with the action bit set and then status_packets counter words,
+# which would read as arbitrary replies. decode() marks all of them in the
+# status field, the statistics leave them out and status_replies() reads
+# the counters back.
+
+PACKET_DTYPE = np.dtype([
+  ("time",   np.int64), # ns since the start of the capture
+  ("id",     np.uint16),
+  ("type",   np.uint8),
+  ("action", np.uint8),
+  ("status", np.bool_), # Header or counter word of a status reply
+])
+
+def load(filename):
+  return np.fromfile(filename, dtype=np.uint8)
+
+# The replies in a capture from bobATC_helper.py --capture, with the time
+# each one was received. The status queries in the request log pick out the
+# status replies.
+def decode_capture(filename, packet_format=DEFAULT_FORMAT):
+  baudrate, records = open_capture(filename)
+  requests, replies = split(records)
+  if not len(replies):
+    return decode(b"", packet_format=packet_format)
+  start = replies["time"][0]
+  sent = decode(np.ascontiguousarray(requests["byte"]), requests["time"] - start, packet_format=packet_format,
+                queries=())
+  queries = sent["time"][(sent["type"] == T_SAY_AGAIN) & (sent["action"] == S_STATUS)]
+  return decode(np.ascontiguousarray(replies["byte"]), replies["time"] - start, packet_format=packet_format,
+                queries=queries)
+
+# data is anything with the buffer protocol: bytes, a bytearray, an mmap or
+# a uint8 array. Raw byte captures carry no timing, so without times the
+# bytes are assumed to have arrived back to back at baudrate. A packet takes
+# the time of its first byte, a trailing partial packet is dropped.
+# queries are the times of the status queries sent, when known.
+def decode(data, times=None, baudrate=BAUD_RATE, packet_format=DEFAULT_FORMAT, queries=None):
+  size = packet_format.bytes
+  raw = np.frombuffer(data, dtype=np.uint8)
+  count = len(raw) // size
+  words = np.zeros(count, dtype=np.uint32)
+  for byte in range(size):
+    words = (words << 8) | raw[byte:count * size:size]
+  packets = np.empty(count, dtype=PACKET_DTYPE)
+  if times is None:
+    packets["time"] = np.arange(count, dtype=np.int64) * (size * FRAME_BITS * 10**9 // baudrate)
+  else:
+    packets["time"] = times[:count * size:size]
+  action_width = packet_format.action_width
+  packets["id"] = words >> (action_width + 3)
+  packets["type"] = (words >> action_width) & 0b111
+  packets["action"] = words & ((1 << action_width) - 1)
+  packets["status"] = status_mask(packets, packet_format, queries)
+  return packets
+
+# Without the query times every status header starts a status reply. Bob
+# answers other requests with SAY_AGAIN action 0, so only a counter word can
+# look like a header, and those are skipped over. With them each query takes
+# the first header after it that is not part of an earlier status reply.
+# Status replies are rare, so the loop runs once per reply rather than once
+# per packet.
+def status_mask(packets, packet_format, queries=None):
+  mask = np.zeros(len(packets), dtype=bool)
+  headers = np.flatnonzero((packets["type"] == T_SAY_AGAIN) & (packets["action"] == 1))
+  if queries is None:
+    firsts = range(len(headers))
+  else:
+    firsts = np.searchsorted(packets["time"][headers], queries)
+  end = 0
+  for first in firsts:
+    index = max(first, np.searchsorted(headers, end))
+    if index == len(headers):
+      break
+    header = headers[index]
+    end = header + 1 + packet_format.status_packets
+    mask[header:end] = True
+  return mask
+
+# (time, counter, value) for each complete status reply
+def status_replies(packets, packet_format=DEFAULT_FORMAT):
+  action_width = packet_format.action_width
+  words = ((packets["id"].astype(np.uint32) << (action_width + 3)) | (packets["type"] << action_width)
+           | packets["action"])
+  headers = np.flatnonzero(packets["status"] & (packets["type"] == T_SAY_AGAIN) & (packets["action"] == 1))
+  replies = []
+  end = 0
+  for header in headers:
+    if header < end:
+      continue
+    end = header + 1 + packet_format.status_packets
+    body = words[header + 1:end]
+    if len(body) == packet_format.status_packets:
+      replies.append((int(packets["time"][header]), int(packets["id"][header]),
+                      packet_format.status_value(int(word) for word in body)))
+  return replies
+
+def type_histogram(packets):
+  return np.bincount(packets["type"], minlength=8)
+
+# Hold, clear and divert replies grouped by plane and in time order within
+# each plane. The sort is stable so equal IDs keep their capture order.
+def plane_replies(packets):
+  replies = packets[np.isin(packets["type"], (T_HOLD, T_CLEAR, T_DIVERT))]
+  return replies[np.argsort(replies["id"], kind="stable")]
+
+# Returns (ids, waits) with one entry per hold that was followed by a
+# clearance for the same plane, waits in ns. A hold followed by a divert
+# (an emergency) is not counted.
+def hold_to_clear(packets):
+  replies = plane_replies(packets)
+  same_plane = replies["id"][1:] == replies["id"][:-1]
+  cleared = same_plane & (replies["type"][:-1] == T_HOLD) & (replies["type"][1:] == T_CLEAR)
+  waits = replies["time"][1:][cleared] - replies["time"][:-1][cleared]
+  return replies["id"][1:][cleared], waits
+
+# A divert right after a hold for the same plane sends a queued landing away
+# during an emergency, any other divert refuses a request outright.
+def divert_counts(packets):
+  replies = plane_replies(packets)
+  diverts = replies["type"] == T_DIVERT
+  after_hold = np.zeros(len(replies), dtype=bool)
+  after_hold[1:] = (replies["id"][1:] == replies["id"][:-1]) & (replies["type"][:-1] == T_HOLD)
+  emergency = int(np.count_nonzero(diverts & after_hold))
+  return int(np.count_nonzero(diverts)) - emergency, emergency
+
+def per_plane(ids, waits, planes=DEFAULT_FORMAT.ids):
+  counts = np.bincount(ids, minlength=planes)
+  totals = np.bincount(ids, weights=waits, minlength=planes)
+  longest = np.zeros(planes, dtype=np.int64)
+  np.maximum.at(longest, ids, waits)
+  means = np.divide(totals, counts, out=np.zeros(planes), where=counts > 0)
+  return counts, means, longest
+
+def summary(packets, packet_format=DEFAULT_FORMAT):
+  status = status_replies(packets, packet_format)
+  duration = packets['time'][-1] / 1e9 if len(packets) else 0
+  packets = packets[~packets["status"]]
+  histogram = type_histogram(packets)
+  refused, emergency = divert_counts(packets)
+  requests = histogram[T_HOLD] + refused
+  ids, waits = hold_to_clear(packets)
+
+  lines = [f"{len(packets)} replies over {duration:.3f} s", ""]
+  lines.append(f"{'Type':<12}{'Count':>10}")
+  for type, name in enumerate(TYPE_NAMES):
+    if histogram[type]:
+      lines.append(f"{name:<12}{histogram[type]:>10}")
+  lines.append("")
+  if requests:
+    lines.append(f"Divert rate {refused / requests:.2%} of {requests} takeoff/landing requests, "
+                 f"{emergency} held planes diverted by emergencies")
+  if len(waits):
+    lines.append(f"Hold to clear mean {waits.mean() / 1e6:.3f} ms, p50 {np.percentile(waits, 50) / 1e6:.3f} ms, "
+                 f"p99 {np.percentile(waits, 99) / 1e6:.3f} ms, max {waits.max() / 1e6:.3f} ms")
+    lines.append("")
+    lines.append(f"{'Plane':<8}{'Clears':>8}{'Mean (ms)':>12}{'Max (ms)':>12}")
+    counts, means, longest = per_plane(ids, waits, packet_format.ids)
+    for id in np.flatnonzero(counts):
+      lines.append(f"{id:<8}{counts[id]:>8}{means[id] / 1e6:>12.3f}{longest[id] / 1e6:>12.3f}")
+  if status:
+    lines.append("")
+    lines.append(f"{len(status)} status replies, left out above")
+    lines.append(f"{'Time (s)':<12}{'Counter':<16}{'Value':>8}")
+    for time, counter, value in status:
+      name = STAT_NAMES[counter] if counter < len(STAT_NAMES) else str(counter)
+      lines.append(f"{time / 1e9:<12.3f}{name:<16}{value:>8}")
+  return "\n".join(lines)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Decode and summarize a capture of bobATC replies")
+
+  parser.add_argument('capture', help="bobATC_helper.py --capture file, or a raw byte capture of bobATC's TX line")
+  parser.add_argument('--baudrate', help="UART baud rate, sets the byte spacing of raw captures", type=int, default=BAUD_RATE)
+  parser.add_argument('--id-width', help="ID_WIDTH the design was built with", type=int, default=4)
+  parser.add_argument('--runways', help="RUNWAYS the design was built with", type=int, default=2)
+
+  args = parser.parse_args()
+  format = PacketFormat(args.id_width, args.runways)
+  start = time.perf_counter()
+  if is_capture(args.capture):
+    packets = decode_capture(args.capture, format)
+  else:
+    packets = decode(load(args.capture), baudrate=args.baudrate, packet_format=format)
+  print(summary(packets, format))
+  print(f"\nDecoded {len(packets)} packets in {(time.perf_counter() - start) * 1e3:.1f} ms", file=sys.stderr)
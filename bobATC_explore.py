@@ -0,0 +1,246 @@
+import argparse
+import json
+import time
+from collections import Counter
+
+from bobATC_codec import *
+from bobATC_model import BobModel
+
+# Breadth-first exploration of the states Bob can reach when planes follow
+# the protocol. Each state is the model state after a request has settled
+# plus the set of IDs that planes believe they hold. Because the search is
+# breadth-first the first path to a state is a shortest one, so every
+# invariant violation is reported with a minimal request sequence. The
+# sequences can be written out for explored_sequences_test in the cocotb
+# testbench, which replays them against the RTL.
+#
+# Every request goes through the one ReadRequestFsm and the shared ID
+# allocator, so requests from different planes rarely commute and there is
+# little to gain from reordering them. Instead the search only offers each
+# plane the packets it could send in its situation, skips packets that
+# change nothing (self loops), and follows only one of several packets that
+# lead to the same outcome.
+
+DEFAULT_PLANES = 4
+DEFAULT_OUTPUT = "testbench/explored_sequences.json"
+
+INVARIANTS = {
+  "double_clear":       "A runway was cleared while another plane held it",
+  "clear_in_emergency": "A plane was cleared during an emergency",
+  "id_reuse":           "An ID was handed out while a plane still held it",
+  "id_leak":            "An ID is taken on the chip but no plane holds it",
+  "id_freed_early":     "A plane still holds an ID the chip considers free",
+  "ghost_plane":        "A reply went to an ID that no plane holds",
+  "missing_reply":      "A plane left a queue without a clear or divert reply",
+}
+
+def bit(id):
+  return 1 << id
+
+def cleared_ids(runway):
+  cleared = {}
+  if runway & 0b1:
+    cleared[(runway >> 1) & 0xF] = 0
+  if runway >> 5 & 0b1:
+    cleared[runway >> 6] = 1
+  return cleared
+
+# Values left behind in registers that are always written before they are
+# read again (FIFO data_out, reply_to_send) are not part of the key
+def state_key(model, live):
+  return (tuple(model.takeoff_fifo.queue), tuple(model.landing_fifo.queue), model.runway, model.all_id,
+          model.takeoff_first, model.emergency_reg, model.emergency_id, live)
+
+# Packets a plane following the protocol could send in this state
+def enabled_packets(model, live, planes):
+  packets = []
+  if bin(live).count("1") < planes:
+    packets.append(encode(0, T_ID_PLEASE, 0))
+
+  cleared = cleared_ids(model.runway)
+  queued = set(model.takeoff_fifo.queue) | set(model.landing_fifo.queue)
+  for id in range(16):
+    if not live & bit(id):
+      continue
+    if id in cleared:
+      packets.append(encode(id, T_DECLARE, cleared[id]))
+    elif id not in queued:
+      packets.append(encode(id, T_REQUEST, R_TAKEOFF))
+      packets.append(encode(id, T_REQUEST, R_LANDING))
+    if not model.emergency:
+      packets.append(encode(id, T_EMERGENCY, E_DECLARE))
+
+  if model.emergency_reg and live & bit(model.emergency_id):
+    packets.append(encode(model.emergency_id, T_EMERGENCY, E_RESOLVE))
+  return packets
+
+# Sends packet and returns (replies, live IDs afterwards, violations)
+def step(model, live, packet):
+  request = PACKETS[packet]
+  runway = model.runway
+  queued = Counter(model.takeoff_fifo.queue) + Counter(model.landing_fifo.queue)
+  replies = model.request(packet)
+
+  violations = []
+  locked = [runway & 0b1, runway >> 5 & 0b1]
+  if request.type == T_DECLARE and cleared_ids(runway).get(request.id) == request.action:
+    live &= ~bit(request.id)
+    locked[request.action] = 0
+  elif request.type == T_EMERGENCY and request.action == E_RESOLVE:
+    live &= ~bit(request.id)
+
+  for reply in replies:
+    reply = PACKETS[reply]
+    if reply.type == T_ID_PLEASE:
+      if reply.action == I_FULL:
+        continue
+      if live & bit(reply.id):
+        violations.append("id_reuse")
+      live |= bit(reply.id)
+      continue
+
+    if not live & bit(reply.id):
+      violations.append("ghost_plane")
+    if reply.type == T_DIVERT:
+      live &= ~bit(reply.id)
+    elif reply.type == T_CLEAR:
+      if locked[reply.action]:
+        violations.append("double_clear")
+      locked[reply.action] = 1
+      if model.emergency:
+        violations.append("clear_in_emergency")
+
+  if model.all_id & ~live:
+    violations.append("id_leak")
+  if live & ~model.all_id:
+    violations.append("id_freed_early")
+  # An emergency diverts the whole landing queue in one burst, which has
+  # to stall on a full reply FIFO rather than lose a divert
+  left = queued - Counter(model.takeoff_fifo.queue) - Counter(model.landing_fifo.queue)
+  answered = Counter(PACKETS[reply].id for reply in replies if PACKETS[reply].type in (T_CLEAR, T_DIVERT))
+  if left - answered:
+    violations.append("missing_reply")
+  return replies, live, violations
+
+class Explorer:
+  def __init__(self, planes=DEFAULT_PLANES):
+    self.planes = planes
+    self.model = BobModel()
+    root = state_key(self.model, 0)
+    self.saved = {root: (self.model.save(), 0)}
+    # state key -> (previous state key, packet) along a shortest path
+    self.parents = {root: None}
+    self.frontier = [root]
+    self.depth = 0
+    self.transitions = 0
+    self.pruned = 0
+    # violation -> (state key before the packet, packet)
+    self.violations = {}
+    # coverage class -> first state key reaching it
+    self.covered = {}
+
+  def path(self, key):
+    packets = []
+    while self.parents[key] is not None:
+      key, packet = self.parents[key]
+      packets.append(packet)
+    return packets[::-1]
+
+  def expand(self, key):
+    saved, live = self.saved[key]
+    self.model.restore(saved)
+    outcomes = set()
+    for packet in enabled_packets(self.model, live, self.planes):
+      self.model.restore(saved)
+      replies, next_live, violations = step(self.model, live, packet)
+      self.transitions += 1
+      next_key = state_key(self.model, next_live)
+
+      outcome = (next_key, tuple(replies), tuple(violations))
+      if next_key == key and not replies or outcome in outcomes:
+        self.pruned += 1
+        continue
+      outcomes.add(outcome)
+
+      for violation in violations:
+        if violation not in self.violations:
+          self.violations[violation] = (key, packet)
+      if next_key not in self.parents:
+        self.parents[next_key] = (key, packet)
+        self.saved[next_key] = (self.model.save(), next_live)
+        self.covered.setdefault(coverage_class(self.model), next_key)
+        yield next_key
+
+  def run(self, max_depth=None, max_states=None):
+    while self.frontier and (max_depth is None or self.depth < max_depth):
+      next_frontier = []
+      for key in self.frontier:
+        next_frontier += self.expand(key)
+        if max_states is not None and len(self.parents) >= max_states:
+          self.frontier = []
+          return False
+      self.frontier = next_frontier
+      self.depth += 1
+    return not self.frontier
+
+  # Minimal sequence for each violation, and with cover for each coverage
+  # class, with the replies Bob gives to each packet along the way
+  def sequences(self, cover=False):
+    sequences = []
+    for violation, (key, packet) in sorted(self.violations.items()):
+      sequences.append(make_sequence(violation, INVARIANTS[violation], self.path(key) + [packet]))
+    if cover:
+      for covered, key in sorted(self.covered.items()):
+        takeoff, landing, runway_active, emergency = covered
+        name = f"cover_t{takeoff}_l{landing}_r{runway_active:02b}_e{emergency}"
+        description = f"{takeoff} takeoffs and {landing} landings queued, runways {runway_active:02b}, emergency {emergency}"
+        sequences.append(make_sequence(name, description, self.path(key)))
+    return sequences
+
+def make_sequence(name, description, packets):
+  model = BobModel()
+  replies = [model.request(packet) for packet in packets]
+  return {"name": name, "description": description, "packets": packets, "replies": replies, "all_id": model.all_id}
+
+def coverage_class(model):
+  return (model.takeoff_count, model.landing_count, model.runway_active, model.emergency)
+
+def describe(sequence):
+  lines = [f"{sequence['name']}: {sequence['description']} after {len(sequence['packets'])} requests"]
+  for packet, replies in zip(sequence["packets"], sequence["replies"]):
+    speaker, text = REQUEST_TEXT[packet]
+    answer = ", ".join(REPLY_TEXT[reply] for reply in replies) or "no reply"
+    lines.append(f"  {packet:#04x} {speaker}: {text} -> {answer}")
+  return "\n".join(lines)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Explore the states Bob can reach and check protocol invariants")
+
+  parser.add_argument('--planes', help="most planes in the airspace at once", type=int, default=DEFAULT_PLANES)
+  parser.add_argument('--depth', help="stop after this many requests", type=int)
+  parser.add_argument('--max-states', help="stop after this many states", type=int)
+  parser.add_argument('--cover', help="also write a shortest sequence into each coverage class", action="store_true")
+  parser.add_argument('--output', help="write the violating sequences here for the cocotb testbench", default=DEFAULT_OUTPUT)
+
+  args = parser.parse_args()
+  explorer = Explorer(args.planes)
+  start = time.perf_counter()
+  exhausted = explorer.run(args.depth, args.max_states)
+  elapsed = time.perf_counter() - start
+
+  print(f"{len(explorer.parents)} states to depth {explorer.depth} in {elapsed:.1f} s "
+        f"({'exhaustive' if exhausted else 'bounded'}), {explorer.transitions} transitions, {explorer.pruned} pruned")
+  print(f"{len(explorer.covered)} coverage classes reached")
+  sequences = explorer.sequences(args.cover)
+  for sequence in sequences[:len(explorer.violations)]:
+    print()
+    print(describe(sequence))
+  if not explorer.violations:
+    print("No invariant violations")
+
+  # One sequence per line keeps the file readable in diffs
+  with open(args.output, "w") as fh:
+    fh.write(f'{{"planes": {args.planes}, "sequences": [\n')
+    fh.write(",\n".join(json.dumps(sequence) for sequence in sequences))
+    fh.write("\n]}\n")
+  print(f"\nWrote {len(sequences)} sequences to {args.output}")
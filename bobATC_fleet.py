@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import sys
+import time
+from collections import namedtuple
+
+from bobATC_codec import *
+from bobATC_helper import BobClient, parse_packet, prompt
+
+# Drives several bobATC boards, one per airfield, from a single asyncio
+# loop. Each board is a BobClient whose port is watched by the loop, so
+# there is no thread or polling loop per port. Requests are routed by board
+# name and every reply from every board lands in one events queue in the
+# order it arrived. Ports can be USB serial adapters or pty stand-ins.
+
+FleetEvent = namedtuple("FleetEvent", "board time reply")
+
+class FleetClient(BobClient):
+  def __init__(self, fleet, name, port, baudrate, capture=None):
+    super().__init__(port, baudrate, verbose=False, capture=capture)
+    self.fleet = fleet
+    self.name = name
+
+  def publish(self, reply):
+    self.fleet.events.put_nowait(FleetEvent(self.name, time.monotonic_ns(), reply))
+
+class BobFleet:
+  # ports maps board names to serial ports. With capture_prefix each board
+  # records a capture to <capture_prefix><name>.bin.
+  def __init__(self, ports, baudrate=BAUD_RATE, capture_prefix=None):
+    self.events = asyncio.Queue()
+    self.boards = {}
+    for name, port in ports.items():
+      capture = None if capture_prefix is None else f"{capture_prefix}{name}.bin"
+      self.boards[name] = FleetClient(self, name, port, baudrate, capture)
+
+  async def open(self):
+    for board in self.boards.values():
+      await board.open()
+
+  def close(self):
+    for board in self.boards.values():
+      board.close()
+
+  async def __aenter__(self):
+    await self.open()
+    return self
+
+  async def __aexit__(self, *exc):
+    self.close()
+
+  def send_nowait(self, board, packet):
+    return self.boards[board].send_nowait(packet)
+
+  async def send(self, board, packet, timeout=1.0):
+    return await self.boards[board].send(packet, timeout)
+
+  # Sends packet to every board and returns {board: reply}
+  async def broadcast(self, packet, timeout=1.0):
+    futures = {name: board.send_nowait(packet) for name, board in self.boards.items()}
+    await asyncio.wait(futures.values(), timeout=timeout)
+    return {name: future.result() if future.done() and not future.cancelled() else None
+            for name, future in futures.items()}
+
+# "name=port" or a bare port, which is named after its position
+def parse_ports(specs):
+  ports = {}
+  for i, spec in enumerate(specs):
+    name, _, port = spec.rpartition("=")
+    ports[name or str(i)] = port
+  return ports
+
+async def print_events(fleet):
+  width = max(len(name) for name in fleet.boards) + len("[] Bob")
+  logs = {name: reply_log(width, f"[{name}] Bob") for name in fleet.boards}
+  while True:
+    event = await fleet.events.get()
+    if logs[event.board][event.reply] is not None:
+      print(logs[event.board][event.reply])
+
+# Script lines are "board packet", the packet as in bobATC_helper.py
+# --script. Every packet is sent before any reply is awaited, so all boards
+# work through their scripts at the same time. The whole script is checked
+# first, bad lines are reported, skipped and counted as failures.
+async def run_script(fleet, filename, timeout):
+  packets = []
+  skipped = 0
+  with open(filename) as fh:
+    for number, line in enumerate(fh, 1):
+      fields = line.split('#')[0].split(None, 1)
+      if not fields:
+        continue
+      if len(fields) != 2 or fields[0] not in fleet.boards:
+        print(f"{filename}:{number}: unknown board or no packet, skipped")
+        skipped += 1
+        continue
+      try:
+        packets.append((fields[0], parse_packet(fields[1])))
+      except ValueError:
+        print(f"{filename}:{number}: invalid packet, skipped")
+        skipped += 1
+  if not packets:
+    return skipped
+  futures = [fleet.send_nowait(name, packet) for name, packet in packets]
+  done, missing = await asyncio.wait(futures, timeout=timeout)
+  for future in missing:
+    future.cancel()
+  return skipped + len(missing)
+
+async def run_console(fleet, timeout):
+  print(f"Boards: {', '.join(fleet.boards)}. Enter \"board id type action\", or quit")
+  while True:
+    line = (await prompt("> ")).strip()
+    if line == "quit":
+      break
+    fields = line.split(None, 1)
+    if len(fields) != 2 or fields[0] not in fleet.boards:
+      print("Unknown board")
+      continue
+    try:
+      packet = parse_packet(fields[1])
+    except ValueError:
+      print("Invalid packet")
+      continue
+    try:
+      await fleet.send(fields[0], packet, timeout)
+    except asyncio.TimeoutError:
+      print(f"No reply from {fields[0]}")
+  return 0
+
+async def main(args):
+  async with BobFleet(parse_ports(args.ports), args.baudrate, args.capture_prefix) as fleet:
+    printer = asyncio.get_running_loop().create_task(print_events(fleet))
+    if args.script:
+      missing = await run_script(fleet, args.script, args.timeout)
+    else:
+      missing = await run_console(fleet, args.timeout)
+    # Let the printer catch up with replies that are already queued
+    await asyncio.sleep(0)
+    printer.cancel()
+    return missing
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Drive several bobATC boards from one process")
+
+  parser.add_argument('ports', help="serial ports as name=port, e.g. north=/dev/ttyUSB0", nargs="+")
+  parser.add_argument('--baudrate', help="UART baud rate", type=int, default=BAUD_RATE)
+  parser.add_argument('--script', help="send the \"board packet\" lines in this file instead of prompting")
+  parser.add_argument('--capture-prefix', help="record each board to <prefix><name>.bin")
+  parser.add_argument('--timeout', help="seconds to wait for a reply", type=float, default=1.0)
+
+  args = parser.parse_args()
+  sys.exit(1 if asyncio.run(main(args)) else 0)
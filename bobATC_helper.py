@@ -1,107 +1,272 @@
+import argparse
+import asyncio
 import serial
-import threading
-from time import sleep
-
-T_REQUEST    = 0b000
-T_DECLARE    = 0b001
-T_EMERGENCY  = 0b010
-T_CLEAR      = 0b011
-T_HOLD       = 0b100
-T_SAY_AGAIN  = 0b101
-T_DIVERT     = 0b110
-T_ID_PLEASE  = 0b111
-
-C_RUNWAY_0   = 0b0 # Cleared
-C_RUNWAY_1   = 0b1
-
-R_TAKEOFF    = 0b0 # Request
-R_LANDING    = 0b1
-
-D_RUNWAY_0  = 0b0 # Declare
-D_RUNWAY_1  = 0b1
-
-E_DECLARE    = 0b1
-E_RESOLVE    = 0b0
-
-ser = serial.Serial()
-stop_flag = False
-
-def initialize_serial():
-  ser.baudrate = 115200
-  ser.port = '/dev/cu.usbserial-A10MPCQ8'
-  ser.timeout = 0
-  if ser.isOpen(): ser.close()
-  ser.open()
-  print(f"Opened serial port at {ser.name}")
-
-def interpret(data):
-  reply = ord(data)
+import sys
+import time
+from collections import deque
+
+from bobATC_codec import *
+
+PORT = '/dev/cu.usbserial-A10MPCQ8'
+
+REQUEST_LOG = request_log(13)
+REPLY_LOG = reply_log(13)
+
+# Packets in other formats than the default are decoded as they come
+def interpret(reply, format=DEFAULT_FORMAT):
   print("***************************************************")
-  if (reply & 0b00001110) == T_CLEAR << 1:
-    if (reply & 0b00000001) == 0b0:
-      print(f"Bob          : Plane {"{:02d}".format(reply >> 4)} cleared runway {reply & 0b1}")
-    elif (reply & 0b00000001) == 0b1:
-      print(f"Bob          : Plane {"{:02d}".format(reply >> 4)} cleared runway {reply & 0b1}")
-  elif (reply & 0b00001110) == T_HOLD << 1:
-    print(f"Bob          : Plane {"{:02d}".format(reply >> 4)} hold")
-  elif (reply & 0b00001110) == T_ID_PLEASE << 1:
-    if (reply & 0b00000001) == 0b0:
-      print(f"Bob          : ID {reply >> 4} is available")
-    elif (reply & 0b00000001) == 0b1:
-      print(f"Bob          : My airspace is full")
-  elif (reply & 0b00001110) == T_DIVERT << 1:
-    print(f"Bob          : Plane {"{:02d}".format(reply >> 4)} divert due to congestion or emergency")
-  elif (reply & 0b00001110) == T_SAY_AGAIN << 1:
-    print(f"Bob          : Plane {"{:02d}".format(reply >> 4)} say again")
+  text = REPLY_LOG[reply] if format.default else reply_text(format.decode(reply))
+  if text is not None:
+    print(text if format.default else f"{'Bob':<13}: {text}")
   print("***************************************************")
 
-def translate(request):
-  id = (request & 0b11110000) >> 4
-  type = (request & 0b00001110) >> 1
-  action = request & 0b1
+def translate(request, format=DEFAULT_FORMAT):
   print("***************************************************")
-  if type == T_ID_PLEASE:
-    print(f"New Plane    : Requesting ID for entry")
-  elif type == T_REQUEST:
-    if action == R_TAKEOFF:
-      print(f"Plane {"{:02d}".format(id)}     : Requesting takeoff")
-    elif action == R_LANDING:
-      print(f"Plane {"{:02d}".format(id)}     : Requesting landing")
-  elif type == T_DECLARE:
-    if action == D_RUNWAY_0:
-      print(f"Plane {"{:02d}".format(id)}     : Declaring takeoff/landing runway 0")
-    elif action == D_RUNWAY_1:
-      print(f"Plane {"{:02d}".format(id)}     : Declaring takeoff/landing runway 1")
-  elif type == T_EMERGENCY:
-    if action == E_DECLARE:
-      print(f"Plane {"{:02d}".format(id)}     : Declaring emergency")
-    elif action == E_RESOLVE:
-      print(f"Plane {"{:02d}".format(id)}     : Resolving emergency")
+  if format.default:
+    print(REQUEST_LOG[request])
   else:
-    print(f"Plane {"{:02d}".format(id)}     : Making invalid request")
+    speaker, text = request_text(format.decode(request))
+    print(f"{speaker:<13}: {text}")
   print("***************************************************")
-        
-def keep_reading():
-  while not stop_flag:
-    data = ser.read(1)
-    if len(data) > 0:
-      interpret(data)
-
-# Main routine
-initialize_serial()
-t1 = threading.Thread(target=keep_reading, args=())
-t1.start()
-while True:
-  id =      int(input("Plane ID     : "))
-  if id == 44:
-    stop_flag = True
-    break
-  request = int(input("Request type : "))
-  action =  int(input("Action bit   : "))
-  packet = (id << 4) + (request << 1) + action
-  translate(packet)
-  ser.write(bytes([packet]))
-  sleep(0.5)
-t1.join()
-ser.close()
-print("\nClosed serial port")
\ No newline at end of file
+
+# Declares and emergencies are never answered to the plane that sent them
+def expects_reply(packet, format=DEFAULT_FORMAT):
+  return format.decode(packet).type not in (T_DECLARE, T_EMERGENCY)
+
+class BobClient:
+  # Talks to bobATC over a serial port from an asyncio loop. The reader is
+  # woken by the loop when the port has data and drains everything waiting
+  # in one read. send() returns a future for the reply to that packet, ID
+  # replies answer ID requests in order and every other reply answers the
+  # oldest open request from the plane it names. Replies nobody waits for,
+  # like a clearance after a hold, only go to the replies queue. With
+  # capture every byte sent and received is recorded to that file, see
+  # bobATC_capture.py. format is the PacketFormat of the Bob on the port,
+  # packets wider than a byte are sent and received as several bytes.
+  # Status queries are answered in order with the counter value, the
+  # packets of a status reply never reach the replies queue.
+  def __init__(self, port=PORT, baudrate=BAUD_RATE, verbose=True, capture=None, format=DEFAULT_FORMAT):
+    self.ser = serial.Serial()
+    self.ser.port = port
+    self.ser.baudrate = baudrate
+    self.ser.timeout = 0
+    self.verbose = verbose
+    self.format = format
+    self.partial = b""
+    self.loop = None
+    self.waiting_id = deque()
+    self.waiting_status = deque()
+    self.status_words = None
+    self.waiting = {}
+    self.replies = asyncio.Queue()
+    self.capture = None
+    if capture:
+      from bobATC_capture import CaptureWriter
+      self.capture = CaptureWriter(capture, baudrate)
+
+  async def open(self):
+    self.loop = asyncio.get_running_loop()
+    if self.ser.isOpen(): self.ser.close()
+    self.ser.open()
+    self.loop.add_reader(self.ser.fileno(), self.on_readable)
+    if self.verbose:
+      print(f"Opened serial port at {self.ser.name}")
+
+  def close(self):
+    if self.loop is not None:
+      self.loop.remove_reader(self.ser.fileno())
+    for future in self.pending():
+      future.cancel()
+    self.ser.close()
+    if self.capture is not None:
+      self.capture.close()
+    if self.verbose:
+      print("\nClosed serial port")
+
+  async def __aenter__(self):
+    await self.open()
+    return self
+
+  async def __aexit__(self, *exc):
+    self.close()
+
+  def pending(self):
+    futures = list(self.waiting_id) + list(self.waiting_status)
+    for queue in self.waiting.values():
+      futures += queue
+    return futures
+
+  def on_readable(self):
+    data = self.ser.read(self.ser.in_waiting or 1)
+    if self.capture is not None:
+      self.capture.received(data)
+    if self.format.bytes == 1:
+      replies = data
+    else:
+      data = self.partial + data
+      replies = self.format.from_bytes(data)
+      self.partial = data[len(replies) * self.format.bytes:]
+    for reply in replies:
+      self.on_reply(reply)
+
+  def on_reply(self, reply):
+    if self.status_words is not None:
+      self.status_words.append(reply)
+      if len(self.status_words) == self.format.status_packets:
+        self.resolve(self.waiting_status, self.format.status_value(self.status_words))
+        self.status_words = None
+      return
+
+    if self.verbose:
+      interpret(reply, self.format)
+    if self.format.is_status_header(reply):
+      self.status_words = []
+      return
+    self.publish(reply)
+
+    packet = self.format.decode(reply)
+    if packet.type == T_ID_PLEASE:
+      self.resolve(self.waiting_id, reply)
+    else:
+      self.resolve(self.waiting.get(packet.id, ()), reply)
+
+  def resolve(self, queue, result):
+    while queue:
+      future = queue.popleft()
+      if not future.done():
+        future.set_result(result)
+        break
+
+  # Every reply ends up here, subclasses can send them somewhere else
+  def publish(self, reply):
+    self.replies.put_nowait(reply)
+
+  def send_nowait(self, packet):
+    if self.verbose:
+      translate(packet, self.format)
+    future = self.loop.create_future()
+    decoded = self.format.decode(packet)
+    if not expects_reply(packet, self.format):
+      future.set_result(None)
+    elif decoded.type == T_SAY_AGAIN and decoded.action == S_STATUS:
+      self.waiting_status.append(future)
+    elif decoded.type == T_ID_PLEASE:
+      self.waiting_id.append(future)
+    else:
+      self.waiting.setdefault(decoded.id, deque()).append(future)
+    data = self.format.to_bytes(packet)
+    if self.capture is not None:
+      self.capture.sent(data)
+    self.ser.write(data)
+    return future
+
+  # Waits for the reply to packet, None for packets Bob does not answer
+  async def send(self, packet, timeout=1.0):
+    return await asyncio.wait_for(self.send_nowait(packet), timeout)
+
+  # Every performance counter in STAT_ order, counters an ID_WIDTH below 3
+  # cannot name read 0
+  async def read_counters(self, timeout=1.0):
+    return [await self.send(self.format.status_query(counter), timeout) if counter < self.format.ids else 0
+            for counter in range(len(STAT_NAMES))]
+
+def parse_packet(line, format=DEFAULT_FORMAT):
+  fields = line.split('#')[0].split()
+  if len(fields) == 1:
+    return int(fields[0], 0)
+  id, request, action = (int(field, 0) for field in fields)
+  return format.encode(id, request, action)
+
+# Batch mode, one packet per line either as a whole packet (0x0e) or as
+# "id type action". With pipeline every packet is sent before any reply is
+# awaited, otherwise each reply is awaited before the next packet.
+async def run_script(client, filename, pipeline, timeout):
+  with open(filename) as fh:
+    packets = [parse_packet(line, client.format) for line in fh if line.split('#')[0].strip()]
+
+  if pipeline:
+    futures = [client.send_nowait(packet) for packet in packets]
+    done, missing = await asyncio.wait(futures, timeout=timeout)
+    for future in missing:
+      future.cancel()
+    return len(missing)
+
+  missing = 0
+  for packet in packets:
+    try:
+      await client.send(packet, timeout)
+    except asyncio.TimeoutError:
+      print(f"No reply to packet {packet:#0{2 + 2 * client.format.bytes}x}")
+      missing += 1
+  return missing
+
+async def prompt(text):
+  return await asyncio.get_running_loop().run_in_executor(None, input, text)
+
+async def run_console(client, timeout):
+  while True:
+    id =      int(await prompt("Plane ID     : "))
+    if id == 44:
+      break
+    request = int(await prompt("Request type : "))
+    action =  int(await prompt("Action bit   : "))
+    try:
+      await client.send(client.format.encode(id, request, action), timeout)
+    except asyncio.TimeoutError:
+      print("No reply from Bob")
+
+# Polls the performance counters every interval seconds and prints each
+# with its rate since the last poll, the event counters wrap at 16 bits
+async def run_stats(client, interval, polls, timeout):
+  last = None
+  poll = 0
+  while not polls or poll < polls:
+    try:
+      fields = status_fields(await client.read_counters(timeout))
+    except asyncio.TimeoutError:
+      print("No reply from Bob")
+      return 1
+    now = time.monotonic()
+
+    print(f"{'Counter':<20}{'Total':>8}{'Rate (/s)':>12}")
+    for name in STAT_NAMES[:STAT_FIFO_HIGH]:
+      rate = "" if last is None else f"{((fields[name] - last[name]) & 0xffff) / (now - last_time):>12.1f}"
+      print(f"{name:<20}{fields[name]:>8}{rate}")
+    for name in ("request_fifo_high", "reply_fifo_high", "takeoff_queue_high", "landing_queue_high"):
+      print(f"{name:<20}{fields[name]:>8}")
+    print()
+
+    last, last_time = fields, now
+    poll += 1
+    if not polls or poll < polls:
+      await asyncio.sleep(interval)
+  return 0
+
+async def main(args):
+  format = PacketFormat(args.id_width, args.runways)
+  async with BobClient(args.port, args.baudrate, verbose=not args.stats, capture=args.capture,
+                       format=format) as client:
+    if args.stats:
+      return await run_stats(client, args.interval, args.polls, args.timeout)
+    if args.script:
+      return await run_script(client, args.script, args.pipeline, args.timeout)
+    await run_console(client, args.timeout)
+    return 0
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="bobATC serial console")
+
+  parser.add_argument('--port', help="serial port bobATC is on", default=PORT)
+  parser.add_argument('--baudrate', help="UART baud rate", type=int, default=BAUD_RATE)
+  parser.add_argument('--script', help="send the packets in this file instead of prompting")
+  parser.add_argument('--pipeline', help="with --script, send every packet before awaiting replies", action="store_true")
+  parser.add_argument('--stats', help="poll Bob's performance counters instead of prompting", action="store_true")
+  parser.add_argument('--interval', help="with --stats, seconds between polls", type=float, default=1.0)
+  parser.add_argument('--polls', help="with --stats, polls before exiting, 0 for no limit", type=int, default=0)
+  parser.add_argument('--capture', help="record every byte sent and received with timestamps to this file")
+  parser.add_argument('--timeout', help="seconds to wait for a reply", type=float, default=1.0)
+  parser.add_argument('--id-width', help="ID_WIDTH the design was built with", type=int, default=4)
+  parser.add_argument('--runways', help="RUNWAYS the design was built with", type=int, default=2)
+
+  args = parser.parse_args()
+  sys.exit(1 if asyncio.run(main(args)) else 0)
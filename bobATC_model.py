@@ -0,0 +1,471 @@
+from collections import deque
+
+from bobATC_codec import *
+
+# Packet-level reference model of Bob (src/Bob.v). Each call to request()
+# feeds one byte into the uart_requests FIFO and clocks ReadRequestFsm until
+# it is idle again, mirroring the RTL state by state. The UART serial path is
+# abstracted away: a request is assumed to arrive only after the replies of
+# the previous one have left the chip, which is what request() in the
+# testbench and bobATC_helper.py both do.
+#
+# id_width, queue_depth, runways and reply_depth match the ID_WIDTH,
+# QUEUE_DEPTH, RUNWAYS and REPLY_DEPTH parameters of the RTL, packets then
+# use PacketFormat(id_width, runways) from bobATC_codec.py.
+#
+# PerfCounters is modelled too, except for framing errors and request FIFO
+# overflows, which never happen on the model's ideal serial path, and the
+# uart_replies high-water mark. That one depends on how fast UartTX drains
+# the FIFO, which the model does not time, so it always reads 0 here and
+# testbenches compare it against the RTL FIFO itself.
+
+# ReadRequestFsm state encoding
+S_WAIT           = 0b000
+S_READ           = 0b001
+S_QUEUE_REPLY    = 0b010
+S_CHECK_QUEUES   = 0b011
+S_CLEAR_TAKEOFF  = 0b100
+S_CLEAR_LANDING  = 0b101
+S_DIVERT_LANDING = 0b110
+S_SEND_CLEAR     = 0b111
+
+REQUEST_FIFO_DEPTH = 4
+PLANE_FIFO_DEPTH   = 8
+
+# Guards against a model bug spinning forever, the RTL never needs more than
+# a few cycles per queued plane to settle.
+MAX_SETTLE_CYCLES = 1000
+
+class FIFO:
+  def __init__(self, depth):
+    self.depth = depth
+    self.reset()
+
+  def reset(self):
+    self.queue = deque()
+    self.data_out = 0
+
+  @property
+  def count(self):
+    return len(self.queue)
+
+  @property
+  def empty(self):
+    return len(self.queue) == 0
+
+  @property
+  def full(self):
+    return len(self.queue) == self.depth
+
+  # Same priority as the RTL: a simultaneous read and write ignores full.
+  def clock(self, we, re, data_in):
+    if re and not self.empty and we:
+      self.data_out = self.queue.popleft()
+      self.queue.append(data_in)
+    elif re and not self.empty:
+      self.data_out = self.queue.popleft()
+    elif we and not self.full:
+      self.queue.append(data_in)
+
+# runway packs {plane id, active} for each runway like the RTL, runway r
+# at bit r * (id_width + 1)
+class RunwayManager:
+  def __init__(self, id_width=4, runways=2):
+    self.id_width = id_width
+    self.runways = runways
+    self.slot = id_width + 1
+    self.id_mask = (1 << id_width) - 1
+    self.reset()
+
+  def reset(self):
+    self.runway = 0
+
+  def runway_active(self, runway_override):
+    active = 0
+    for r in range(self.runways):
+      active |= (self.runway >> (r * self.slot) & 1) << r
+    return active | runway_override
+
+  # {plane id: runway} for every runway a plane holds
+  def cleared(self):
+    cleared = {}
+    for r in range(self.runways):
+      slot = self.runway >> (r * self.slot)
+      if slot & 1:
+        cleared[(slot >> 1) & self.id_mask] = r
+    return cleared
+
+  def holds(self, runway_id, plane_id):
+    slot = self.runway >> (runway_id * self.slot)
+    return bool(slot & 1) and (slot >> 1) & self.id_mask == plane_id
+
+  def clock(self, lock, unlock, runway_id, plane_id_lock, plane_id_unlock):
+    shift = runway_id * self.slot
+    if lock and not unlock:
+      self.runway = (self.runway & ~(((1 << self.slot) - 1) << shift)) | (((plane_id_lock << 1) | 1) << shift)
+    elif unlock and not lock:
+      if plane_id_unlock == (self.runway >> (shift + 1)) & self.id_mask:
+        self.runway &= ~(1 << shift)
+
+class AircraftIDManager:
+  def __init__(self, id_width=4):
+    self.all_ids = (1 << (1 << id_width)) - 1
+    self.reset()
+
+  def reset(self):
+    self.taken_id = 0
+
+  @property
+  def full(self):
+    return self.taken_id == self.all_ids
+
+  # Lowest free ID, 0 when full, like the priority encoder in the RTL.
+  @property
+  def id_out(self):
+    free = ~self.taken_id & self.all_ids
+    return (free & -free).bit_length() - 1 if free else 0
+
+  def clock(self, release_id, take_id, id_in):
+    if release_id:
+      self.taken_id &= ~(1 << id_in)
+    elif take_id and not self.full:
+      self.taken_id |= 1 << self.id_out
+
+class BobModel:
+  def __init__(self, runway_override=0b00, emergency_override=0b0, id_width=4, queue_depth=PLANE_FIFO_DEPTH,
+               runways=2, reply_depth=None):
+    self.format = PacketFormat(id_width, runways)
+    self.reply_depth = queue_depth if reply_depth is None else reply_depth
+    self.runways = runways
+    self.all_runways = (1 << runways) - 1
+    self.uart_requests = FIFO(REQUEST_FIFO_DEPTH)
+    self.takeoff_fifo = FIFO(queue_depth)
+    self.landing_fifo = FIFO(queue_depth)
+    self.runway_manager = RunwayManager(id_width, runways)
+    self.id_manager = AircraftIDManager(id_width)
+    self.runway_override = runway_override
+    self.emergency_override = emergency_override
+    self.reset()
+
+  def reset(self):
+    self.uart_requests.reset()
+    self.takeoff_fifo.reset()
+    self.landing_fifo.reset()
+    self.runway_manager.reset()
+    self.id_manager.reset()
+    self.state = S_WAIT
+    self.takeoff_first = 0
+    self.reply_to_send = 0
+    self.emergency_reg = 0
+    self.emergency_id = 0
+    self.replies = []
+    self.status_word = 0
+    self.status_left = 0
+    # PerfCounters, the event counters in STAT_ order then the high-water
+    # marks
+    self.events = [0] * STAT_FIFO_HIGH
+    self.request_high = 0
+    self.takeoff_high = 0
+    self.landing_high = 0
+
+  # Visible state
+
+  @property
+  def all_id(self):
+    return self.id_manager.taken_id
+
+  @property
+  def id_full(self):
+    return self.id_manager.full
+
+  @property
+  def runway(self):
+    return self.runway_manager.runway
+
+  @property
+  def runway_active(self):
+    return self.runway_manager.runway_active(self.runway_override)
+
+  def cleared_ids(self):
+    return self.runway_manager.cleared()
+
+  @property
+  def emergency(self):
+    return self.emergency_reg | self.emergency_override
+
+  @property
+  def takeoff_count(self):
+    return self.takeoff_fifo.count
+
+  @property
+  def landing_count(self):
+    return self.landing_fifo.count
+
+  def snapshot(self):
+    return {
+      "all_id": self.all_id,
+      "id_full": self.id_full,
+      "runway": self.runway,
+      "runway_active": self.runway_active,
+      "takeoff_count": self.takeoff_count,
+      "landing_count": self.landing_count,
+      "emergency": self.emergency,
+      "emergency_id": self.emergency_id,
+    }
+
+  # Value a status query for counter reads
+  def counter(self, counter):
+    if counter < STAT_FIFO_HIGH:
+      return self.events[counter]
+    elif counter == STAT_FIFO_HIGH:
+      return min(self.request_high, 255) << 8
+    elif counter == STAT_QUEUE_HIGH:
+      return min(self.takeoff_high, 255) << 8 | min(self.landing_high, 255)
+    return 0
+
+  def count(self, counter):
+    self.events[counter] = (self.events[counter] + 1) & 0xffff
+
+  # Everything the next request depends on, restore() puts it back. For
+  # searches that branch from one state into many.
+  def save(self):
+    return (
+      tuple(self.takeoff_fifo.queue), self.takeoff_fifo.data_out,
+      tuple(self.landing_fifo.queue), self.landing_fifo.data_out,
+      self.uart_requests.data_out, self.runway, self.all_id, self.state, self.takeoff_first,
+      self.reply_to_send, self.emergency_reg, self.emergency_id,
+      self.runway_override, self.emergency_override,
+    )
+
+  def restore(self, saved):
+    (takeoff, self.takeoff_fifo.data_out, landing, self.landing_fifo.data_out,
+     self.uart_requests.data_out, self.runway_manager.runway, self.id_manager.taken_id, self.state,
+     self.takeoff_first, self.reply_to_send, self.emergency_reg, self.emergency_id,
+     self.runway_override, self.emergency_override) = saved
+    self.takeoff_fifo.queue = deque(takeoff)
+    self.landing_fifo.queue = deque(landing)
+    self.uart_requests.queue = deque()
+
+  # Stimulus
+
+  def request(self, packet):
+    self.uart_requests.clock(True, False, packet & self.format.mask)
+    self.request_high = max(self.request_high, self.uart_requests.count)
+    return self.settle()
+
+  def set_overrides(self, runway_override=None, emergency_override=None):
+    if runway_override is not None:
+      self.runway_override = runway_override
+    if emergency_override is not None:
+      self.emergency_override = emergency_override
+    return self.settle()
+
+  # Clocks the FSM until it parks in S_WAIT with nothing left to do and
+  # returns the replies that made it onto the wire. The RTL waits in
+  # S_QUEUE_REPLY and S_SEND_CLEAR while uart_replies is full, so only the
+  # timing depends on REPLY_DEPTH and every reply arrives.
+  def settle(self):
+    self.replies = []
+    for _ in range(MAX_SETTLE_CYCLES):
+      if not self.clock():
+        break
+    else:
+      raise RuntimeError("Bob model did not settle")
+    return self.replies
+
+  def queue_reply(self):
+    self.replies.append(self.reply_to_send)
+
+  def can_dispatch(self, emergency, runway_active):
+    if emergency:
+      return not self.landing_fifo.empty
+    return runway_active != self.all_runways and not (self.takeoff_fifo.empty and self.landing_fifo.empty)
+
+  # One clock edge of ReadRequestFsm and everything it drives. Returns False
+  # once the FSM is idle so settle() can stop.
+  def clock(self):
+    uart_empty = self.uart_requests.empty
+    uart_request = self.uart_requests.data_out
+    action_width = self.format.action_width
+    plane_id = uart_request >> (action_width + 3)
+    msg_type = (uart_request >> action_width) & 0b111
+    msg_action = uart_request & ((1 << action_width) - 1)
+    encode = self.format.encode
+    emergency = self.emergency
+    runway_active = self.runway_active
+    runway = self.runway
+    all_id = self.all_id
+
+    if self.state == S_WAIT and uart_empty and not self.can_dispatch(emergency, runway_active):
+      return False
+
+    uart_rd_request = False
+    queue_takeoff_plane = False
+    queue_landing_plane = False
+    unqueue_takeoff_plane = False
+    unqueue_landing_plane = False
+    queue_reply = False
+    lock = False
+    unlock = False
+    runway_id = 0
+    set_emergency = False
+    unset_emergency = False
+    take_id = False
+    release_id = False
+    sel_takeoff_id_lock = False
+    sel_diverted_id = False
+    reverse_takeoff_first = False
+    send_status = False
+    send_status_packet = False
+    event = None
+    reply = None
+    next_state = S_WAIT
+
+    if self.state in (S_WAIT, S_CHECK_QUEUES) and (self.state == S_CHECK_QUEUES or uart_empty):
+      if emergency:
+        if not self.landing_fifo.empty:
+          next_state = S_DIVERT_LANDING
+          unqueue_landing_plane = True
+      elif runway_active != self.all_runways:
+        takeoff_waiting = not self.takeoff_fifo.empty
+        landing_waiting = not self.landing_fifo.empty
+        if takeoff_waiting and landing_waiting:
+          if self.takeoff_first:
+            next_state = S_CLEAR_TAKEOFF
+            unqueue_takeoff_plane = True
+          else:
+            next_state = S_CLEAR_LANDING
+            unqueue_landing_plane = True
+          reverse_takeoff_first = self.state == S_CHECK_QUEUES
+        elif takeoff_waiting:
+          next_state = S_CLEAR_TAKEOFF
+          unqueue_takeoff_plane = True
+        elif landing_waiting:
+          next_state = S_CLEAR_LANDING
+          unqueue_landing_plane = True
+    elif self.state == S_WAIT:
+      next_state = S_READ
+      uart_rd_request = True
+    elif self.state == S_READ:
+      status_query = msg_type == T_SAY_AGAIN and msg_action == S_STATUS
+      if not status_query:
+        self.count(STAT_REQUESTS)
+      if msg_type == T_REQUEST:
+        if all_id >> plane_id & 1:
+          next_state = S_QUEUE_REPLY
+          if msg_action & 1 == 0:
+            if self.takeoff_fifo.full:
+              reply = encode(plane_id, T_DIVERT, 0)
+              event = STAT_DIVERTS
+              release_id = True
+            else:
+              queue_takeoff_plane = True
+              reply = encode(plane_id, T_HOLD, 0)
+              event = STAT_HOLDS
+          else:
+            if self.landing_fifo.full or emergency:
+              reply = encode(plane_id, T_DIVERT, 0)
+              event = STAT_DIVERTS
+              release_id = True
+            else:
+              queue_landing_plane = True
+              reply = encode(plane_id, T_HOLD, 0)
+              event = STAT_HOLDS
+        else:
+          next_state = S_CHECK_QUEUES
+      elif msg_type == T_DECLARE:
+        next_state = S_CHECK_QUEUES
+        if all_id >> plane_id & 1 and msg_action < self.runways:
+          if self.runway_manager.holds(msg_action, plane_id):
+            release_id = True
+          runway_id = msg_action
+          unlock = True
+      elif msg_type == T_EMERGENCY:
+        if msg_action & 1:
+          if not self.landing_fifo.empty:
+            next_state = S_DIVERT_LANDING
+            unqueue_landing_plane = True
+          set_emergency = True
+        else:
+          next_state = S_CHECK_QUEUES
+          if self.emergency_id == plane_id:
+            unset_emergency = True
+          release_id = True
+      elif msg_type == T_ID_PLEASE:
+        next_state = S_QUEUE_REPLY
+        if self.id_manager.full:
+          reply = encode(0, T_ID_PLEASE, I_FULL)
+        else:
+          reply = encode(self.id_manager.id_out, T_ID_PLEASE, 0)
+          take_id = True
+      elif status_query:
+        next_state = S_QUEUE_REPLY
+        reply = encode(plane_id, T_SAY_AGAIN, 1)
+        send_status = True
+      else:
+        next_state = S_QUEUE_REPLY
+        reply = encode(plane_id, T_SAY_AGAIN, 0)
+        event = STAT_SAY_AGAINS
+    elif self.state == S_QUEUE_REPLY:
+      if self.status_left:
+        next_state = S_QUEUE_REPLY
+        send_status_packet = True
+        bits = self.format.status_bits
+        reply = self.status_word >> (STATUS_WIDTH - bits)
+      else:
+        next_state = S_CHECK_QUEUES
+      queue_reply = True
+    elif self.state in (S_CLEAR_TAKEOFF, S_CLEAR_LANDING):
+      next_state = S_SEND_CLEAR
+      sel_takeoff_id_lock = self.state == S_CLEAR_TAKEOFF
+      cleared_id = self.takeoff_fifo.data_out if sel_takeoff_id_lock else self.landing_fifo.data_out
+      free = ~runway_active & self.all_runways
+      if free:
+        runway_id = (free & -free).bit_length() - 1
+        lock = True
+        reply = encode(cleared_id, T_CLEAR, runway_id)
+    elif self.state == S_DIVERT_LANDING:
+      next_state = S_SEND_CLEAR
+      reply = encode(self.landing_fifo.data_out, T_DIVERT, 0)
+      event = STAT_DIVERTS
+      sel_diverted_id = True
+      release_id = True
+    elif self.state == S_SEND_CLEAR:
+      next_state = S_WAIT
+      queue_reply = True
+
+    # Clock edge, every register below samples the values computed above
+    if queue_reply:
+      self.queue_reply()
+    if reply is not None:
+      self.reply_to_send = reply
+    if event is not None:
+      self.count(event)
+    if send_status:
+      self.status_word = self.counter(plane_id)
+      self.status_left = self.format.status_packets
+    elif send_status_packet:
+      self.status_word = (self.status_word << self.format.status_bits) & ((1 << STATUS_WIDTH) - 1)
+      self.status_left -= 1
+
+    cleared_id_to_lock = self.takeoff_fifo.data_out if sel_takeoff_id_lock else self.landing_fifo.data_out
+    id_in = self.landing_fifo.data_out if sel_diverted_id else plane_id
+    self.id_manager.clock(release_id, take_id, id_in)
+    self.runway_manager.clock(lock, unlock, runway_id, cleared_id_to_lock, plane_id)
+
+    self.uart_requests.clock(False, uart_rd_request, 0)
+    self.takeoff_fifo.clock(queue_takeoff_plane, unqueue_takeoff_plane, plane_id)
+    self.landing_fifo.clock(queue_landing_plane, unqueue_landing_plane, plane_id)
+    self.takeoff_high = max(self.takeoff_high, self.takeoff_fifo.count)
+    self.landing_high = max(self.landing_high, self.landing_fifo.count)
+
+    if set_emergency:
+      self.emergency_id = plane_id
+      self.emergency_reg = 1
+    elif unset_emergency:
+      self.emergency_reg = 0
+
+    if reverse_takeoff_first:
+      self.takeoff_first ^= 1
+    self.state = next_state
+    return True
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tty
+
+from bobATC_codec import *
+from bobATC_model import BobModel
+
+# A virtual bobATC on a pseudo-terminal, answered by the Python model, for
+# running bobATC_helper.py or any other client without a board. Replies go
+# out as soon as the model has them, or with pace at the pace of a real
+# UART: each request takes one frame to arrive and each reply one frame to
+# leave. The model assumes the replies to one request have left before the
+# next one arrives, which a client that waits for replies always satisfies.
+
+REQUEST_LOG = request_log(13)
+REPLY_LOG = reply_log(13)
+
+class VirtualBob:
+  def __init__(self, model=None, baudrate=BAUD_RATE, pace=False, verbose=False):
+    self.model = BobModel() if model is None else model
+    self.byte_time = FRAME_BITS / baudrate
+    self.pace = pace
+    self.verbose = verbose
+    self.master, self.slave = os.openpty()
+    tty.setraw(self.slave)
+    os.set_blocking(self.master, False)
+    self.name = os.ttyname(self.slave)
+    self.loop = None
+    self.pending = bytearray()
+    self.rx_done = 0
+    self.tx_done = 0
+    self.requests = 0
+    self.replies = 0
+
+  def start(self):
+    self.loop = asyncio.get_running_loop()
+    self.loop.add_reader(self.master, self.on_readable)
+
+  def stop(self):
+    self.loop.remove_reader(self.master)
+    self.loop.remove_writer(self.master)
+    os.close(self.master)
+    os.close(self.slave)
+
+  def on_readable(self):
+    try:
+      data = os.read(self.master, 4096)
+    except BlockingIOError:
+      return
+    now = self.loop.time()
+    replies = bytearray()
+    for packet in data:
+      answer = self.model.request(packet)
+      if self.verbose:
+        print(REQUEST_LOG[packet])
+        # A status reply's counter words are data, not messages
+        status = self.model.format.is_status_header(answer[0]) if answer else False
+        for i, reply in enumerate(answer):
+          if status and i > 0:
+            print(f"{'Bob':<13}: Status word {reply:#04x}")
+          elif REPLY_LOG[reply] is not None:
+            print(REPLY_LOG[reply])
+      if self.pace:
+        self.rx_done = max(self.rx_done, now) + self.byte_time
+        for reply in answer:
+          self.tx_done = max(self.tx_done, self.rx_done) + self.byte_time
+          self.loop.call_at(self.tx_done, self.write, bytes([reply]))
+      else:
+        replies += bytes(answer)
+      self.replies += len(answer)
+    self.requests += len(data)
+    if replies:
+      self.write(replies)
+
+  # A client that stops reading fills the pty, keep the rest until it reads
+  def write(self, data):
+    self.pending += data
+    self.flush()
+
+  def flush(self):
+    try:
+      written = os.write(self.master, self.pending)
+    except BlockingIOError:
+      written = 0
+    del self.pending[:written]
+    if self.pending:
+      self.loop.add_writer(self.master, self.flush)
+    else:
+      self.loop.remove_writer(self.master)
+
+# Reply latency of one request at a time and throughput of a pipelined
+# burst, measured with BobClient against the virtual device
+async def bench(bob, baudrate, packets):
+  from bobATC_helper import BobClient
+
+  # Any invalid message type gets a say again without changing Bob's state
+  packet = encode(0, T_SAY_AGAIN, 0)
+  async with BobClient(bob.name, baudrate, verbose=False) as client:
+    latencies = []
+    for _ in range(packets):
+      start = time.perf_counter()
+      await client.send(packet)
+      latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.wait_for(asyncio.gather(*(client.send_nowait(packet) for _ in range(packets))), 60)
+    burst = time.perf_counter() - start
+
+  latencies.sort()
+  print(f"Latency over {packets} requests: mean {statistics.mean(latencies) * 1e6:.0f} us, "
+        f"p50 {statistics.median(latencies) * 1e6:.0f} us, p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+  print(f"Pipelined {packets} requests in {burst * 1e3:.1f} ms, {packets / burst:.0f} requests/s")
+
+async def main(args):
+  bob = VirtualBob(BobModel(args.runway_override, args.emergency_override), args.baudrate, args.pace, args.verbose)
+  bob.start()
+  if args.link:
+    if os.path.lexists(args.link):
+      os.remove(args.link)
+    os.symlink(bob.name, args.link)
+
+  try:
+    if args.bench:
+      await bench(bob, args.baudrate, args.bench)
+      return
+    print(f"Virtual bobATC on {args.link or bob.name}, Ctrl-C to stop")
+    await asyncio.Event().wait()
+  finally:
+    bob.stop()
+    if args.link:
+      os.remove(args.link)
+    print(f"Answered {bob.requests} requests with {bob.replies} replies", file=sys.stderr)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Virtual bobATC on a pseudo-terminal")
+
+  parser.add_argument('--pace', help="send replies at UART speed instead of immediately", action="store_true")
+  parser.add_argument('--baudrate', help="UART baud rate used by --pace", type=int, default=BAUD_RATE)
+  parser.add_argument('--link', help="also make the pty available under this path")
+  parser.add_argument('--runway-override', help="runway_override pins", type=int, default=0b00)
+  parser.add_argument('--emergency-override', help="emergency_override pin", type=int, default=0b0)
+  parser.add_argument('--verbose', help="log every request and reply", action="store_true")
+  parser.add_argument('--bench', help="measure a BobClient against the virtual device with this many requests", type=int)
+
+  args = parser.parse_args()
+  try:
+    asyncio.run(main(args))
+  except KeyboardInterrupt:
+    pass
@@ -16,15 +16,22 @@ def load_yaml(yaml_file):
 
 
 def write_user_config(module_name, sources):
-    filename = 'user_config.tcl'
-    with open(os.path.join('src', filename), 'w') as fh:
-        fh.write("set ::env(DESIGN_NAME) {}\n".format(module_name))
-        fh.write('set ::env(VERILOG_FILES) "\\\n')
-        for line, source in enumerate(sources):
-            fh.write("    $::env(DESIGN_DIR)/" + source)
-            if line != len(sources) - 1:
-                fh.write(' \\\n')
-        fh.write('"\n')
+    filename = os.path.join('src', 'user_config.tcl')
+    config = "set ::env(DESIGN_NAME) {}\n".format(module_name)
+    config += 'set ::env(VERILOG_FILES) "\\\n'
+    config += ' \\\n'.join("    $::env(DESIGN_DIR)/" + source for source in sources)
+    config += '"\n'
+
+    # leave the file and its timestamp alone when nothing changed, so the
+    # flow does not see a new config on every run
+    if os.path.exists(filename):
+        with open(filename) as fh:
+            if fh.read() == config:
+                logging.info("{} is up to date".format(filename))
+                return
+
+    with open(filename, 'w') as fh:
+        fh.write(config)
 
 
 def fetch_file(url, filename):
@@ -1,6 +1,5 @@
 #!/bin/bash
 
-yosys -p "read_verilog BobFPGA.v; synth_ecp5 -json synth_out.json -top BobTop"
-nextpnr-ecp5 --12k --json synth_out.json --lpf constraints.lpf --textcfg pnr_out.config
-ecppack --compress pnr_out.config bitstream.bit
-fujprog bitstream.bit
+# Runs yosys, nextpnr and ecppack only for the stages whose inputs changed,
+# then programs the board, see fpga_build.py
+exec python3 "$(dirname "$0")/fpga_build.py" "$@"
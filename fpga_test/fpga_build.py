@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+
+# Incremental ECP5 build. Each stage is keyed by a SHA-256 of its command,
+# the contents of its input files and the version of the tool that runs it.
+# Outputs are stored in build_cache/<stage>/<key>, so a stage whose inputs
+# are unchanged copies its outputs from the cache instead of running again.
+# Editing the testbench, or switching back to a design that was built
+# before, costs no synthesis or place and route.
+#
+#   ./fpga_build.py              build and program with fujprog
+#   ./fpga_build.py --no-program
+#   YOSYS=yowasp-yosys ./fpga_build.py --no-program
+
+FPGA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(FPGA_DIR, "build_cache")
+
+YOSYS = os.environ.get("YOSYS", "yosys")
+NEXTPNR = os.environ.get("NEXTPNR", "nextpnr-ecp5")
+ECPPACK = os.environ.get("ECPPACK", "ecppack")
+FUJPROG = os.environ.get("FUJPROG", "fujprog")
+
+# (name, tool, version flag, command, inputs, outputs). info.yaml is not an
+# input: it names the top module and sources for configure.py and the ASIC
+# flow, while the board build reads only BobFPGA.v, which carries its own
+# BobTop, and constraints.lpf, so no change to info.yaml reaches the
+# bitstream.
+STAGES = [
+  ("synth", YOSYS, "-V",
+   [YOSYS, "-p", "read_verilog BobFPGA.v; synth_ecp5 -json synth_out.json -top BobTop"],
+   ["BobFPGA.v"], ["synth_out.json"]),
+  ("pnr", NEXTPNR, "--version",
+   [NEXTPNR, "--12k", "--json", "synth_out.json", "--lpf", "constraints.lpf", "--textcfg", "pnr_out.config"],
+   ["synth_out.json", "constraints.lpf"], ["pnr_out.config"]),
+  ("pack", ECPPACK, "--version",
+   [ECPPACK, "--compress", "pnr_out.config", "bitstream.bit"],
+   ["pnr_out.config"], ["bitstream.bit"]),
+]
+
+def tool_version(tool, flag):
+  try:
+    result = subprocess.run([tool, flag], capture_output=True, text=True)
+  except OSError:
+    sys.exit(f"{tool} not found, the YOSYS, NEXTPNR, ECPPACK and FUJPROG variables override the tools")
+  return (result.stdout + result.stderr).strip()
+
+def file_hash(filename):
+  digest = hashlib.sha256()
+  with open(os.path.join(FPGA_DIR, filename), "rb") as fh:
+    for block in iter(lambda: fh.read(1 << 20), b""):
+      digest.update(block)
+  return digest.hexdigest()
+
+# The tool's own name is left out of the command, so YOSYS=yowasp-yosys
+# shares a key with yosys when the versions match
+def stage_key(name, version, command, inputs):
+  digest = hashlib.sha256()
+  for part in [name, version] + command[1:]:
+    digest.update(part.encode() + b"\0")
+  for filename in inputs:
+    digest.update(filename.encode() + b"\0" + file_hash(filename).encode() + b"\0")
+  return digest.hexdigest()[:16]
+
+def run_stage(name, tool, flag, command, inputs, outputs, force=False):
+  key = stage_key(name, tool_version(tool, flag), command, inputs)
+  cached = os.path.join(CACHE_DIR, name, key)
+
+  if not force and all(os.path.exists(os.path.join(cached, output)) for output in outputs):
+    for output in outputs:
+      shutil.copyfile(os.path.join(cached, output), os.path.join(FPGA_DIR, output))
+    print(f"{name:<6} cached ({key})")
+    return False
+
+  print(f"{name:<6} running ({key}): {' '.join(command)}")
+  if subprocess.run(command, cwd=FPGA_DIR).returncode:
+    sys.exit(f"{name} failed")
+
+  # Copied to a temporary directory first, so an interrupted copy never
+  # looks like a finished cache entry
+  partial = cached + ".partial"
+  shutil.rmtree(partial, ignore_errors=True)
+  os.makedirs(partial)
+  for output in outputs:
+    shutil.copyfile(os.path.join(FPGA_DIR, output), os.path.join(partial, output))
+  shutil.rmtree(cached, ignore_errors=True)
+  os.rename(partial, cached)
+  return True
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Build the ECP5 bitstream, reusing cached stages")
+
+  parser.add_argument('--no-program', help="stop after building bitstream.bit", action='store_true')
+  parser.add_argument('--force', help="run every stage even when cached", action='store_true')
+  parser.add_argument('--clean-cache', help="delete the build cache first", action='store_true')
+
+  args = parser.parse_args()
+
+  if args.clean_cache:
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+  for stage in STAGES:
+    run_stage(*stage, force=args.force)
+
+  if not args.no_program:
+    sys.exit(subprocess.run([FUJPROG, "bitstream.bit"], cwd=FPGA_DIR).returncode)
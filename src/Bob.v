@@ -6,6 +6,7 @@ module BobTop (
 	rx,
 	runway_override,
 	emergency_override,
+	baud_divisor,
 	tx,
 	framing_error,
 	runway_active,
@@ -13,14 +14,22 @@ module BobTop (
 	receiving,
 	sending
 );
+	parameter signed [31:0] CLK_HZ = 25000000;
+	parameter signed [31:0] BAUD_RATE = 115200;
+	parameter signed [31:0] DIVISOR_WIDTH = 8;
+	parameter signed [31:0] ID_WIDTH = 4;
+	parameter signed [31:0] QUEUE_DEPTH = 8;
+	parameter signed [31:0] RUNWAYS = 2;
+	parameter signed [31:0] REPLY_DEPTH = QUEUE_DEPTH;
 	input wire clock;
 	input wire reset;
 	input wire rx;
-	input wire [1:0] runway_override;
+	input wire [RUNWAYS - 1:0] runway_override;
 	input wire emergency_override;
+	input wire [DIVISOR_WIDTH - 1:0] baud_divisor;
 	output wire tx;
 	output wire framing_error;
-	output wire [1:0] runway_active;
+	output wire [RUNWAYS - 1:0] runway_active;
 	output wire emergency;
 	output wire receiving;
 	output wire sending;
@@ -30,31 +39,35 @@ module BobTop (
 	wire uart_tx_ready;
 	wire uart_tx_send;
 	UartRX #(
-		.CLK_HZ(25000000),
-		.BAUD_RATE(115200)
+		.CLK_HZ(CLK_HZ),
+		.BAUD_RATE(BAUD_RATE),
+		.DIVISOR_WIDTH(DIVISOR_WIDTH)
 	) receiver(
 		.clock(clock),
 		.reset(reset),
 		.rx(rx),
+		.divisor(baud_divisor),
 		.data(uart_rx_data),
 		.done(uart_rx_valid),
 		.framing_error(framing_error),
 		.receiving(receiving)
 	);
 	UartTX #(
-		.CLK_HZ(25000000),
-		.BAUD_RATE(115200)
+		.CLK_HZ(CLK_HZ),
+		.BAUD_RATE(BAUD_RATE),
+		.DIVISOR_WIDTH(DIVISOR_WIDTH)
 	) transmitter(
 		.clock(clock),
 		.reset(reset),
+		.divisor(baud_divisor),
 		.send(uart_tx_send),
 		.data(uart_tx_data),
 		.tx(tx),
 		.ready(uart_tx_ready),
 		.sending(sending)
 	);
-	reg [1:0] ro_temp;
-	reg [1:0] ro_sync;
+	reg [RUNWAYS - 1:0] ro_temp;
+	reg [RUNWAYS - 1:0] ro_sync;
 	reg eo_temp;
 	reg eo_sync;
 	always @(posedge clock) begin
@@ -63,11 +76,17 @@ module BobTop (
 		ro_sync <= ro_temp;
 		eo_sync <= eo_temp;
 	end
-	Bob bobby(
+	Bob #(
+		.ID_WIDTH(ID_WIDTH),
+		.QUEUE_DEPTH(QUEUE_DEPTH),
+		.RUNWAYS(RUNWAYS),
+		.REPLY_DEPTH(REPLY_DEPTH)
+	) bobby(
 		.clock(clock),
 		.reset(reset),
 		.uart_rx_data(uart_rx_data),
 		.uart_rx_valid(uart_rx_valid),
+		.uart_rx_error(framing_error),
 		.uart_tx_data(uart_tx_data),
 		.uart_tx_ready(uart_tx_ready),
 		.uart_tx_send(uart_tx_send),
@@ -82,6 +101,7 @@ module Bob (
 	reset,
 	uart_rx_data,
 	uart_rx_valid,
+	uart_rx_error,
 	runway_override,
 	emergency_override,
 	uart_tx_data,
@@ -90,104 +110,160 @@ module Bob (
 	runway_active,
 	emergency_out
 );
+	parameter signed [31:0] ID_WIDTH = 4;
+	parameter signed [31:0] QUEUE_DEPTH = 8;
+	parameter signed [31:0] RUNWAYS = 2;
+	// Deep enough by default for an emergency to divert a full landing_fifo
+	// without ReadRequestFsm waiting on UartTX
+	parameter signed [31:0] REPLY_DEPTH = QUEUE_DEPTH;
+	localparam signed [31:0] ACTION_WIDTH = (RUNWAYS > 2 ? $clog2(RUNWAYS) : 1);
+	localparam signed [31:0] PACKET_WIDTH = (ID_WIDTH + 3) + ACTION_WIDTH;
+	localparam signed [31:0] PACKET_BYTES = (PACKET_WIDTH + 7) / 8;
+	// A status reply sends its 16 bit counter 8 bits per packet, or fewer
+	// when packets are narrower, most significant bits first
+	localparam signed [31:0] STATUS_BITS = (PACKET_WIDTH < 8 ? PACKET_WIDTH : 8);
+	localparam signed [31:0] STATUS_PACKETS = ((16 + STATUS_BITS) - 1) / STATUS_BITS;
 	input wire clock;
 	input wire reset;
 	input wire [7:0] uart_rx_data;
 	input wire uart_rx_valid;
-	input wire [1:0] runway_override;
+	input wire uart_rx_error;
+	input wire [RUNWAYS - 1:0] runway_override;
 	input wire emergency_override;
 	output wire [7:0] uart_tx_data;
 	input wire uart_tx_ready;
 	output wire uart_tx_send;
-	output wire [1:0] runway_active;
+	output wire [RUNWAYS - 1:0] runway_active;
 	output wire emergency_out;
-	wire [7:0] uart_request;
+	wire [PACKET_WIDTH - 1:0] uart_request;
+	wire [PACKET_WIDTH - 1:0] rx_packet;
+	wire rx_packet_valid;
 	wire uart_rd_request;
 	wire uart_empty;
-	wire runway_id;
+	wire uart_full;
+	wire [2:0] uart_count;
+	wire [ACTION_WIDTH - 1:0] runway_id;
 	wire lock;
 	wire unlock;
-	reg [3:0] cleared_id_to_lock;
+	reg [ID_WIDTH - 1:0] cleared_id_to_lock;
 	wire sel_takeoff_id_lock;
-	wire [9:0] runway;
+	wire [(RUNWAYS * (ID_WIDTH + 1)) - 1:0] runway;
 	wire queue_takeoff_plane;
 	wire unqueue_takeoff_plane;
-	wire [3:0] cleared_takeoff_id;
+	wire [ID_WIDTH - 1:0] cleared_takeoff_id;
 	wire takeoff_fifo_full;
 	wire takeoff_fifo_empty;
+	wire [$clog2(QUEUE_DEPTH):0] takeoff_count;
 	wire queue_landing_plane;
 	wire unqueue_landing_plane;
-	wire [3:0] cleared_landing_id;
+	wire [ID_WIDTH - 1:0] cleared_landing_id;
 	wire landing_fifo_full;
 	wire landing_fifo_empty;
+	wire [$clog2(QUEUE_DEPTH):0] landing_count;
 	wire send_hold;
 	wire send_say_ag;
 	wire send_divert;
 	wire send_divert_landing;
 	wire send_valid_id;
 	wire send_invalid_id;
+	wire send_status;
+	wire send_status_packet;
+	wire count_request;
 	wire [1:0] send_clear;
-	reg [7:0] reply_to_send;
+	reg [PACKET_WIDTH - 1:0] reply_to_send;
+	wire [PACKET_WIDTH - 1:0] reply_out;
 	wire send_reply;
 	wire queue_reply;
 	wire reply_fifo_full;
 	wire reply_fifo_empty;
+	wire [$clog2(REPLY_DEPTH):0] reply_count;
+	wire [15:0] counter_value;
+	reg [15:0] status_word;
+	reg [2:0] status_left;
+	wire status_pending;
 	reg emergency;
 	wire set_emergency;
 	wire unset_emergency;
-	reg [3:0] emergency_id;
+	reg [ID_WIDTH - 1:0] emergency_id;
+	// Packets wider than a byte arrive most significant byte first
+	generate
+		if (PACKET_BYTES == 1) begin : genblk_rx
+			assign rx_packet = uart_rx_data;
+			assign rx_packet_valid = uart_rx_valid;
+		end
+		else begin : genblk_rx
+			reg [((PACKET_BYTES - 1) * 8) - 1:0] rx_bytes;
+			reg [$clog2(PACKET_BYTES) - 1:0] rx_count;
+			assign rx_packet = {rx_bytes, uart_rx_data};
+			assign rx_packet_valid = uart_rx_valid && (rx_count == (PACKET_BYTES - 1));
+			always @(posedge clock)
+				if (reset)
+					rx_count <= 0;
+				else if (uart_rx_valid) begin
+					if (rx_count == (PACKET_BYTES - 1))
+						rx_count <= 0;
+					else begin
+						rx_bytes <= {rx_bytes, uart_rx_data};
+						rx_count <= rx_count + 1;
+					end
+				end
+		end
+	endgenerate
 	FIFO #(
-		.WIDTH(8),
+		.WIDTH(PACKET_WIDTH),
 		.DEPTH(4)
 	) uart_requests(
 		.clock(clock),
 		.reset(reset),
-		.data_in(uart_rx_data),
-		.we(uart_rx_valid),
+		.data_in(rx_packet),
+		.we(rx_packet_valid),
 		.re(uart_rd_request),
-		.data_out({uart_request[7-:4], uart_request[3-:3], uart_request[0]}),
-		.full(),
-		.empty(uart_empty)
+		.data_out(uart_request),
+		.full(uart_full),
+		.empty(uart_empty),
+		.count(uart_count)
 	);
 	FIFO #(
-		.WIDTH(4),
-		.DEPTH(8)
+		.WIDTH(ID_WIDTH),
+		.DEPTH(QUEUE_DEPTH)
 	) takeoff_fifo(
 		.clock(clock),
 		.reset(reset),
-		.data_in(uart_request[7-:4]),
+		.data_in(uart_request[PACKET_WIDTH - 1-:ID_WIDTH]),
 		.we(queue_takeoff_plane),
 		.re(unqueue_takeoff_plane),
 		.data_out(cleared_takeoff_id),
 		.full(takeoff_fifo_full),
-		.empty(takeoff_fifo_empty)
+		.empty(takeoff_fifo_empty),
+		.count(takeoff_count)
 	);
 	FIFO #(
-		.WIDTH(4),
-		.DEPTH(8)
+		.WIDTH(ID_WIDTH),
+		.DEPTH(QUEUE_DEPTH)
 	) landing_fifo(
 		.clock(clock),
 		.reset(reset),
-		.data_in(uart_request[7-:4]),
+		.data_in(uart_request[PACKET_WIDTH - 1-:ID_WIDTH]),
 		.we(queue_landing_plane),
 		.re(unqueue_landing_plane),
 		.data_out(cleared_landing_id),
 		.full(landing_fifo_full),
-		.empty(landing_fifo_empty)
+		.empty(landing_fifo_empty),
+		.count(landing_count)
 	);
-	wire [3:0] new_id;
-	reg [3:0] id_in;
+	wire [ID_WIDTH - 1:0] new_id;
+	reg [ID_WIDTH - 1:0] id_in;
 	wire sel_diverted_id;
 	wire take_id;
 	wire release_id;
 	wire id_full;
-	wire [15:0] all_id;
+	wire [(2 ** ID_WIDTH) - 1:0] all_id;
 	always @(*)
 		if (sel_diverted_id)
 			id_in = cleared_landing_id;
 		else
-			id_in = uart_request[7-:4];
-	AircraftIDManager id_manager(
+			id_in = uart_request[PACKET_WIDTH - 1-:ID_WIDTH];
+	AircraftIDManager #(.ID_WIDTH(ID_WIDTH)) id_manager(
 		.clock(clock),
 		.reset(reset),
 		.id_in(id_in),
@@ -197,7 +273,11 @@ module Bob (
 		.all_id(all_id),
 		.full(id_full)
 	);
-	ReadRequestFsm fsm(
+	ReadRequestFsm #(
+		.ID_WIDTH(ID_WIDTH),
+		.RUNWAYS(RUNWAYS),
+		.ACTION_WIDTH(ACTION_WIDTH)
+	) fsm(
 		.emergency(emergency_out),
 		.clock(clock),
 		.reset(reset),
@@ -208,6 +288,7 @@ module Bob (
 		.takeoff_fifo_empty(takeoff_fifo_empty),
 		.landing_fifo_empty(landing_fifo_empty),
 		.reply_fifo_full(reply_fifo_full),
+		.status_pending(status_pending),
 		.runway_active(runway_active),
 		.all_id(all_id),
 		.id_full(id_full),
@@ -225,6 +306,9 @@ module Bob (
 		.send_divert_landing(send_divert_landing),
 		.send_invalid_id(send_invalid_id),
 		.send_valid_id(send_valid_id),
+		.send_status(send_status),
+		.send_status_packet(send_status_packet),
+		.count_request(count_request),
 		.queue_reply(queue_reply),
 		.lock(lock),
 		.unlock(unlock),
@@ -241,76 +325,144 @@ module Bob (
 			reply_to_send <= 0;
 		else if (send_clear[0] ^ send_clear[1]) begin
 			if (send_clear[0]) begin
-				reply_to_send[7-:4] <= cleared_takeoff_id;
-				reply_to_send[3-:3] <= 3'b011;
-				reply_to_send[0] <= runway_id;
+				reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= cleared_takeoff_id;
+				reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b011;
+				reply_to_send[ACTION_WIDTH - 1:0] <= runway_id;
 			end
 			else if (send_clear[1]) begin
-				reply_to_send[7-:4] <= cleared_landing_id;
-				reply_to_send[3-:3] <= 3'b011;
-				reply_to_send[0] <= runway_id;
+				reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= cleared_landing_id;
+				reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b011;
+				reply_to_send[ACTION_WIDTH - 1:0] <= runway_id;
 			end
 		end
 		else if (send_hold) begin
-			reply_to_send[7-:4] <= uart_request[7-:4];
-			reply_to_send[3-:3] <= 3'b100;
-			reply_to_send[0] <= 1'b0;
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= uart_request[PACKET_WIDTH - 1-:ID_WIDTH];
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b100;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1'sb0;
 		end
 		else if (send_say_ag) begin
-			reply_to_send[7-:4] <= uart_request[7-:4];
-			reply_to_send[3-:3] <= 3'b101;
-			reply_to_send[0] <= 1'b0;
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= uart_request[PACKET_WIDTH - 1-:ID_WIDTH];
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b101;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1'sb0;
 		end
 		else if (send_divert) begin
-			reply_to_send[7-:4] <= uart_request[7-:4];
-			reply_to_send[3-:3] <= 3'b110;
-			reply_to_send[0] <= 1'b0;
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= uart_request[PACKET_WIDTH - 1-:ID_WIDTH];
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b110;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1'sb0;
 		end
 		else if (send_divert_landing) begin
-			reply_to_send[7-:4] <= cleared_landing_id;
-			reply_to_send[3-:3] <= 3'b110;
-			reply_to_send[0] <= 1'b0;
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= cleared_landing_id;
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b110;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1'sb0;
 		end
 		else if (send_invalid_id) begin
-			reply_to_send[7-:4] <= 4'd0;
-			reply_to_send[3-:3] <= 3'b111;
-			reply_to_send[0] <= 1'b1;
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= 1'sb0;
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b111;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1;
 		end
 		else if (send_valid_id) begin
-			reply_to_send[7-:4] <= new_id;
-			reply_to_send[3-:3] <= 3'b111;
-			reply_to_send[0] <= 1'b0;
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= new_id;
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b111;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1'sb0;
+		end
+		else if (send_status) begin
+			reply_to_send[PACKET_WIDTH - 1-:ID_WIDTH] <= uart_request[PACKET_WIDTH - 1-:ID_WIDTH];
+			reply_to_send[ACTION_WIDTH + 2-:3] <= 3'b101;
+			reply_to_send[ACTION_WIDTH - 1:0] <= 1;
+		end
+		else if (send_status_packet)
+			reply_to_send <= status_word[15-:STATUS_BITS];
+	// The counter a status query names is latched when it is read, then
+	// shifted out one packet at a time behind the SAY_AGAIN header
+	PerfCounters #(
+		.ID_WIDTH(ID_WIDTH),
+		.QUEUE_DEPTH(QUEUE_DEPTH),
+		.REPLY_DEPTH(REPLY_DEPTH)
+	) counters(
+		.clock(clock),
+		.reset(reset),
+		.select(uart_request[PACKET_WIDTH - 1-:ID_WIDTH]),
+		.count_request(count_request),
+		.count_hold(send_hold),
+		.count_divert(send_divert | send_divert_landing),
+		.count_say_again(send_say_ag),
+		.framing_error(uart_rx_error),
+		.request_drop((rx_packet_valid && uart_full) && !uart_rd_request),
+		.request_count(uart_count),
+		.reply_count(reply_count),
+		.takeoff_count(takeoff_count),
+		.landing_count(landing_count),
+		.value(counter_value)
+	);
+	assign status_pending = status_left != 0;
+	always @(posedge clock)
+		if (reset) begin
+			status_word <= 1'sb0;
+			status_left <= 1'sb0;
+		end
+		else if (send_status) begin
+			status_word <= counter_value;
+			status_left <= STATUS_PACKETS;
+		end
+		else if (send_status_packet) begin
+			status_word <= status_word << STATUS_BITS;
+			status_left <= status_left - 1;
 		end
 	FIFO #(
-		.WIDTH(8),
-		.DEPTH(4)
+		.WIDTH(PACKET_WIDTH),
+		.DEPTH(REPLY_DEPTH)
 	) uart_replies(
 		.clock(clock),
 		.reset(reset),
 		.data_in(reply_to_send),
 		.we(queue_reply),
 		.re(send_reply),
-		.data_out(uart_tx_data),
+		.data_out(reply_out),
 		.full(reply_fifo_full),
-		.empty(reply_fifo_empty)
-	);
-	SendReplyFsm reply_fsm(
-		.clock(clock),
-		.reset(reset),
-		.uart_tx_ready(uart_tx_ready),
-		.reply_fifo_empty(reply_fifo_empty),
-		.send_reply(send_reply),
-		.uart_tx_send(uart_tx_send)
+		.empty(reply_fifo_empty),
+		.count(reply_count)
 	);
+	generate
+		if (PACKET_BYTES == 1) begin : genblk_tx
+			assign uart_tx_data = reply_out;
+			SendReplyFsm reply_fsm(
+				.clock(clock),
+				.reset(reset),
+				.uart_tx_ready(uart_tx_ready),
+				.reply_fifo_empty(reply_fifo_empty),
+				.send_reply(send_reply),
+				.uart_tx_send(uart_tx_send)
+			);
+		end
+		else begin : genblk_tx
+			wire [(PACKET_BYTES * 8) - 1:0] reply_bytes;
+			wire [$clog2(PACKET_BYTES) - 1:0] tx_byte;
+			assign reply_bytes = reply_out;
+			assign uart_tx_data = reply_bytes[((PACKET_BYTES - 1) - tx_byte) * 8+:8];
+			SendPacketFsm #(.BYTES(PACKET_BYTES)) reply_fsm(
+				.clock(clock),
+				.reset(reset),
+				.uart_tx_ready(uart_tx_ready),
+				.reply_fifo_empty(reply_fifo_empty),
+				.send_reply(send_reply),
+				.uart_tx_send(uart_tx_send),
+				.tx_byte(tx_byte)
+			);
+		end
+	endgenerate
 	always @(*)
 		if (sel_takeoff_id_lock)
 			cleared_id_to_lock = cleared_takeoff_id;
 		else
 			cleared_id_to_lock = cleared_landing_id;
-	RunwayManager runway_manager(
+	RunwayManager #(
+		.ID_WIDTH(ID_WIDTH),
+		.RUNWAYS(RUNWAYS),
+		.ACTION_WIDTH(ACTION_WIDTH)
+	) runway_manager(
 		.clock(clock),
 		.reset(reset),
-		.plane_id_unlock(uart_request[7-:4]),
+		.plane_id_unlock(uart_request[PACKET_WIDTH - 1-:ID_WIDTH]),
 		.plane_id_lock(cleared_id_to_lock),
 		.runway_id(runway_id),
 		.lock(lock),
@@ -321,11 +473,11 @@ module Bob (
 	);
 	always @(posedge clock)
 		if (reset) begin
-			emergency_id <= 4'd0;
+			emergency_id <= 1'sb0;
 			emergency <= 1'b0;
 		end
 		else if (set_emergency) begin
-			emergency_id <= uart_request[7-:4];
+			emergency_id <= uart_request[PACKET_WIDTH - 1-:ID_WIDTH];
 			emergency <= 1'b1;
 		end
 		else if (unset_emergency)
@@ -342,6 +494,7 @@ module ReadRequestFsm (
 	takeoff_fifo_empty,
 	landing_fifo_empty,
 	reply_fifo_full,
+	status_pending,
 	runway_active,
 	emergency,
 	all_id,
@@ -360,6 +513,9 @@ module ReadRequestFsm (
 	send_divert_landing,
 	send_invalid_id,
 	send_valid_id,
+	send_status,
+	send_status_packet,
+	count_request,
 	queue_reply,
 	lock,
 	unlock,
@@ -371,21 +527,25 @@ module ReadRequestFsm (
 	sel_takeoff_id_lock,
 	sel_diverted_id
 );
+	parameter signed [31:0] ID_WIDTH = 4;
+	parameter signed [31:0] RUNWAYS = 2;
+	parameter signed [31:0] ACTION_WIDTH = 1;
 	input wire clock;
 	input wire reset;
 	input wire uart_empty;
-	input wire [7:0] uart_request;
+	input wire [((ID_WIDTH + 3) + ACTION_WIDTH) - 1:0] uart_request;
 	input wire takeoff_fifo_full;
 	input wire landing_fifo_full;
 	input wire takeoff_fifo_empty;
 	input wire landing_fifo_empty;
 	input wire reply_fifo_full;
-	input wire [1:0] runway_active;
+	input wire status_pending;
+	input wire [RUNWAYS - 1:0] runway_active;
 	input wire emergency;
-	input wire [15:0] all_id;
+	input wire [(2 ** ID_WIDTH) - 1:0] all_id;
 	input wire id_full;
-	input wire [3:0] emergency_id;
-	input wire [9:0] runway;
+	input wire [ID_WIDTH - 1:0] emergency_id;
+	input wire [(RUNWAYS * (ID_WIDTH + 1)) - 1:0] runway;
 	output reg uart_rd_request;
 	output reg queue_takeoff_plane;
 	output reg queue_landing_plane;
@@ -398,24 +558,38 @@ module ReadRequestFsm (
 	output reg send_divert_landing;
 	output reg send_invalid_id;
 	output reg send_valid_id;
+	output reg send_status;
+	output reg send_status_packet;
+	output reg count_request;
 	output reg queue_reply;
 	output reg lock;
 	output reg unlock;
-	output reg runway_id;
+	output reg [ACTION_WIDTH - 1:0] runway_id;
 	output reg set_emergency;
 	output reg unset_emergency;
 	output reg take_id;
 	output reg release_id;
 	output reg sel_takeoff_id_lock;
 	output reg sel_diverted_id;
-	wire [3:0] plane_id;
+	wire [ID_WIDTH - 1:0] plane_id;
 	wire [2:0] msg_type;
-	wire [1:0] msg_action;
+	wire [ACTION_WIDTH - 1:0] msg_action;
 	reg takeoff_first;
 	reg reverse_takeoff_first;
-	assign plane_id = uart_request[7-:4];
-	assign msg_type = uart_request[3-:3];
-	assign msg_action = uart_request[0];
+	reg [ACTION_WIDTH - 1:0] free_runway;
+	assign plane_id = uart_request[(ID_WIDTH + 2) + ACTION_WIDTH-:ID_WIDTH];
+	assign msg_type = uart_request[ACTION_WIDTH + 2-:3];
+	assign msg_action = uart_request[ACTION_WIDTH - 1:0];
+	// Lowest numbered runway that is not active
+	always @(*) begin
+		free_runway = 0;
+		begin : sv2v_autoblock_1
+			reg signed [31:0] i;
+			for (i = RUNWAYS - 1; i >= 0; i = i - 1)
+				if (!runway_active[i])
+					free_runway = i;
+		end
+	end
 	reg [2:0] state;
 	reg [2:0] next_state;
 	always @(*) begin
@@ -431,10 +605,13 @@ module ReadRequestFsm (
 		send_divert_landing = 1'b0;
 		send_invalid_id = 1'b0;
 		send_valid_id = 1'b0;
+		send_status = 1'b0;
+		send_status_packet = 1'b0;
+		count_request = 1'b0;
 		queue_reply = 1'b0;
 		lock = 1'b0;
 		unlock = 1'b0;
-		runway_id = 1'b0;
+		runway_id = 1'sb0;
 		set_emergency = 1'b0;
 		unset_emergency = 1'b0;
 		take_id = 1'b0;
@@ -454,7 +631,7 @@ module ReadRequestFsm (
 						else
 							next_state = 3'b000;
 					end
-					else if (runway_active != 2'b11) begin
+					else if (!(&runway_active)) begin
 						if (!takeoff_fifo_empty && !landing_fifo_empty) begin
 							if (takeoff_first) begin
 								next_state = 3'b100;
@@ -483,11 +660,12 @@ module ReadRequestFsm (
 					next_state = 3'b001;
 					uart_rd_request = 1'b1;
 				end
-			3'b001:
+			3'b001: begin
+				count_request = 1'b1;
 				if (msg_type == 3'b000) begin
 					if (all_id[plane_id]) begin
 						next_state = 3'b010;
-						if (msg_action == 1'b0) begin
+						if (msg_action[0] == 1'b0) begin
 							if (takeoff_fifo_full) begin
 								send_divert = 1'b1;
 								release_id = 1'b1;
@@ -497,7 +675,7 @@ module ReadRequestFsm (
 								send_hold = 1'b1;
 							end
 						end
-						else if (msg_action == 1'b1) begin
+						else if (msg_action[0] == 1'b1) begin
 							if (landing_fifo_full || emergency) begin
 								send_divert = 1'b1;
 								release_id = 1'b1;
@@ -514,24 +692,18 @@ module ReadRequestFsm (
 				else if (msg_type == 3'b001) begin
 					if (all_id[plane_id]) begin
 						next_state = 3'b011;
-						if (!msg_action) begin
-							if ((runway[4-:4] == plane_id) && runway[0])
-								release_id = 1'b1;
-							unlock = 1'b1;
-							runway_id = 1'b0;
-						end
-						else if (msg_action) begin
-							if ((runway[9-:4] == plane_id) && runway[5])
+						if (msg_action < RUNWAYS) begin
+							if ((runway[(msg_action * (ID_WIDTH + 1)) + 1+:ID_WIDTH] == plane_id) && runway[msg_action * (ID_WIDTH + 1)])
 								release_id = 1'b1;
 							unlock = 1'b1;
-							runway_id = 1'b1;
+							runway_id = msg_action;
 						end
 					end
 					else
 						next_state = 3'b011;
 				end
 				else if (msg_type == 3'b010) begin
-					if (msg_action == 1'b1) begin
+					if (msg_action[0] == 1'b1) begin
 						if (!landing_fifo_empty) begin
 							next_state = 3'b110;
 							unqueue_landing_plane = 1'b1;
@@ -540,7 +712,7 @@ module ReadRequestFsm (
 							next_state = 3'b000;
 						set_emergency = 1'b1;
 					end
-					else if (msg_action == 1'b0) begin
+					else if (msg_action[0] == 1'b0) begin
 						next_state = 3'b011;
 						if (emergency_id == plane_id)
 							unset_emergency = 1'b1;
@@ -556,13 +728,26 @@ module ReadRequestFsm (
 						take_id = 1'b1;
 					end
 				end
+				else if ((msg_type == 3'b101) && (msg_action == 1)) begin
+					// Only Bob sends SAY_AGAIN, from the host with action 1 it
+					// is a status query for the counter the ID names
+					next_state = 3'b010;
+					send_status = 1'b1;
+					count_request = 1'b0;
+				end
 				else begin
 					next_state = 3'b010;
 					send_say_ag = 1'b1;
 				end
+			end
 			3'b010:
 				if (reply_fifo_full)
 					next_state = 3'b010;
+				else if (status_pending) begin
+					next_state = 3'b010;
+					queue_reply = 1'b1;
+					send_status_packet = 1'b1;
+				end
 				else begin
 					next_state = 3'b011;
 					queue_reply = 1'b1;
@@ -576,7 +761,7 @@ module ReadRequestFsm (
 					else
 						next_state = 3'b000;
 				end
-				else if (runway_active != 2'b11) begin
+				else if (!(&runway_active)) begin
 					if (!takeoff_fifo_empty && !landing_fifo_empty) begin
 						if (takeoff_first) begin
 							next_state = 3'b100;
@@ -605,26 +790,16 @@ module ReadRequestFsm (
 			3'b100: begin
 				next_state = 3'b111;
 				sel_takeoff_id_lock = 1'b1;
-				if (!runway_active[0]) begin
-					runway_id = 1'b0;
-					lock = 1'b1;
-					send_clear = 2'b01;
-				end
-				else if (!runway_active[1]) begin
-					runway_id = 1'b1;
+				if (!(&runway_active)) begin
+					runway_id = free_runway;
 					lock = 1'b1;
 					send_clear = 2'b01;
 				end
 			end
 			3'b101: begin
 				next_state = 3'b111;
-				if (!runway_active[0]) begin
-					runway_id = 1'b0;
-					lock = 1'b1;
-					send_clear = 2'b10;
-				end
-				else if (!runway_active[1]) begin
-					runway_id = 1'b1;
+				if (!(&runway_active)) begin
+					runway_id = free_runway;
 					lock = 1'b1;
 					send_clear = 2'b10;
 				end
@@ -635,10 +810,13 @@ module ReadRequestFsm (
 				sel_diverted_id = 1'b1;
 				release_id = 1'b1;
 			end
-			3'b111: begin
-				next_state = 3'b000;
-				queue_reply = 1'b1;
-			end
+			3'b111:
+				if (reply_fifo_full)
+					next_state = 3'b111;
+				else begin
+					next_state = 3'b000;
+					queue_reply = 1'b1;
+				end
 			default: next_state = 3'b000;
 		endcase
 	end
@@ -693,6 +871,64 @@ module SendReplyFsm (
 		else
 			state <= next_state;
 endmodule
+// Sends a reply of BYTES bytes, most significant first, from the FIFO's
+// data_out, which holds still until the next send_reply
+module SendPacketFsm (
+	clock,
+	reset,
+	uart_tx_ready,
+	reply_fifo_empty,
+	send_reply,
+	uart_tx_send,
+	tx_byte
+);
+	parameter signed [31:0] BYTES = 2;
+	input wire clock;
+	input wire reset;
+	input wire uart_tx_ready;
+	input wire reply_fifo_empty;
+	output reg send_reply;
+	output reg uart_tx_send;
+	output reg [$clog2(BYTES) - 1:0] tx_byte;
+	reg [1:0] state;
+	reg [1:0] next_state;
+	always @(*) begin
+		send_reply = 1'b0;
+		uart_tx_send = 1'b0;
+		case (state)
+			2'd0:
+				if (reply_fifo_empty || !uart_tx_ready)
+					next_state = 2'd0;
+				else begin
+					next_state = 2'd1;
+					send_reply = 1'b1;
+				end
+			2'd1: begin
+				uart_tx_send = 1'b1;
+				if (tx_byte == (BYTES - 1))
+					next_state = 2'd0;
+				else
+					next_state = 2'd2;
+			end
+			2'd2:
+				if (uart_tx_ready)
+					next_state = 2'd1;
+				else
+					next_state = 2'd2;
+			default: next_state = 2'd0;
+		endcase
+	end
+	always @(posedge clock)
+		if (reset) begin
+			state <= 2'd0;
+			tx_byte <= 0;
+		end
+		else begin
+			state <= next_state;
+			if (state == 2'd1)
+				tx_byte <= (tx_byte == (BYTES - 1) ? 0 : tx_byte + 1);
+		end
+endmodule
 module FIFO (
 	clock,
 	reset,
@@ -701,7 +937,8 @@ module FIFO (
 	re,
 	data_out,
 	full,
-	empty
+	empty,
+	count
 );
 	parameter signed [31:0] WIDTH = 8;
 	parameter signed [31:0] DEPTH = 4;
@@ -713,8 +950,8 @@ module FIFO (
 	output reg [WIDTH - 1:0] data_out;
 	output wire full;
 	output wire empty;
+	output reg [$clog2(DEPTH):0] count;
 	reg [(DEPTH * WIDTH) - 1:0] queue;
-	reg [$clog2(DEPTH):0] count;
 	reg [$clog2(DEPTH) - 1:0] put_ptr;
 	reg [$clog2(DEPTH) - 1:0] get_ptr;
 	assign empty = count == 0;
@@ -743,6 +980,103 @@ module FIFO (
 			count <= count + 1;
 		end
 endmodule
+module PerfCounters (
+	clock,
+	reset,
+	select,
+	count_request,
+	count_hold,
+	count_divert,
+	count_say_again,
+	framing_error,
+	request_drop,
+	request_count,
+	reply_count,
+	takeoff_count,
+	landing_count,
+	value
+);
+	parameter signed [31:0] ID_WIDTH = 4;
+	parameter signed [31:0] QUEUE_DEPTH = 8;
+	parameter signed [31:0] REPLY_DEPTH = QUEUE_DEPTH;
+	input wire clock;
+	input wire reset;
+	input wire [ID_WIDTH - 1:0] select;
+	input wire count_request;
+	input wire count_hold;
+	input wire count_divert;
+	input wire count_say_again;
+	input wire framing_error;
+	input wire request_drop;
+	input wire [2:0] request_count;
+	input wire [$clog2(REPLY_DEPTH):0] reply_count;
+	input wire [$clog2(QUEUE_DEPTH):0] takeoff_count;
+	input wire [$clog2(QUEUE_DEPTH):0] landing_count;
+	output reg [15:0] value;
+	// Event counters wrap, FIFO high-water marks stop at 255
+	reg [15:0] requests;
+	reg [15:0] holds;
+	reg [15:0] diverts;
+	reg [15:0] say_agains;
+	reg [15:0] framing_errors;
+	reg [15:0] request_drops;
+	reg [7:0] request_high;
+	reg [7:0] reply_high;
+	reg [7:0] takeoff_high;
+	reg [7:0] landing_high;
+	reg framing_error_last;
+	always @(*)
+		case (select)
+			0: value = requests;
+			1: value = holds;
+			2: value = diverts;
+			3: value = say_agains;
+			4: value = framing_errors;
+			5: value = request_drops;
+			6: value = {request_high, reply_high};
+			7: value = {takeoff_high, landing_high};
+			default: value = 1'sb0;
+		endcase
+	// A FIFO count moves by at most one a clock, so stepping the mark up
+	// by one follows it to its peak
+	always @(posedge clock)
+		if (reset) begin
+			requests <= 1'sb0;
+			holds <= 1'sb0;
+			diverts <= 1'sb0;
+			say_agains <= 1'sb0;
+			framing_errors <= 1'sb0;
+			request_drops <= 1'sb0;
+			request_high <= 1'sb0;
+			reply_high <= 1'sb0;
+			takeoff_high <= 1'sb0;
+			landing_high <= 1'sb0;
+			framing_error_last <= 1'b0;
+		end
+		else begin
+			if (count_request)
+				requests <= requests + 1;
+			if (count_hold)
+				holds <= holds + 1;
+			if (count_divert)
+				diverts <= diverts + 1;
+			if (count_say_again)
+				say_agains <= say_agains + 1;
+			if (framing_error && !framing_error_last)
+				framing_errors <= framing_errors + 1;
+			framing_error_last <= framing_error;
+			if (request_drop)
+				request_drops <= request_drops + 1;
+			if ((request_count > request_high) && !(&request_high))
+				request_high <= request_high + 1;
+			if ((reply_count > reply_high) && !(&reply_high))
+				reply_high <= reply_high + 1;
+			if ((takeoff_count > takeoff_high) && !(&takeoff_high))
+				takeoff_high <= takeoff_high + 1;
+			if ((landing_count > landing_high) && !(&landing_high))
+				landing_high <= landing_high + 1;
+		end
+endmodule
 module RunwayManager (
 	clock,
 	reset,
@@ -755,38 +1089,34 @@ module RunwayManager (
 	runway_active,
 	runway
 );
+	parameter signed [31:0] ID_WIDTH = 4;
+	parameter signed [31:0] RUNWAYS = 2;
+	parameter signed [31:0] ACTION_WIDTH = 1;
 	input wire clock;
 	input wire reset;
-	input wire [3:0] plane_id_unlock;
-	input wire [3:0] plane_id_lock;
-	input wire runway_id;
+	input wire [ID_WIDTH - 1:0] plane_id_unlock;
+	input wire [ID_WIDTH - 1:0] plane_id_lock;
+	input wire [ACTION_WIDTH - 1:0] runway_id;
 	input wire lock;
 	input wire unlock;
-	input wire [1:0] runway_override;
-	output wire [1:0] runway_active;
-	output reg [9:0] runway;
-	assign runway_active[0] = runway[0] | runway_override[0];
-	assign runway_active[1] = runway[5] | runway_override[1];
+	input wire [RUNWAYS - 1:0] runway_override;
+	output wire [RUNWAYS - 1:0] runway_active;
+	// Runway r holds {plane id, active} at bit r * (ID_WIDTH + 1)
+	output reg [(RUNWAYS * (ID_WIDTH + 1)) - 1:0] runway;
+	genvar r;
+	generate
+		for (r = 0; r < RUNWAYS; r = r + 1) begin : genblk1
+			assign runway_active[r] = runway[r * (ID_WIDTH + 1)] | runway_override[r];
+		end
+	endgenerate
 	always @(posedge clock)
 		if (reset)
 			runway <= 1'sb0;
-		else if (lock && !unlock) begin
-			if (runway_id) begin
-				runway[9-:4] <= plane_id_lock;
-				runway[5] <= 1'b1;
-			end
-			else begin
-				runway[4-:4] <= plane_id_lock;
-				runway[0] <= 1'b1;
-			end
-		end
+		else if (lock && !unlock)
+			runway[runway_id * (ID_WIDTH + 1)+:ID_WIDTH + 1] <= {plane_id_lock, 1'b1};
 		else if (!lock && unlock) begin
-			if (runway_id) begin
-				if (plane_id_unlock == runway[9-:4])
-					runway[5] <= 1'b0;
-			end
-			else if (plane_id_unlock == runway[4-:4])
-				runway[0] <= 1'b0;
+			if (plane_id_unlock == runway[(runway_id * (ID_WIDTH + 1)) + 1+:ID_WIDTH])
+				runway[runway_id * (ID_WIDTH + 1)] <= 1'b0;
 		end
 endmodule
 module AircraftIDManager (
@@ -799,41 +1129,42 @@ module AircraftIDManager (
 	all_id,
 	full
 );
+	parameter signed [31:0] ID_WIDTH = 4;
 	input wire clock;
 	input wire reset;
-	input wire [3:0] id_in;
+	input wire [ID_WIDTH - 1:0] id_in;
 	input wire release_id;
 	input wire take_id;
-	output wire [3:0] id_out;
-	output wire [15:0] all_id;
+	output wire [ID_WIDTH - 1:0] id_out;
+	output wire [(2 ** ID_WIDTH) - 1:0] all_id;
 	output wire full;
-	reg [15:0] taken_id;
-	reg [3:0] id_avail;
-	assign all_id = taken_id;
-	assign id_out = id_avail;
-	assign full = taken_id == 16'hffff;
+	localparam signed [31:0] IDS = 2 ** ID_WIDTH;
+	reg [IDS - 1:0] taken_id;
+	reg [ID_WIDTH - 1:0] id_avail;
+	// Lowest free ID as a binary tree, ID_WIDTH levels of muxes rather than
+	// a chain of IDS. Each level pairs up the nodes below it, node i becomes
+	// free if node 2i or 2i + 1 is, and takes the ID of node 2i if that one
+	// is free, otherwise the ID of node 2i + 1 with the level's bit set.
+	reg [IDS - 1:0] node_free;
+	reg [(IDS * ID_WIDTH) - 1:0] node_id;
 	always @(*) begin
-		id_avail = 4'd0;
-		case (1'b0)
-			taken_id[0]: id_avail = 4'd0;
-			taken_id[1]: id_avail = 4'd1;
-			taken_id[2]: id_avail = 4'd2;
-			taken_id[3]: id_avail = 4'd3;
-			taken_id[4]: id_avail = 4'd4;
-			taken_id[5]: id_avail = 4'd5;
-			taken_id[6]: id_avail = 4'd6;
-			taken_id[7]: id_avail = 4'd7;
-			taken_id[8]: id_avail = 4'd8;
-			taken_id[9]: id_avail = 4'd9;
-			taken_id[10]: id_avail = 4'd10;
-			taken_id[11]: id_avail = 4'd11;
-			taken_id[12]: id_avail = 4'd12;
-			taken_id[13]: id_avail = 4'd13;
-			taken_id[14]: id_avail = 4'd14;
-			taken_id[15]: id_avail = 4'd15;
-			default: id_avail = 4'd0;
-		endcase
+		node_free = ~taken_id;
+		node_id = 1'sb0;
+		begin : sv2v_autoblock_1
+			reg signed [31:0] level;
+			reg signed [31:0] i;
+			for (level = 0; level < ID_WIDTH; level = level + 1)
+				for (i = 0; i < (IDS >> (level + 1)); i = i + 1) begin
+					node_id[i * ID_WIDTH+:ID_WIDTH] = (node_free[2 * i] ? node_id[(2 * i) * ID_WIDTH+:ID_WIDTH] : node_id[((2 * i) + 1) * ID_WIDTH+:ID_WIDTH] | (1 << level));
+					node_free[i] = node_free[2 * i] | node_free[(2 * i) + 1];
+				end
+		end
+		// 0 when every ID is taken
+		id_avail = (node_free[0] ? node_id[ID_WIDTH - 1:0] : {ID_WIDTH {1'b0}});
 	end
+	assign all_id = taken_id;
+	assign id_out = id_avail;
+	assign full = !node_free[0];
 	always @(posedge clock)
 		if (reset)
 			taken_id <= 1'sb0;
@@ -847,6 +1178,7 @@ module UartRX (
 	clock,
 	reset,
 	rx,
+	divisor,
 	data,
 	done,
 	framing_error,
@@ -854,25 +1186,62 @@ module UartRX (
 );
 	parameter signed [31:0] CLK_HZ = 25000000;
 	parameter signed [31:0] BAUD_RATE = 115200;
+	parameter signed [31:0] DIVISOR_WIDTH = 8;
 	input wire clock;
 	input wire reset;
 	input wire rx;
+	input wire [DIVISOR_WIDTH - 1:0] divisor;
 	output reg [7:0] data;
 	output wire done;
 	output wire framing_error;
 	output wire receiving;
+	// 16 samples per bit, or as many as the clock allows when CLK_HZ and
+	// BAUD_RATE leave fewer than 16 clocks per bit
+	localparam signed [31:0] DIVISOR = (CLK_HZ + (BAUD_RATE / 2)) / BAUD_RATE;
+	localparam signed [31:0] OVERSAMPLE = (DIVISOR >= 16 ? 16 : (DIVISOR >= 8 ? 8 : 4));
+	reg rx_meta;
+	reg rx_sync;
+	always @(posedge clock)
+		if (reset) begin
+			rx_meta <= 1'b1;
+			rx_sync <= 1'b1;
+		end
+		else begin
+			rx_meta <= rx;
+			rx_sync <= rx_meta;
+		end
 	wire start;
-	wire tick;
+	wire sample_tick;
 	BaudRateGenerator #(
 		.CLK_HZ(CLK_HZ),
-		.BAUD_RATE(BAUD_RATE)
+		.BAUD_RATE(BAUD_RATE),
+		.DIVISOR_WIDTH(DIVISOR_WIDTH),
+		.OVERSAMPLE(OVERSAMPLE)
 	) conductor(
 		.clock(clock),
 		.reset(reset),
-		.start_rx(start),
-		.start_tx(1'b0),
-		.tick(tick)
+		.divisor(divisor),
+		.start(start),
+		.tick(sample_tick)
 	);
+	// Sample n of a bit lands (n + 1) / OVERSAMPLE of a bit after its start,
+	// each bit is the majority of the three samples around its middle
+	reg [$clog2(OVERSAMPLE) - 1:0] sample_count;
+	reg [1:0] samples;
+	wire tick;
+	wire bit_value;
+	always @(posedge clock)
+		if (reset || start)
+			sample_count <= 1'sb0;
+		else if (sample_tick)
+			sample_count <= sample_count + 1'b1;
+	always @(posedge clock)
+		if (reset)
+			samples <= 2'b11;
+		else if (sample_tick)
+			samples <= {samples[0], rx_sync};
+	assign tick = sample_tick && (sample_count == (OVERSAMPLE / 2));
+	assign bit_value = ((samples[1] & samples[0]) | (samples[1] & rx_sync)) | (samples[0] & rx_sync);
 	wire collect_data;
 	wire en_data_counter;
 	wire clear_data_counter;
@@ -883,7 +1252,7 @@ module UartRX (
 			data <= 1'sb0;
 		else if (collect_data && tick) begin
 			data <= data >> 1;
-			data[7] <= rx;
+			data[7] <= bit_value;
 		end
 	assign done_data = data_counter == 4'd8;
 	always @(posedge clock)
@@ -895,7 +1264,8 @@ module UartRX (
 		.clock(clock),
 		.reset(reset),
 		.tick(tick),
-		.rx(rx),
+		.rx(rx_sync),
+		.bit_value(bit_value),
 		.done_data(done_data),
 		.start(start),
 		.collect_data(collect_data),
@@ -911,6 +1281,7 @@ module UartRXFsm (
 	reset,
 	tick,
 	rx,
+	bit_value,
 	done_data,
 	start,
 	collect_data,
@@ -924,6 +1295,7 @@ module UartRXFsm (
 	input wire reset;
 	input wire tick;
 	input wire rx;
+	input wire bit_value;
 	input wire done_data;
 	output reg start;
 	output reg collect_data;
@@ -952,9 +1324,9 @@ module UartRXFsm (
 				else
 					next_state = 2'd0;
 			2'd1:
-				if (tick && rx)
+				if (tick && bit_value)
 					next_state = 2'd0;
-				else if (tick && !rx)
+				else if (tick && !bit_value)
 					next_state = 2'd2;
 				else
 					next_state = 2'd1;
@@ -965,7 +1337,7 @@ module UartRXFsm (
 					en_data_counter = 1'b1;
 				end
 				else if (tick && done_data) begin
-					if (!rx) begin
+					if (!bit_value) begin
 						next_state = 2'd3;
 						framing_error = 1'b1;
 					end
@@ -980,11 +1352,12 @@ module UartRXFsm (
 				receiving = 1'b1;
 			end
 			2'd3: begin
-				if (tick && rx) begin
+				// Held until the line is back high, so a break is one error
+				if (tick && bit_value) begin
 					next_state = 2'd0;
 					clear_data_counter = 1'b1;
 				end
-				else if (tick && !rx)
+				else
 					next_state = 2'd3;
 				framing_error = 1'b1;
 			end
@@ -1001,6 +1374,7 @@ endmodule
 module UartTX (
 	clock,
 	reset,
+	divisor,
 	send,
 	data,
 	tx,
@@ -1009,8 +1383,10 @@ module UartTX (
 );
 	parameter signed [31:0] CLK_HZ = 25000000;
 	parameter signed [31:0] BAUD_RATE = 115200;
+	parameter signed [31:0] DIVISOR_WIDTH = 8;
 	input wire clock;
 	input wire reset;
+	input wire [DIVISOR_WIDTH - 1:0] divisor;
 	input wire send;
 	input wire [7:0] data;
 	output reg tx;
@@ -1020,12 +1396,13 @@ module UartTX (
 	wire tick;
 	BaudRateGenerator #(
 		.CLK_HZ(CLK_HZ),
-		.BAUD_RATE(BAUD_RATE)
+		.BAUD_RATE(BAUD_RATE),
+		.DIVISOR_WIDTH(DIVISOR_WIDTH)
 	) conductor(
 		.clock(clock),
 		.reset(reset),
-		.start_rx(1'b0),
-		.start_tx(start),
+		.divisor(divisor),
+		.start(start),
 		.tick(tick)
 	);
 	wire en_data_counter;
@@ -1182,27 +1559,37 @@ endmodule
 module BaudRateGenerator (
 	clock,
 	reset,
-	start_rx,
-	start_tx,
+	divisor,
+	start,
 	tick
 );
 	parameter signed [31:0] CLK_HZ = 25000000;
 	parameter signed [31:0] BAUD_RATE = 115200;
+	parameter signed [31:0] DIVISOR_WIDTH = 8;
+	parameter signed [31:0] OVERSAMPLE = 1;
 	input wire clock;
 	input wire reset;
-	input wire start_rx;
-	input wire start_tx;
+	input wire [DIVISOR_WIDTH - 1:0] divisor;
+	input wire start;
 	output wire tick;
-	parameter signed [31:0] DIVISOR = CLK_HZ / BAUD_RATE;
-	reg [$clog2(DIVISOR) + 1:0] clockCount;
-	assign tick = clockCount == DIVISOR;
+	parameter signed [31:0] DIVISOR = (CLK_HZ + (BAUD_RATE / 2)) / BAUD_RATE;
+	// Clocks per bit, a divisor below 16, too few for UartRX's 16 samples per
+	// bit, selects the DIVISOR given by CLK_HZ and BAUD_RATE
+	localparam signed [31:0] MIN_DIVISOR = 16;
+	localparam signed [31:0] COUNT_WIDTH = (DIVISOR < (2 ** DIVISOR_WIDTH) ? DIVISOR_WIDTH : $clog2(DIVISOR + 1));
+	wire [COUNT_WIDTH - 1:0] bit_clocks;
+	assign bit_clocks = (divisor < MIN_DIVISOR ? DIVISOR : divisor);
+	// Ticks OVERSAMPLE times every bit_clocks clocks. The remainder is carried
+	// in phase, so no tick is more than a clock from where it belongs.
+	reg [COUNT_WIDTH:0] phase;
+	wire [COUNT_WIDTH:0] next_phase;
+	assign next_phase = phase + OVERSAMPLE;
+	assign tick = next_phase >= bit_clocks;
 	always @(posedge clock)
-		if (reset | tick)
-			clockCount <= 1'sb0;
-		else if (start_rx)
-			clockCount <= DIVISOR / 2;
-		else if (start_tx)
-			clockCount <= 1'sb0;
+		if (reset || start)
+			phase <= 1'sb0;
+		else if (tick)
+			phase <= next_phase - bit_clocks;
 		else
-			clockCount <= clockCount + 1'b1;
+			phase <= next_phase;
 endmodule
\ No newline at end of file
@@ -13,6 +13,7 @@ module my_chip (
     .rx(io_in[0]),
     .runway_override(io_in[2:1]),
     .emergency_override(io_in[3]),
+    .baud_divisor(io_in[11:4]),
     .tx(io_out[0]),
     .framing_error(io_out[1]),
     .runway_active(io_out[3:2]),
@@ -0,0 +1,61 @@
+`default_nettype none
+// Simulation only. Same as BobTop but without UartRX/UartTX, the testbench
+// drives Bob's byte interface directly.
+module BobBypassTop (
+	clock,
+	reset,
+	uart_rx_data,
+	uart_rx_valid,
+	uart_tx_ready,
+	runway_override,
+	emergency_override,
+	uart_tx_data,
+	uart_tx_send,
+	runway_active,
+	emergency
+);
+	parameter signed [31:0] ID_WIDTH = 4;
+	parameter signed [31:0] QUEUE_DEPTH = 8;
+	parameter signed [31:0] RUNWAYS = 2;
+	parameter signed [31:0] REPLY_DEPTH = QUEUE_DEPTH;
+	input wire clock;
+	input wire reset;
+	input wire [7:0] uart_rx_data;
+	input wire uart_rx_valid;
+	input wire uart_tx_ready;
+	input wire [RUNWAYS - 1:0] runway_override;
+	input wire emergency_override;
+	output wire [7:0] uart_tx_data;
+	output wire uart_tx_send;
+	output wire [RUNWAYS - 1:0] runway_active;
+	output wire emergency;
+	reg [RUNWAYS - 1:0] ro_temp;
+	reg [RUNWAYS - 1:0] ro_sync;
+	reg eo_temp;
+	reg eo_sync;
+	always @(posedge clock) begin
+		ro_temp <= runway_override;
+		eo_temp <= emergency_override;
+		ro_sync <= ro_temp;
+		eo_sync <= eo_temp;
+	end
+	Bob #(
+		.ID_WIDTH(ID_WIDTH),
+		.QUEUE_DEPTH(QUEUE_DEPTH),
+		.RUNWAYS(RUNWAYS),
+		.REPLY_DEPTH(REPLY_DEPTH)
+	) bobby(
+		.clock(clock),
+		.reset(reset),
+		.uart_rx_data(uart_rx_data),
+		.uart_rx_valid(uart_rx_valid),
+		.uart_rx_error(1'b0),
+		.uart_tx_data(uart_tx_data),
+		.uart_tx_ready(uart_tx_ready),
+		.uart_tx_send(uart_tx_send),
+		.runway_active(runway_active),
+		.runway_override(ro_sync),
+		.emergency_out(emergency),
+		.emergency_override(eo_sync)
+	);
+endmodule
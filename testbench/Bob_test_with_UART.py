@@ -1,154 +1,134 @@
+import json
+import os
+import random
+from collections import Counter
 import cocotb 
 from cocotb.triggers import *
 from cocotb.clock import Clock
 from cocotb.utils import get_sim_time
-
-T_REQUEST    = 0b000 
-T_DECLARE    = 0b001
-T_EMERGENCY  = 0b010
-T_CLEAR      = 0b011
-T_HOLD       = 0b100
-T_SAY_AGAIN  = 0b101
-T_DIVERT     = 0b110
-T_ID_PLEASE  = 0b111
-
-C_RUNWAY_0   = 0b0 # Cleared
-C_RUNWAY_1   = 0b1
-
-R_TAKEOFF    = 0b0 # Request
-R_LANDING    = 0b1
-
-D_RUNWAY_0  = 0b0 # Declare
-D_RUNWAY_1  = 0b1
-
-E_DECLARE    = 0b1
-E_RESOLVE    = 0b0
-
-BAUD_RATE = 115200
-PERIOD = (1 / BAUD_RATE) * 10**9
-CLOCK_PERIOD = 40
+from cocotb.result import SimTimeoutError
+from uart import UartDriver, UartMonitor, BypassDriver, BypassMonitor
+from bobATC_codec import *
+from bobATC_model import BobModel, AircraftIDManager
+from traffic import TrafficGenerator, TrafficStats
+from pipeline import stream_requests
+from cosim import CosimMonitor
+from tracer import traced
+from perf import measure
+from functional_coverage import covered, closed, FCOV_GOAL
+from bobATC_capture import open_capture, split, first_difference
+
+# BobTop's CLK_HZ and BAUD_RATE parameters, set by testbench.mk
+CLK_HZ = int(os.environ.get("CLK_HZ", 25000000))
+# BAUD_DIVISOR drives BobTop's baud_divisor pins, which set the clocks per bit
+# at run time without a rebuild. Below 16 it keeps the BAUD_RATE built in.
+BAUD_DIVISOR = int(os.environ.get("BAUD_DIVISOR", 0))
+if BAUD_DIVISOR >= 16:
+  BAUD = CLK_HZ / BAUD_DIVISOR
+else:
+  BAUD = int(os.environ.get("BAUD_RATE", BAUD_RATE))
+PERIOD = (1 / BAUD) * 10**9
+# Rounded to the simulator's 1 ps precision
+CLOCK_PERIOD = round(10**9 / CLK_HZ, 3)
+
+# Bob's ID_WIDTH, QUEUE_DEPTH and RUNWAYS parameters, set by testbench.mk.
+# Only scaling_test sends packets in the format they give.
+ID_WIDTH = int(os.environ.get("ID_WIDTH", 4))
+QUEUE_DEPTH = int(os.environ.get("QUEUE_DEPTH", 8))
+RUNWAYS = int(os.environ.get("RUNWAYS", 2))
+REPLY_DEPTH = int(os.environ.get("REPLY_DEPTH", QUEUE_DEPTH))
+
+# UART_SKEW=2 makes the driver's baud rate 2% fast, -2 slow, and
+# UART_IDLE_BITS leaves idle bit times between the frames it sends
+UART_SKEW = float(os.environ.get("UART_SKEW", 0))
+UART_IDLE_BITS = int(os.environ.get("UART_IDLE_BITS", 0))
+
+# PERF=1 records the speed of every test, see perf.py
+measured = measure(CLOCK_PERIOD)
+
+# BobBypassTop skips UartRX/UartTX and exchanges whole bytes with Bob
+BYPASS_UART = os.environ.get("TOPLEVEL") == "BobBypassTop"
+
+# COSIM=1 checks every test against the Python model, see cosim.py
+COSIM = os.environ.get("COSIM", "0") == "1"
+
+# Time allowed for a reply to start once read() is called, plus the byte itself
+READ_TIMEOUT = 250 * CLOCK_PERIOD + 10 * PERIOD
+
+uart_driver = None
+uart_monitor = None
+
+# Tests that send requests back to back pass with_cosim=False since the model
+# expects the replies to one request to leave before the next arrives
+def start_uart(dut, with_cosim=True):
+  global uart_driver, uart_monitor
+  if BYPASS_UART:
+    uart_driver = BypassDriver(dut)
+    uart_monitor = BypassMonitor(dut)
+  else:
+    dut.baud_divisor.value = BAUD_DIVISOR
+    uart_driver = UartDriver(dut.rx, PERIOD / (1 + UART_SKEW / 100), UART_IDLE_BITS)
+    uart_monitor = UartMonitor(dut.tx, PERIOD)
+  uart_monitor.start()
+  if COSIM and with_cosim:
+    start_cosim(dut)
+
+def start_cosim(dut):
+  monitor = CosimMonitor(dut, BobModel(id_width=ID_WIDTH, queue_depth=QUEUE_DEPTH, runways=RUNWAYS,
+                                       reply_depth=REPLY_DEPTH))
+  monitor.start()
+  return monitor
+
+async def read_timed(dut):
+  try:
+    start, data = await uart_monitor.read_timed(READ_TIMEOUT)
+  except SimTimeoutError:
+    raise TimeoutError("UART read timed out")
+  assert uart_monitor.framing_errors == 0, "UART reply missing stop bit"
+  return start, data
 
 async def read(dut):
-  data = 0b00000000
-  fail = 0
-  while True:
-    if fail == 3:
-      TimeoutError("UART read spurious start too many times")
-
-    start = get_sim_time(units="ns")
-    while dut.tx.value == 0b1:
-      await FallingEdge(dut.clock)
-      if get_sim_time(units="ns") - start > 10000:
-        raise TimeoutError("UART read timed out")
-      
-    # Detect start bit
-    bit_start = get_sim_time(units="ns")
-    while get_sim_time(units="ns") - bit_start < PERIOD / 2:
-      await FallingEdge(dut.clock)
-    if dut.tx.value == 0b1:
-      # Spurious start
-      fail += 1
-      continue
-    
-    # Finish start bit
-    while get_sim_time(units="ns") - bit_start < PERIOD:
-      await FallingEdge(dut.clock)
-    
-    # Collect data
-    num_bits = 0
-    while num_bits < 8:
-      bit_start = get_sim_time(units="ns")
-      while get_sim_time(units="ns") - bit_start < PERIOD / 2:
-        await FallingEdge(dut.clock)
-      data >>= 1
-      data |= (dut.tx.value << 7)
-      num_bits += 1
-      while get_sim_time(units="ns") - bit_start < PERIOD:
-        await FallingEdge(dut.clock)
-    
-    # STOP bit
-    bit_start = get_sim_time(units="ns")
-    while get_sim_time(units="ns") - bit_start < PERIOD / 2:
-      await FallingEdge(dut.clock)
-
-    assert dut.tx.value
-
-    bit_start = get_sim_time(units="ns")
-    while get_sim_time(units="ns") - bit_start < PERIOD / 2:
-      await FallingEdge(dut.clock)
-    
-    return data
+  return (await read_timed(dut))[1]
   
 async def write(dut, data):
-  data_to_send = data
-  bit_start = get_sim_time(units="ns")
+  await uart_driver.write(data)
 
-  while get_sim_time(units="ns") - bit_start < PERIOD:
-    await FallingEdge(dut.clock)
-    dut.rx.value = 0
+async def send_uart_request(dut, data):
+  await write(dut, data)
 
-  num_bits = 0
+# Packets in packet_format, which may take several bytes each
+async def send_packet(dut, packet_format, packet):
+  for data in packet_format.to_bytes(packet):
+    await send_uart_request(dut, data)
 
-  while num_bits < 8:
-    bit_start = get_sim_time(units="ns")
-    dut.rx.value = data_to_send & 1
-    while get_sim_time(units="ns") - bit_start < PERIOD:
-      await FallingEdge(dut.clock)
-    data_to_send >>= 1
-    num_bits += 1
-  
-  bit_start = get_sim_time(units="ns")
+async def read_packet_timed(dut, packet_format):
+  start, reply = await read_timed(dut)
+  for _ in range(packet_format.bytes - 1):
+    reply = (reply << 8) | await read(dut)
+  return start, reply
 
-  while get_sim_time(units="ns") - bit_start < PERIOD:
-    await FallingEdge(dut.clock)
-    dut.rx.value = 1
-
-async def send_uart_request(dut, data):
-  await write(dut, data)
+REQUEST_LOG = request_log(9)
+REPLY_LOG = reply_log(9)
 
 async def detect_uart_reply(dut, expected):
   reply = await read(dut)
-  if (reply & 0b00001110) == T_CLEAR << 1:
-    if (reply & 0b00000001) == 0b0:
-      print(f"Bob      : Plane {"{:02d}".format(reply >> 4)} cleared runway {reply & 0b1}")
-    elif (reply & 0b00000001) == 0b1:
-      print(f"Bob      : Plane {"{:02d}".format(reply >> 4)} cleared runway {reply & 0b1}")
-  elif (reply & 0b00001110) == T_HOLD << 1:
-    print(f"Bob      : Plane {"{:02d}".format(reply >> 4)} hold")
-  elif (reply & 0b00001110) == T_ID_PLEASE << 1:
-    if (reply & 0b00000001) == 0b0:
-      print(f"Bob      : ID {reply >> 4} is available")
-    elif (reply & 0b00000001) == 0b1:
-      print(f"Bob      : My airspace is full")
-  elif (reply & 0b00001110) == T_DIVERT << 1:
-    print(f"Bob      : Plane {"{:02d}".format(reply >> 4)} divert due to congestion or emergency")
-  elif (reply & 0b00001110) == T_SAY_AGAIN << 1:
-    print(f"Bob      : Plane {"{:02d}".format(reply >> 4)} say again")
+  if REPLY_LOG[reply] is not None:
+    print(REPLY_LOG[reply])
         
   return (reply == expected, reply >> 4)
 
+# Replies to requests sent with ignore_reply, read off so that a later read()
+# does not take them for its own
+async def drain_replies(dut):
+  for start, reply in await uart_monitor.drain(READ_TIMEOUT):
+    if REPLY_LOG[reply] is not None:
+      print(f"{REPLY_LOG[reply]} (ignored)")
+
 async def request(dut, id, type, action, expected_reply, ignore_reply):
-  await send_uart_request(dut, (id << 4) + (type << 1) + action)
+  packet = encode(id, type, action)
+  await send_uart_request(dut, packet)
   start = get_sim_time(units="ns")
-  if type == T_ID_PLEASE:
-    print(f"New Plane: Requesting ID for entry at time {start}")
-  elif type == T_REQUEST:
-    if action == R_TAKEOFF:
-      print(f"Plane {"{:02d}".format(id)} : Requesting takeoff at time {start}")
-    elif action == R_LANDING:
-      print(f"Plane {"{:02d}".format(id)} : Requesting landing at time {start}")
-  elif type == T_DECLARE:
-    if action == D_RUNWAY_0:
-      print(f"Plane {"{:02d}".format(id)} : Declaring takeoff/landing runway 0 at time {start}")
-    elif action == D_RUNWAY_1:
-      print(f"Plane {"{:02d}".format(id)} : Declaring takeoff/landing runway 1 at time {start}")
-  elif type == T_EMERGENCY:
-    if action == E_DECLARE:
-      print(f"Plane {"{:02d}".format(id)} : Declaring emergency")
-    elif action == E_RESOLVE:
-      print(f"Plane {"{:02d}".format(id)} : Resolving emergency")
-  else:
-    print(f"Plane {"{:02d}".format(id)} : Making invalid request at time {start}")
+  print(f"{REQUEST_LOG[packet]} at time {start}")
 
   if not ignore_reply:
     detect = await detect_uart_reply(dut, expected_reply)
@@ -162,6 +142,9 @@ async def request(dut, id, type, action, expected_reply, ignore_reply):
     return detect[1]
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def basic_test(dut):
   print("////////////////////////////////////////")
   print("//         Begin basic tests          //")
@@ -169,6 +152,7 @@ async def basic_test(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b00
   dut.emergency_override.value = 0b0
@@ -207,6 +191,9 @@ async def basic_test(dut):
   print("////////////////////////////////////////\n")
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def stress_test_takeoff(dut):
   print("////////////////////////////////////////")
   print("//     Begin takeoff stress tests     //")
@@ -214,6 +201,7 @@ async def stress_test_takeoff(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b00
   dut.emergency_override.value = 0b0
@@ -238,6 +226,7 @@ async def stress_test_takeoff(dut):
   for i in range(2, 4):
     # Planes 2, 3 declare landing, ignored, they keep their IDs
     await request(dut, i, T_DECLARE, i % 2, 0, True)
+  await drain_replies(dut)
 
   assert dut.runway_active.value == 0b11 
   assert dut.bobby.takeoff_fifo.empty.value
@@ -252,8 +241,9 @@ async def stress_test_takeoff(dut):
     # Planes request takeoff, diverted, they lose their IDs
     await request(dut, i, T_REQUEST, R_TAKEOFF, (i << 4) + (T_DIVERT << 1), False)
   
-  dut.bobby.all_id.value == 0x00FF
-  dut.bobby.takeoff_fifo.count.value == 0b1000
+  # Planes 0, 1 hold the runways and 2 to 9 wait in the takeoff FIFO
+  assert dut.bobby.all_id.value == 0x03FF
+  assert dut.bobby.takeoff_fifo.count.value == 0b1000
   
   for i in range(8):
     # Planes declare takeoff
@@ -285,6 +275,7 @@ async def stress_test_takeoff(dut):
 
   for i in range(14, 16):
     await request(dut, i, T_DECLARE, i % 2, 0, True)
+  await drain_replies(dut)
   
   assert dut.bobby.all_id.value == 0x00FF
   assert dut.bobby.takeoff_fifo.empty.value
@@ -295,6 +286,9 @@ async def stress_test_takeoff(dut):
   print("////////////////////////////////////////\n")
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def stress_test_landing(dut):
   print("////////////////////////////////////////")
   print("//     Begin landing stress tests     //")
@@ -302,6 +296,7 @@ async def stress_test_landing(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b00
   dut.emergency_override.value = 0b0
@@ -326,6 +321,7 @@ async def stress_test_landing(dut):
   for i in range(2, 4):
     # Planes 2, 3 declare landing, ignored, they keep their IDs
     await request(dut, i, T_DECLARE, i % 2, 0, True)
+  await drain_replies(dut)
   
   assert dut.runway_active.value == 0b11 
   assert dut.bobby.landing_fifo.empty.value
@@ -340,8 +336,9 @@ async def stress_test_landing(dut):
     # Planes request landing, diverted, they lose their IDs
     await request(dut, i, T_REQUEST, R_LANDING, (i << 4) + (T_DIVERT << 1), False)
   
-  dut.bobby.all_id.value == 0x00FF
-  dut.bobby.landing_fifo.count.value == 0b1000
+  # Planes 0, 1 hold the runways and 2 to 9 wait in the landing FIFO
+  assert dut.bobby.all_id.value == 0x03FF
+  assert dut.bobby.landing_fifo.count.value == 0b1000
   
   for i in range(8):
     # Planes 0, 1 declare landing, 2, 3, cleared. 2, 3 declare landing, 4, 5 cleared.
@@ -373,6 +370,7 @@ async def stress_test_landing(dut):
 
   for i in range(14, 16):
     await request(dut, i, T_DECLARE, i % 2, 0, True)
+  await drain_replies(dut)
   
   assert dut.bobby.all_id.value == 0x00FF
   assert dut.bobby.takeoff_fifo.empty.value
@@ -383,6 +381,9 @@ async def stress_test_landing(dut):
   print("////////////////////////////////////////\n")
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def stress_test_id(dut):
   print("////////////////////////////////////////")
   print("//        Begin ID stress tests       //")
@@ -390,6 +391,7 @@ async def stress_test_id(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b00
   dut.emergency_override.value = 0b0
@@ -420,6 +422,9 @@ async def stress_test_id(dut):
   return 0
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def stress_test_alternate(dut):
   # Queue up both landing and takeoff FIFOs
   print("////////////////////////////////////////////////////")
@@ -428,6 +433,7 @@ async def stress_test_alternate(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b01
   dut.emergency_override.value = 0b0
@@ -493,12 +499,16 @@ async def stress_test_alternate(dut):
   await request(dut, 7, T_DECLARE, D_RUNWAY_1, (15 << 4) + (T_CLEAR << 1) + C_RUNWAY_1, False)
   # Plane 15 declares landing, expect takeoff
   await request(dut, 15, T_DECLARE, D_RUNWAY_1, 0, True)
+  await drain_replies(dut)
 
   assert dut.bobby.landing_fifo.empty.value
   assert dut.bobby.takeoff_fifo.empty.value
   assert dut.runway_active.value == 0b01
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def emergency_test(dut):
   print("////////////////////////////////////////")
   print("//       Begin emergency tests        //")
@@ -506,6 +516,7 @@ async def emergency_test(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b00
   dut.emergency_override.value = 0b0
@@ -549,26 +560,32 @@ async def emergency_test(dut):
     await request(dut, id[i], T_REQUEST, R_TAKEOFF, (id[i] << 4) + (T_HOLD << 1), False)
   
   await request(dut, id[5], T_DECLARE, D_RUNWAY_1, 0, True)
+  await drain_replies(dut)
 
   assert not dut.runway_active[1].value
   
   # Invalid resolving plane ID
   await request(dut, id[1], T_EMERGENCY, E_RESOLVE, 0, True)
+  await drain_replies(dut)
 
   assert dut.bobby.emergency.value
 
   await request(dut, id[0], T_EMERGENCY, E_RESOLVE, 0, True)
+  await drain_replies(dut)
   
   assert not dut.emergency.value
   assert not dut.bobby.all_id[0].value
 
   await request(dut, id[6], T_EMERGENCY, E_DECLARE, 0, True)
   await request(dut, id[7], T_EMERGENCY, E_DECLARE, 0, True)
+  await drain_replies(dut)
   # Invalid resolving plane ID
   await request(dut, id[6], T_EMERGENCY, E_RESOLVE, 0, True)
+  await drain_replies(dut)
   assert dut.emergency.value
   dut.emergency_override.value = 0b1
   await request(dut, id[7], T_EMERGENCY, E_RESOLVE, 0, True)
+  await drain_replies(dut)
   assert dut.emergency.value
   dut.emergency_override.value = 0b0
   await FallingEdge(dut.clock)
@@ -579,6 +596,9 @@ async def emergency_test(dut):
   print("////////////////////////////////////////\n")
 
 @cocotb.test(skip=False)
+@measured
+@covered
+@traced
 async def say_again_test(dut):
   print("////////////////////////////////////////")
   print("//       Begin say again tests        //")
@@ -586,6 +606,7 @@ async def say_again_test(dut):
 
   # Run the clock
   cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
 
   dut.runway_override.value = 0b00
   dut.emergency_override.value = 0b0
@@ -597,6 +618,8 @@ async def say_again_test(dut):
 
   # Plane requests ID
   id_1 = await request(dut, 0, T_ID_PLEASE, 0, (T_ID_PLEASE << 1), False)
+  # The action bit of ID_PLEASE does not matter, status queries use SAY_AGAIN
+  await request(dut, 0, T_ID_PLEASE, 1, (1 << 4) + (T_ID_PLEASE << 1), False)
 
   # Plane id_1 requests invalid 
   await request(dut, id_1, T_CLEAR, C_RUNWAY_0, (id_1 << 4) + (T_SAY_AGAIN << 1), False)
@@ -612,3 +635,688 @@ async def say_again_test(dut):
   print("////////////////////////////////////////")
   print("//       Finish say again tests       //")
   print("////////////////////////////////////////\n")
+
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def random_traffic_test(dut):
+  print("////////////////////////////////////////")
+  print("//      Begin random traffic test     //")
+  print("////////////////////////////////////////\n")
+
+  seed = int(os.environ.get("TRAFFIC_SEED", 1))
+  packets = int(os.environ.get("TRAFFIC_PACKETS", 200))
+  back_to_back = os.environ.get("TRAFFIC_BACK_TO_BACK", "0") == "1"
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  model = BobModel()
+  traffic = TrafficGenerator(model, seed, back_to_back=back_to_back)
+  stats = TrafficStats()
+  stats.start(get_sim_time(units="ns"))
+
+  print(f"TB      : Playing {packets} random requests with seed {seed}")
+  for _ in range(packets):
+    gap = traffic.next_gap()
+    if gap:
+      await Timer(gap, units="ns", round_mode="round")
+
+    kind, packet = traffic.next_packet()
+    expected = model.request(packet)
+    await send_uart_request(dut, packet)
+
+    latencies = []
+    for expected_reply in expected:
+      start, reply = await read_timed(dut)
+      assert reply == expected_reply, \
+        f"{kind} request {packet:#04x}: expected reply {expected_reply:#04x}, got {reply:#04x}"
+      latencies.append(start - uart_driver.done_time)
+    stats.record(kind, latencies)
+
+    assert dut.bobby.all_id.value == model.all_id
+
+    # FCOV_GOAL=0.9 ends the run once 90% of coverage bins are hit
+    if closed():
+      print(f"TB      : Coverage reached {FCOV_GOAL:.0%} after {stats.packets} requests")
+      break
+
+  stats.stop(get_sim_time(units="ns"))
+  print(stats.summary())
+
+  print("////////////////////////////////////////")
+  print("//     Finish random traffic test     //")
+  print("////////////////////////////////////////\n")
+
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def burst_test(dut):
+  print("////////////////////////////////////////")
+  print("//         Begin burst tests          //")
+  print("////////////////////////////////////////\n")
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  # 16 ID requests, then every plane asks to land at once: two are cleared,
+  # eight held and six diverted. Plane 0 then declares an emergency, which
+  # diverts the eight held planes in one go.
+  packets = [T_ID_PLEASE << 1] * 16
+  packets += [(i << 4) + (T_REQUEST << 1) + R_LANDING for i in range(16)]
+  packets += [(0 << 4) + (T_EMERGENCY << 1) + E_DECLARE]
+
+  result = await stream_requests(dut, uart_driver, uart_monitor, packets, READ_TIMEOUT)
+  print(result.summary())
+
+  # The request FIFO keeps up with line rate, nothing that needs an answer
+  # goes unanswered and the emergency diverts all eight held planes
+  assert result.request_fifo_drops == 0
+  assert not result.unanswered
+  diverts = [reply for start, reply in result.replies if PACKETS[reply].type == T_DIVERT]
+  assert len(diverts) == 16 - 2, f"expected 14 diverts, got {len(diverts)}"
+  assert dut.bobby.landing_fifo.empty.value
+
+  print("////////////////////////////////////////")
+  print("//         Finish burst tests         //")
+  print("////////////////////////////////////////\n")
+
+# Replays the requests in a capture recorded with bobATC_helper.py --capture
+# and checks that the replies match the recorded ones, e.g.
+# make -f testbench.mk TESTCASE=replay_test REPLAY_CAPTURE=incident.bin REPLAY_SPEED=100
+@cocotb.test(skip="REPLAY_CAPTURE" not in os.environ)
+@measured
+@covered
+@traced
+async def replay_test(dut):
+  print("////////////////////////////////////////")
+  print("//        Begin capture replay        //")
+  print("////////////////////////////////////////\n")
+
+  baudrate, records = open_capture(os.environ["REPLAY_CAPTURE"])
+  speed = float(os.environ.get("REPLAY_SPEED", 1))
+  requests, replies = split(records)
+  expected = replies["byte"].tobytes()
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  print(f"TB      : Replaying {len(requests)} requests at {speed}x the recorded timing")
+  start = get_sim_time(units="ns")
+  first = int(requests["time"][0]) if len(requests) else 0
+  for timestamp, packet in zip(requests["time"].tolist(), requests["byte"].tolist()):
+    if speed > 0:
+      gap = start + (timestamp - first) / speed - get_sim_time(units="ns")
+      if gap > 0:
+        await Timer(gap, units="ns", round_mode="round")
+    await send_uart_request(dut, packet)
+
+  got = bytearray()
+  while True:
+    try:
+      got.append((await uart_monitor.read_timed(READ_TIMEOUT))[1])
+    except SimTimeoutError:
+      break
+
+  index = first_difference(expected, bytes(got))
+  assert index is None, f"Reply {index} differs from the capture, expected {expected[index:index + 4].hex()} got {got[index:index + 4].hex()}"
+  print(f"TB      : All {len(got)} replies match the capture")
+
+  print("////////////////////////////////////////")
+  print("//       Finish capture replay        //")
+  print("////////////////////////////////////////\n")
+
+# Shortest request sequences found by bobATC_explore.py, one per invariant
+# violation and coverage class, replayed with the replies the model expects
+EXPLORED_SEQUENCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "explored_sequences.json")
+
+@cocotb.test(skip=not os.path.exists(EXPLORED_SEQUENCES))
+@measured
+@covered
+@traced
+async def explored_sequences_test(dut):
+  print("////////////////////////////////////////")
+  print("//     Begin explored sequences       //")
+  print("////////////////////////////////////////\n")
+
+  with open(EXPLORED_SEQUENCES) as fh:
+    sequences = json.load(fh)["sequences"]
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  for sequence in sequences:
+    print(f"TB      : {sequence['name']}: {sequence['description']}")
+    dut.reset.value = True
+    await FallingEdge(dut.clock)
+    dut.reset.value = False
+    await FallingEdge(dut.clock)
+
+    for packet, expected in zip(sequence["packets"], sequence["replies"]):
+      await send_uart_request(dut, packet)
+      for expected_reply in expected:
+        reply = await read(dut)
+        assert reply == expected_reply, \
+          f"{sequence['name']}: request {packet:#04x} expected reply {expected_reply:#04x}, got {reply:#04x}"
+
+    assert dut.bobby.all_id.value == sequence["all_id"], f"{sequence['name']}: all_id differs from the model"
+
+  print("////////////////////////////////////////")
+  print("//     Finish explored sequences      //")
+  print("////////////////////////////////////////\n")
+
+# Random protocol traffic with no expected replies scripted in the test,
+# the co-simulation monitor checks every reply and the state after it
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def cosim_test(dut):
+  print("////////////////////////////////////////")
+  print("//        Begin co-simulation         //")
+  print("////////////////////////////////////////\n")
+
+  seed = int(os.environ.get("TRAFFIC_SEED", 1))
+  packets = int(os.environ.get("COSIM_PACKETS", 500))
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  monitor = start_cosim(dut)
+  traffic = TrafficGenerator(monitor.model, seed, back_to_back=True)
+
+  print(f"TB      : Checking {packets} random requests with seed {seed} against the model")
+  for sent in range(1, packets + 1):
+    kind, packet = traffic.next_packet()
+    await send_packet(dut, monitor.format, packet)
+    # Long enough for an emergency to divert a full landing_fifo
+    await with_timeout(monitor.drained(sent), (QUEUE_DEPTH + 2) * monitor.format.bytes * READ_TIMEOUT, "ns",
+                       round_mode="round")
+
+  monitor.stop()
+  print(f"TB      : {monitor.requests} requests, {monitor.replies} replies and {monitor.checks} state checks matched")
+
+  print("////////////////////////////////////////")
+  print("//       Finish co-simulation         //")
+  print("////////////////////////////////////////\n")
+
+# Back to back requests that each get one SAY_AGAIN reply, covering every
+# data byte pattern Bob can answer. Run with baud_sweep.py, which sets
+# UART_MARGIN_RESULT and reads back framing errors, wrong replies and the
+# packet rate instead of failing the test.
+@cocotb.test(skip=BYPASS_UART)
+@measured
+@covered
+@traced
+async def uart_margin_test(dut):
+  print("////////////////////////////////////////")
+  print("//        Begin UART margin test      //")
+  print("////////////////////////////////////////\n")
+
+  result_file = os.environ.get("UART_MARGIN_RESULT")
+  count = int(os.environ.get("UART_MARGIN_PACKETS", 64))
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  framing_errors = 0
+  async def count_framing_errors():
+    nonlocal framing_errors
+    while True:
+      await RisingEdge(dut.framing_error)
+      framing_errors += 1
+  counter = cocotb.start_soon(count_framing_errors())
+
+  invalid = [encode(id, type, action) for type in (T_CLEAR, T_HOLD, T_SAY_AGAIN, T_DIVERT)
+             for id in range(16) for action in range(2)]
+  packets = [invalid[(i * 37) % len(invalid)] for i in range(count)]
+  model = BobModel()
+  expected = [reply for packet in packets for reply in model.request(packet)]
+
+  print(f"TB      : {CLK_HZ} Hz clock, {BAUD:.0f} baud, driver skew {UART_SKEW:+}%, {UART_IDLE_BITS} idle bits")
+  result = await stream_requests(dut, uart_driver, uart_monitor, packets, READ_TIMEOUT)
+  counter.kill()
+  print(result.summary())
+
+  # Replies that never came back plus replies nobody asked for
+  replies = Counter(reply for start, reply in result.replies)
+  wanted = Counter(expected)
+  wrong = sum((wanted - replies).values()) + sum((replies - wanted).values())
+  duration = result.end_time - result.start_time
+  margin = {
+    "clk_hz": CLK_HZ,
+    "baud_rate": BAUD,
+    "divisor": BAUD_DIVISOR,
+    "skew": UART_SKEW,
+    "idle_bits": UART_IDLE_BITS,
+    "sent": result.sent,
+    "replies": len(result.replies),
+    "wrong_replies": wrong,
+    "framing_errors": framing_errors,
+    "reply_framing_errors": uart_monitor.framing_errors,
+    "request_fifo_drops": result.request_fifo_drops,
+    "packet_rate": result.sent / duration * 1e9 if duration else 0.0,
+  }
+  print(f"TB      : {wrong} wrong replies, {framing_errors} framing errors, {margin['packet_rate']:.0f} packets/s")
+
+  if result_file:
+    with open(result_file, "w") as fh:
+      json.dump(margin, fh)
+  else:
+    assert framing_errors == 0 and uart_monitor.framing_errors == 0, "UART framing errors"
+    assert wrong == 0, f"{wrong} replies missing or wrong"
+
+  print("////////////////////////////////////////")
+  print("//       Finish UART margin test      //")
+  print("////////////////////////////////////////\n")
+
+# Random traffic in the packet format of the ID_WIDTH, QUEUE_DEPTH and RUNWAYS
+# the design was built with, packets wider than a byte go out as several
+# frames. Run with scaling_sweep.py, which sets SCALING_RESULT and reads back
+# the request rate and reply latency at each size.
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def scaling_test(dut):
+  print("////////////////////////////////////////")
+  print("//          Begin scaling test        //")
+  print("////////////////////////////////////////\n")
+
+  seed = int(os.environ.get("TRAFFIC_SEED", 1))
+  packets = int(os.environ.get("SCALING_PACKETS", 200))
+  result_file = os.environ.get("SCALING_RESULT")
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  model = BobModel(id_width=ID_WIDTH, queue_depth=QUEUE_DEPTH, runways=RUNWAYS)
+  packet_format = model.format
+  traffic = TrafficGenerator(model, seed, back_to_back=True)
+  stats = TrafficStats()
+  stats.start(get_sim_time(units="ns"))
+
+  print(f"TB      : Playing {packets} random requests with {packet_format}, {QUEUE_DEPTH} deep queues")
+  for _ in range(packets):
+    kind, packet = traffic.next_packet()
+    expected = model.request(packet)
+    await send_packet(dut, packet_format, packet)
+
+    latencies = []
+    for expected_reply in expected:
+      start, reply = await read_packet_timed(dut, packet_format)
+      assert reply == expected_reply, \
+        f"{kind} request {packet:#x}: expected reply {expected_reply:#x}, got {reply:#x}"
+      latencies.append(start - uart_driver.done_time)
+    stats.record(kind, latencies)
+
+    assert dut.bobby.all_id.value == model.all_id
+
+  stats.stop(get_sim_time(units="ns"))
+  print(stats.summary())
+
+  if result_file:
+    duration = (stats.sim_end - stats.sim_start) / 1e9
+    samples = [latency for kind in stats.latency.values() for latency in kind]
+    with open(result_file, "w") as fh:
+      json.dump({
+        "id_width": ID_WIDTH,
+        "queue_depth": QUEUE_DEPTH,
+        "runways": RUNWAYS,
+        "packet_bytes": packet_format.bytes,
+        "packets": stats.packets,
+        "replies": stats.replies,
+        "packet_rate": stats.packets / duration if duration else 0.0,
+        "mean_latency": sum(samples) / len(samples) if samples else 0.0,
+      }, fh)
+
+  print("////////////////////////////////////////")
+  print("//         Finish scaling test        //")
+  print("////////////////////////////////////////\n")
+
+# Checks AircraftIDManager's free ID search against the lowest free ID the
+# stress tests and the model rely on. IDs are handed out in order, released
+# out of order and handed out again lowest first, then the clock stops and
+# taken_id is set directly to each of its 2^16 patterns, or to
+# ID_SEARCH_PATTERNS random ones for wider IDs, comparing id_out and full.
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def id_search_test(dut):
+  print("////////////////////////////////////////")
+  print("//        Begin ID search test        //")
+  print("////////////////////////////////////////\n")
+
+  patterns = int(os.environ.get("ID_SEARCH_PATTERNS", 4096))
+  seed = int(os.environ.get("TRAFFIC_SEED", 1))
+
+  # Run the clock
+  clock = cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  model = BobModel(id_width=ID_WIDTH, queue_depth=QUEUE_DEPTH, runways=RUNWAYS)
+  packet_format = model.format
+  rng = random.Random(seed)
+
+  async def exchange(packet):
+    for expected_reply in model.request(packet):
+      start, reply = await read_packet_timed(dut, packet_format)
+      assert reply == expected_reply, f"request {packet:#x}: expected reply {expected_reply:#x}, got {reply:#x}"
+
+  # Every ID in order, then the airspace full reply
+  for _ in range(packet_format.ids + 1):
+    await exchange(packet_format.encode(0, T_ID_PLEASE, 0))
+  released = rng.sample(range(packet_format.ids), min(8, packet_format.ids))
+  for id in released:
+    await exchange(packet_format.encode(id, T_EMERGENCY, E_RESOLVE))
+  for _ in released:
+    await exchange(packet_format.encode(0, T_ID_PLEASE, 0))
+  assert dut.bobby.all_id.value == model.all_id
+  print(f"TB      : Released IDs {released} came back lowest first")
+
+  clock.kill()
+  await Timer(CLOCK_PERIOD, units="ns", round_mode="round")
+
+  id_manager = dut.bobby.id_manager
+  reference = AircraftIDManager(ID_WIDTH)
+  if packet_format.ids <= 16:
+    taken = range(1 << packet_format.ids)
+  else:
+    single = [reference.all_ids & ~(1 << id) for id in range(packet_format.ids)]
+    taken = [0, reference.all_ids] + single + [rng.getrandbits(packet_format.ids) for _ in range(patterns)]
+  for taken_id in taken:
+    id_manager.taken_id.value = taken_id
+    await Timer(1, units="ns")
+    reference.taken_id = taken_id
+    assert id_manager.id_out.value == reference.id_out, \
+      f"taken_id {taken_id:#x}: expected ID {reference.id_out}, got {int(id_manager.id_out.value)}"
+    assert id_manager.full.value == reference.full, f"taken_id {taken_id:#x}: full is wrong"
+  print(f"TB      : id_out and full matched the reference for {len(taken)} taken_id patterns")
+
+  print("////////////////////////////////////////")
+  print("//       Finish ID search test        //")
+  print("////////////////////////////////////////\n")
+
+# Benchmark of the reply path. QUEUE_DEPTH planes wait to land with both
+# runways held by runway_override, then one declares an emergency and every
+# one of them is diverted. Reports how long ReadRequestFsm spends on the
+# burst, the cycles it waits for room in uart_replies and how long the
+# diverts take to leave. Compare REPLY_DEPTH=4, the reply FIFO of earlier
+# builds, with the default, e.g.
+# make -f testbench.mk TESTCASE=divert_drain_test REPLY_DEPTH=4 DRAIN_RESULT=before.json
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def divert_drain_test(dut):
+  print("////////////////////////////////////////")
+  print("//       Begin divert drain test      //")
+  print("////////////////////////////////////////\n")
+
+  result_file = os.environ.get("DRAIN_RESULT")
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  model = BobModel(id_width=ID_WIDTH, queue_depth=QUEUE_DEPTH, runways=RUNWAYS)
+  packet_format = model.format
+  dut.runway_override.value = model.all_runways
+  dut.emergency_override.value = 0b0
+  model.set_overrides(model.all_runways)
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+  # runway_override takes two clocks to get through its synchronizer
+  await ClockCycles(dut.clock, 2, rising=False)
+
+  async def exchange(packet):
+    await send_packet(dut, packet_format, packet)
+    replies = []
+    for expected_reply in model.request(packet):
+      start, reply = await read_packet_timed(dut, packet_format)
+      assert reply == expected_reply, f"request {packet:#x}: expected reply {expected_reply:#x}, got {reply:#x}"
+      replies.append((start, reply))
+    return replies
+
+  planes = min(QUEUE_DEPTH, packet_format.ids)
+  ids = []
+  for _ in range(planes):
+    (start, reply), = await exchange(packet_format.encode(0, T_ID_PLEASE, 0))
+    ids.append(packet_format.decode(reply).id)
+  for id in ids:
+    await exchange(packet_format.encode(id, T_REQUEST, R_LANDING))
+  assert dut.bobby.landing_fifo.count.value == planes
+
+  bobby = dut.bobby
+  stall_cycles = 0
+  fsm_done = None
+  async def watch_fsm():
+    nonlocal stall_cycles, fsm_done
+    while True:
+      await RisingEdge(dut.clock)
+      await ReadOnly()
+      state = int(bobby.fsm.state.value)
+      if state in (0b010, 0b111) and bobby.reply_fifo_full.value:
+        stall_cycles += 1
+      if state == 0b000 and bobby.landing_fifo.empty.value:
+        fsm_done = get_sim_time(units="ns")
+        return
+  watcher = cocotb.start_soon(watch_fsm())
+
+  diverts = await exchange(packet_format.encode(ids[0], T_EMERGENCY, E_DECLARE))
+  # The driver's done_time is still that of the emergency's last byte
+  declared = uart_driver.done_time
+  drained = get_sim_time(units="ns")
+  await watcher
+  assert len(diverts) == planes, f"expected {planes} diverts, got {len(diverts)}"
+
+  drain = {
+    "reply_depth": REPLY_DEPTH,
+    "queue_depth": QUEUE_DEPTH,
+    "diverts": len(diverts),
+    "fsm_ns": fsm_done - declared,
+    "stall_cycles": stall_cycles,
+    "drain_ns": drained - declared,
+  }
+  print(f"TB      : REPLY_DEPTH={REPLY_DEPTH}, {planes} diverts, ReadRequestFsm done after "
+        f"{drain['fsm_ns']:.0f} ns with {stall_cycles} cycles waiting for uart_replies, "
+        f"last divert received after {drain['drain_ns']:.0f} ns")
+  if result_file:
+    with open(result_file, "w") as fh:
+      json.dump(drain, fh)
+
+  print("////////////////////////////////////////")
+  print("//      Finish divert drain test      //")
+  print("////////////////////////////////////////\n")
+
+# Plays random traffic, then reads every PerfCounters counter with status
+# queries. The event counters are checked against the model, the FIFO
+# high-water marks against the FIFO counts seen during the run. On BobTop a
+# frame with a low stop bit is sent for each framing error, on
+# BobBypassTop a burst of ID requests with no gap overflows the request
+# FIFO. STATS_PACKETS sets the traffic, e.g.
+# make -f testbench.mk TESTCASE=stats_test STATS_PACKETS=500
+@cocotb.test(skip=False)
+@measured
+@covered
+@traced
+async def stats_test(dut):
+  print("////////////////////////////////////////")
+  print("//          Begin stats test          //")
+  print("////////////////////////////////////////\n")
+
+  packets = int(os.environ.get("STATS_PACKETS", 100))
+  framing_errors = 3
+  burst = 16
+
+  # Run the clock
+  cocotb.start_soon(Clock(dut.clock, CLOCK_PERIOD, units="ns").start())
+  start_uart(dut, with_cosim=False)
+
+  dut.runway_override.value = 0b00
+  dut.emergency_override.value = 0b0
+
+  dut.reset.value = True
+  await FallingEdge(dut.clock)
+  dut.reset.value = False
+  await FallingEdge(dut.clock)
+
+  model = BobModel(id_width=ID_WIDTH, queue_depth=QUEUE_DEPTH, runways=RUNWAYS, reply_depth=REPLY_DEPTH)
+  packet_format = model.format
+  bobby = dut.bobby
+
+  high = {"uart_requests": 0, "uart_replies": 0, "takeoff_fifo": 0, "landing_fifo": 0}
+  async def watch_fifos():
+    while True:
+      await First(*(Edge(getattr(bobby, name).count) for name in high))
+      await ReadOnly()
+      for name in high:
+        high[name] = max(high[name], int(getattr(bobby, name).count.value))
+  cocotb.start_soon(watch_fifos())
+
+  async def receive(packet):
+    for expected_reply in model.request(packet):
+      start, reply = await read_packet_timed(dut, packet_format)
+      assert reply == expected_reply, f"request {packet:#x}: expected reply {expected_reply:#x}, got {reply:#x}"
+
+  async def exchange(packet):
+    await send_packet(dut, packet_format, packet)
+    await receive(packet)
+
+  traffic = TrafficGenerator(model, back_to_back=True)
+  print(f"TB      : Playing {packets} random requests")
+  for _ in range(packets):
+    kind, packet = traffic.next_packet()
+    await exchange(packet)
+
+  # Requests are answered before the next is sent, so only the burst below
+  # can overflow the request FIFO
+  drops = 0
+  if BYPASS_UART:
+    # A byte every clock is faster than ReadRequestFsm reads requests, so
+    # the request FIFO fills and drops some
+    id_please = packet_format.encode(0, T_ID_PLEASE, 0)
+    for data in packet_format.to_bytes(id_please) * burst:
+      await FallingEdge(dut.clock)
+      dut.uart_rx_data.value = data
+      dut.uart_rx_valid.value = 1
+      await ReadOnly()
+      if bobby.rx_packet_valid.value and bobby.uart_full.value and not bobby.uart_rd_request.value:
+        drops += 1
+    await FallingEdge(dut.clock)
+    dut.uart_rx_valid.value = 0
+    assert drops, "the burst did not overflow the request FIFO"
+    # The requests that got in are answered in order
+    for _ in range(burst - drops):
+      await receive(id_please)
+    framing_errors = 0
+  else:
+    for _ in range(framing_errors):
+      for value in [0] * 10 + [1] * 2:
+        await uart_driver.bit(value)
+
+  # The model sees neither framing errors nor overflows. High-water marks
+  # are taken when each query is read, the replies to earlier queries
+  # count too.
+  def expected(counter):
+    if counter < STAT_FRAMING_ERRORS:
+      return model.counter(counter)
+    elif counter == STAT_FRAMING_ERRORS:
+      return framing_errors
+    elif counter == STAT_REQUEST_DROPS:
+      return drops
+    elif counter == STAT_FIFO_HIGH:
+      return min(high["uart_requests"], 255) << 8 | min(high["uart_replies"], 255)
+    elif counter == STAT_QUEUE_HIGH:
+      return min(high["takeoff_fifo"], 255) << 8 | min(high["landing_fifo"], 255)
+    return 0
+
+  # One ID past the last counter, which reads 0
+  for counter in range(min(len(STAT_NAMES) + 1, packet_format.ids)):
+    query = packet_format.status_query(counter)
+    value = expected(counter)
+    model.request(query)
+    await send_packet(dut, packet_format, query)
+    start, header = await read_packet_timed(dut, packet_format)
+    assert header == packet_format.encode(counter, T_SAY_AGAIN, 1), f"counter {counter}: bad header {header:#x}"
+    words = [(await read_packet_timed(dut, packet_format))[1] for _ in range(packet_format.status_packets)]
+    name = STAT_NAMES[counter] if counter < len(STAT_NAMES) else "unused"
+    print(f"TB      : {name:<16} {packet_format.status_value(words):#06x}")
+    assert packet_format.status_value(words) == value, \
+      f"{name}: expected {value:#06x}, got {packet_format.status_value(words):#06x}"
+
+  print("////////////////////////////////////////")
+  print("//         Finish stats test          //")
+  print("////////////////////////////////////////\n")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Sweeps BobTop's CLK_HZ and BAUD_RATE parameters and the testbench
+# driver's baud skew, running uart_margin_test at every point. BaudRateGenerator
+# divides the clock by a whole number, so a slow clock leaves the real baud
+# rate off from the nominal one on top of any skew. For each point the sweep
+# records framing errors and wrong or missing replies with frames sent back to
+# back, then adds idle bits between frames until the link runs clean. The
+# fastest clean packet rate is the one the link can sustain. With --runtime
+# each clock is built once and the baud rate is picked by BobTop's
+# baud_divisor pins instead, as it would be on the chip.
+#
+#   python3 baud_sweep.py --clocks 25000000 --bauds 115200,921600 --skews=-4,-2,0,2,4
+#   python3 baud_sweep.py --clocks 10000,50000 --bauds 300,1200 --packets 16
+#   python3 baud_sweep.py --runtime --bauds 115200,460800,921600,1562500
+
+TESTBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = "sim_build/sweep"
+TESTCASE = "uart_margin_test"
+# UartRX takes 16 samples a bit, or 8 or 4 when there are fewer clocks per
+# bit, and at most one per clock
+MIN_DIVISOR = 4
+# Clocks per bit the 8 baud_divisor pins can select, lower values keep the
+# BAUD_RATE the design was built with
+RUNTIME_DIVISORS = range(16, 256)
+RUNTIME_BUILD_BAUD = 115200
+
+def int_list(text):
+  return [int(float(item)) for item in text.split(",") if item]
+
+def float_list(text):
+  return [float(item) for item in text.split(",") if item]
+
+# Clocks per bit, rounded to the nearest like BaudRateGenerator's DIVISOR
+def divisor(clk_hz, baud_rate):
+  return (clk_hz + baud_rate // 2) // baud_rate
+
+# Error of the baud rate BaudRateGenerator produces, which ticks every
+# divisor clocks
+def baud_error(clk_hz, baud_rate):
+  actual = clk_hz / divisor(clk_hz, baud_rate)
+  return actual / baud_rate - 1
+
+def build(sim, clk_hz, baud_rate):
+  build = os.path.join(BUILD_DIR, sim, f"{clk_hz}_{baud_rate}")
+  os.makedirs(os.path.join(TESTBENCH_DIR, build), exist_ok=True)
+  log = os.path.join(TESTBENCH_DIR, build, "build.log")
+  cmd = ["make", "-f", "testbench.mk", "build", f"SIM={sim}", "TOPLEVEL=BobTop", "WAVES=0",
+         f"CLK_HZ={clk_hz}", f"BAUD_RATE={baud_rate}", f"SIM_BUILD={build}"]
+  with open(log, "w") as fh:
+    if subprocess.run(cmd, cwd=TESTBENCH_DIR, stdout=fh, stderr=subprocess.STDOUT).returncode:
+      return None
+  return build
+
+# runtime sends the baud rate to a build for RUNTIME_BUILD_BAUD on the
+# baud_divisor pins, the driver then runs at the rate they give
+def run_point(sim, build, clk_hz, baud_rate, runtime, skew, idle_bits, packets):
+  name = f"{clk_hz}_{baud_rate}{'_runtime' if runtime else ''}_{skew:+g}_{idle_bits}"
+  point_dir = os.path.join(TESTBENCH_DIR, BUILD_DIR, sim, "points", name)
+  os.makedirs(point_dir, exist_ok=True)
+  result = os.path.join(point_dir, "margin.json")
+  if os.path.exists(result):
+    os.remove(result)
+
+  cmd = ["make", "-f", "testbench.mk",
+         f"SIM={sim}", "TOPLEVEL=BobTop", "WAVES=0",
+         f"SIM_BUILD={build}",
+         f"TESTCASE={TESTCASE}",
+         f"COCOTB_RESULTS_FILE={os.path.join(point_dir, 'results.xml')}",
+         f"CLK_HZ={clk_hz}", f"BAUD_RATE={RUNTIME_BUILD_BAUD if runtime else baud_rate}",
+         f"BAUD_DIVISOR={divisor(clk_hz, baud_rate) if runtime else 0}",
+         f"UART_SKEW={skew}", f"UART_IDLE_BITS={idle_bits}",
+         f"UART_MARGIN_PACKETS={packets}", f"UART_MARGIN_RESULT={result}"]
+  with open(os.path.join(point_dir, "sim.log"), "w") as fh:
+    subprocess.run(cmd, cwd=TESTBENCH_DIR, stdout=fh, stderr=subprocess.STDOUT)
+
+  if not os.path.exists(result):
+    return None
+  with open(result) as fh:
+    return json.load(fh)
+
+def clean(margin):
+  return margin is not None and not (margin["framing_errors"] or margin["reply_framing_errors"] or
+                                     margin["wrong_replies"] or margin["request_fifo_drops"])
+
+# Runs one skew point back to back, then with more and more idle bits until
+# it runs clean, returns (back to back result, clean result or None)
+def sweep_point(sim, build, clk_hz, baud_rate, runtime, skew, idle_steps, packets):
+  first = run_point(sim, build, clk_hz, baud_rate, runtime, skew, 0, packets)
+  if clean(first):
+    return first, first
+  for idle_bits in idle_steps:
+    margin = run_point(sim, build, clk_hz, baud_rate, runtime, skew, idle_bits, packets)
+    if clean(margin):
+      return first, margin
+  return first, None
+
+def report(rows, filename):
+  lines = [
+    "| Clock (Hz) | Baud | Divisor | Baud error | Driver skew | Framing errors | Wrong replies | Sustained (packets/s) | Idle bits |",
+    "| ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |",
+  ]
+  for clk_hz, baud_rate, skew, first, sustained in rows:
+    prefix = f"| {clk_hz} | {baud_rate} | {divisor(clk_hz, baud_rate)} | {baud_error(clk_hz, baud_rate) * 100:+.2f}% | {skew:+g}% |"
+    if first is None:
+      lines.append(prefix + "  |  | did not run |  |")
+      continue
+    errors = first["framing_errors"] + first["reply_framing_errors"]
+    rate = f"{sustained['packet_rate']:.0f}" if sustained else "none"
+    idle = str(sustained["idle_bits"]) if sustained else ""
+    lines.append(prefix + f" {errors} | {first['wrong_replies']} | {rate} | {idle} |")
+
+  with open(filename, "w") as fh:
+    fh.write("\n".join(lines) + "\n")
+  print("\n".join(lines))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Sweep BobTop's clock, baud rate and baud skew")
+
+  parser.add_argument('--clocks', help="comma separated CLK_HZ values", type=int_list, default=[25000000])
+  parser.add_argument('--bauds', help="comma separated BAUD_RATE values", type=int_list,
+                      default=[9600, 115200, 460800, 921600])
+  parser.add_argument('--skews', help="comma separated driver baud skews in percent", type=float_list,
+                      default=[-5, -3, -2, -1, 0, 1, 2, 3, 5])
+  parser.add_argument('--idle', help="idle bits to try between frames when back to back fails",
+                      type=int_list, default=[1, 2, 4, 8])
+  parser.add_argument('--packets', help="requests sent at each point", type=int, default=64)
+  parser.add_argument('--runtime', help="pick the baud rate with the baud_divisor pins on one build per clock",
+                      action='store_true')
+  parser.add_argument('--sim', help="simulator", choices=("icarus", "verilator"), default="icarus")
+  parser.add_argument('-j', '--jobs', help="simulators to run at once", type=int, default=os.cpu_count())
+  parser.add_argument('--output', help="Markdown table to write", default="baud_sweep.md")
+
+  args = parser.parse_args()
+
+  configs = []
+  for clk_hz, baud_rate in itertools.product(args.clocks, args.bauds):
+    if args.runtime and divisor(clk_hz, baud_rate) not in RUNTIME_DIVISORS:
+      print(f"Skipping {baud_rate} baud at {clk_hz} Hz, baud_divisor only selects "
+            f"{RUNTIME_DIVISORS.start} to {RUNTIME_DIVISORS.stop - 1} clocks per bit")
+    elif divisor(clk_hz, baud_rate) < MIN_DIVISOR:
+      print(f"Skipping {baud_rate} baud at {clk_hz} Hz, fewer than {MIN_DIVISOR} clocks per bit")
+    else:
+      configs.append((clk_hz, baud_rate))
+
+  # Runtime points share the build of their clock
+  def build_config(clk_hz, baud_rate):
+    return (clk_hz, RUNTIME_BUILD_BAUD) if args.runtime else (clk_hz, baud_rate)
+  build_configs = sorted({build_config(*config) for config in configs})
+
+  with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    builds = dict(zip(build_configs, pool.map(lambda config: build(args.sim, *config), build_configs)))
+    for config, model in builds.items():
+      if model is None:
+        print(f"Build failed for {config[0]} Hz, {config[1]} baud, see {BUILD_DIR}/{args.sim}")
+
+    points = [(clk_hz, baud_rate, skew) for clk_hz, baud_rate in configs if builds[build_config(clk_hz, baud_rate)]
+              for skew in args.skews]
+    futures = [pool.submit(sweep_point, args.sim, builds[build_config(clk_hz, baud_rate)], clk_hz, baud_rate,
+                           args.runtime, skew, args.idle, args.packets)
+               for clk_hz, baud_rate, skew in points]
+    rows = [point + future.result() for point, future in zip(points, futures)]
+
+  print()
+  report(rows, os.path.join(TESTBENCH_DIR, args.output))
+  sys.exit(0 if rows else 1)
@@ -0,0 +1,152 @@
+from collections import deque
+
+import cocotb
+from cocotb.triggers import *
+
+from bobATC_codec import *
+from bobATC_model import BobModel
+
+# Differential co-simulation of Bob against BobModel. The monitor feeds
+# every packet Bob receives and every override change into the model, checks
+# every packet Bob sends against the replies the model predicted, and after
+# each of those events waits for ReadRequestFsm to go idle and compares the
+# whole architectural state. The first divergence raises, which fails the
+# test. Like the model it assumes the replies to one request have left
+# before the next request arrives, see pipeline.py for back to back traffic.
+
+# ReadRequestFsm never needs more than a few cycles per queued plane, not
+# counting the cycles it stalls on a full uart_replies, which last a UART
+# frame per reply
+SETTLE_CYCLES = 1000
+
+def fifo_contents(fifo, width, depth):
+  count = fifo.count.value.integer
+  get_ptr = fifo.get_ptr.value.integer
+  bits = fifo.queue.value.binstr
+  entries = []
+  for i in range(count):
+    slot = (get_ptr + i) % depth
+    entries.append(int(bits[len(bits) - (slot + 1) * width:len(bits) - slot * width], 2))
+  return tuple(entries)
+
+def rtl_state(bobby, id_width, queue_depth):
+  return {
+    "all_id": bobby.all_id.value.integer,
+    "runway": bobby.runway.value.integer,
+    "runway_active": bobby.runway_active.value.integer,
+    "takeoff_fifo": fifo_contents(bobby.takeoff_fifo, id_width, queue_depth),
+    "landing_fifo": fifo_contents(bobby.landing_fifo, id_width, queue_depth),
+    "takeoff_first": bobby.fsm.takeoff_first.value.integer,
+    "emergency": bobby.emergency.value.integer,
+    "emergency_id": bobby.emergency_id.value.integer,
+  }
+
+def model_state(model):
+  return {
+    "all_id": model.all_id,
+    "runway": model.runway,
+    "runway_active": model.runway_active,
+    "takeoff_fifo": tuple(model.takeoff_fifo.queue),
+    "landing_fifo": tuple(model.landing_fifo.queue),
+    "takeoff_first": model.takeoff_first,
+    "emergency": model.emergency_reg,
+    "emergency_id": model.emergency_id,
+  }
+
+# ReadRequestFsm is parked in its wait state with nothing it could do next
+def rtl_idle(bobby, all_runways):
+  if bobby.fsm.state.value.integer != 0 or not bobby.uart_empty.value:
+    return False
+  landing_waiting = not bobby.landing_fifo_empty.value
+  takeoff_waiting = not bobby.takeoff_fifo_empty.value
+  if bobby.emergency_out.value:
+    return not landing_waiting
+  return bobby.runway_active.value == all_runways or not (landing_waiting or takeoff_waiting)
+
+class CosimMonitor:
+  def __init__(self, dut, model=None):
+    self.bobby = dut.bobby
+    self.model = BobModel() if model is None else model
+    self.format = self.model.format
+    self.reply_bytes = []
+    self.expected = deque()
+    self.requests = 0
+    self.replies = 0
+    self.checks = 0
+    self.checking = 0
+    self.tasks = []
+
+  def start(self):
+    self.tasks = [cocotb.start_soon(watch()) for watch in
+                  (self.watch_reset, self.watch_requests, self.watch_replies, self.watch_overrides)]
+
+  def stop(self):
+    for task in self.tasks:
+      task.kill()
+    self.tasks = []
+
+  async def check(self, event):
+    self.checking += 1
+    cycles = 0
+    while cycles < SETTLE_CYCLES:
+      await RisingEdge(self.bobby.clock)
+      await ReadOnly()
+      if rtl_idle(self.bobby, self.model.all_runways):
+        break
+      if not self.bobby.reply_fifo_full.value:
+        cycles += 1
+    else:
+      raise AssertionError(f"Bob did not settle after {event}")
+
+    rtl = rtl_state(self.bobby, self.format.id_width, self.model.takeoff_fifo.depth)
+    model = model_state(self.model)
+    differ = [f"{key} rtl {rtl[key]} model {model[key]}" for key in rtl if rtl[key] != model[key]]
+    assert not differ, f"Bob diverged from the model after {event}: " + ", ".join(differ)
+    self.checks += 1
+    self.checking -= 1
+
+  async def watch_reset(self):
+    while True:
+      await FallingEdge(self.bobby.reset)
+      self.model.reset()
+      self.expected.clear()
+      self.reply_bytes = []
+
+  async def watch_requests(self):
+    while True:
+      await RisingEdge(self.bobby.rx_packet_valid)
+      await ReadOnly()
+      packet = self.bobby.rx_packet.value.integer
+      self.requests += 1
+      self.expected.extend(self.model.request(packet))
+      text = request_text(self.format.decode(packet))[1]
+      cocotb.start_soon(self.check(f"request {packet:#04x} ({text})"))
+
+  async def watch_replies(self):
+    while True:
+      await RisingEdge(self.bobby.uart_tx_send)
+      await ReadOnly()
+      self.reply_bytes.append(self.bobby.uart_tx_data.value.integer)
+      if len(self.reply_bytes) < self.format.bytes:
+        continue
+      reply = int.from_bytes(bytes(self.reply_bytes), "big")
+      self.reply_bytes = []
+      self.replies += 1
+      assert self.expected, f"Bob sent {reply:#04x} when the model expected no reply"
+      expected = self.expected.popleft()
+      assert reply == expected, f"Bob sent {reply:#04x} when the model expected {expected:#04x}"
+      cocotb.start_soon(self.check(f"reply {reply:#04x}"))
+
+  async def watch_overrides(self):
+    while True:
+      await First(Edge(self.bobby.runway_override), Edge(self.bobby.emergency_override))
+      await ReadOnly()
+      self.expected.extend(self.model.set_overrides(self.bobby.runway_override.value.integer,
+                                                    self.bobby.emergency_override.value.integer))
+      cocotb.start_soon(self.check("override change"))
+
+  # Waits until Bob has seen requests requests and sent every reply the
+  # model expects, and the state checks for them have passed
+  async def drained(self, requests):
+    while self.requests < requests or self.expected or self.checking:
+      await ClockCycles(self.bobby.clock, 64)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import argparse
+import functools
+import glob
+import json
+import os
+import sys
+
+import cocotb
+from cocotb.triggers import *
+
+# bobATC_codec.py lives at the top of the repo, testbench.mk sets this for tests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bobATC_codec import *
+
+# Functional coverage of the requests Bob receives. CoverageMonitor samples
+# the packet and Bob's state each time rx_packet_valid rises, before Bob acts
+# on it, and Coverage bins the sample into the coverpoints below. Bins are
+# list indices looked up from tables built at import for the ID_WIDTH,
+# QUEUE_DEPTH and RUNWAYS that testbench.mk exports, so a sample costs a few
+# signal reads and list increments.
+#
+# FCOV=1 collects coverage for every test and writes it to fcov/<test>_<pid>.json.
+# Run as a script it merges such files, e.g. from regression.py shards:
+#
+#   make -f testbench.mk FCOV=1 TESTCASE=random_traffic_test FCOV_GOAL=0.9 TRAFFIC_PACKETS=100000
+#   python3 functional_coverage.py fcov -o fcov_merged.json --holes
+
+TESTBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FCOV = os.environ.get("FCOV", "0") == "1"
+FCOV_DIR = os.environ.get("FCOV_DIR", os.path.join(TESTBENCH_DIR, "fcov"))
+# Fraction of bins random_traffic_test needs hit before it stops early, 0 runs every packet
+FCOV_GOAL = float(os.environ.get("FCOV_GOAL", 0))
+# Merged coverage from earlier runs, which counts towards FCOV_GOAL
+FCOV_MERGE = os.environ.get("FCOV_MERGE")
+
+ID_WIDTH = int(os.environ.get("ID_WIDTH", 4))
+QUEUE_DEPTH = int(os.environ.get("QUEUE_DEPTH", 8))
+RUNWAYS = int(os.environ.get("RUNWAYS", 2))
+FORMAT = PacketFormat(ID_WIDTH, RUNWAYS)
+
+# Names for the ranges 0-edges[0], edges[0]+1-edges[1], ... and the bin of
+# each value up to the last edge. Ranges left empty by a small parameter are
+# dropped.
+def ranges(edges):
+  names, table, low = [], [], 0
+  for edge in edges:
+    if edge < low:
+      continue
+    names.append(str(low) if edge == low else f"{low}-{edge}")
+    table += [len(names) - 1] * (edge - low + 1)
+    low = edge + 1
+  return names, tuple(table)
+
+# Packet bits below the ID, message type and action
+KIND_MASK = (1 << (FORMAT.action_width + 3)) - 1
+PACKET_BINS = tuple(f"{TYPE_NAMES[type]}/{action}" for type in range(8) for action in range(1 << FORMAT.action_width))
+FIFO_BINS, FIFO_BIN = ranges((0, QUEUE_DEPTH // 2 - 1, QUEUE_DEPTH - 1, QUEUE_DEPTH))
+FIFO_BINS = tuple(["empty"] + FIFO_BINS[1:-1] + ["full"])
+RUNWAY_BINS = tuple("none" if not active else "all" if active == (1 << RUNWAYS) - 1 else
+                    "runway " + "+".join(str(r) for r in range(RUNWAYS) if active >> r & 1)
+                    for active in range(1 << RUNWAYS))
+POPCOUNT_BINS, POPCOUNT_BIN = ranges((0, FORMAT.ids // 4, FORMAT.ids // 2, 3 * FORMAT.ids // 4,
+                                      FORMAT.ids - 1, FORMAT.ids))
+POPCOUNT_BINS = tuple(POPCOUNT_BINS)
+ALL_IDS = (1 << FORMAT.ids) - 1
+EMERGENCY_DECLARE = FORMAT.encode(0, T_EMERGENCY, E_DECLARE)
+
+def cross(*points):
+  bins = [""]
+  for point in points:
+    bins = [f"{prefix} x {name}" if prefix else name for prefix in bins for name in point]
+  return tuple(bins)
+
+COVERPOINTS = {
+  "packet":             PACKET_BINS,
+  "takeoff_fifo":       FIFO_BINS,
+  "landing_fifo":       FIFO_BINS,
+  "runway_active":      RUNWAY_BINS,
+  "all_id_popcount":    POPCOUNT_BINS,
+  "packet_x_id_full":   cross(PACKET_BINS, ("IDs free", "id_full")),
+  "packet_x_emergency": cross(PACKET_BINS, ("normal", "emergency")),
+  # Emergencies declared with each takeoff and landing FIFO occupancy
+  "emergency_x_fifos":  cross(FIFO_BINS, FIFO_BINS),
+}
+
+class Coverage:
+  def __init__(self):
+    self.samples = 0
+    self.hits = {name: [0] * len(bins) for name, bins in COVERPOINTS.items()}
+
+  def sample(self, packet, takeoff_count, landing_count, runway_active, all_id, emergency):
+    kind = packet & KIND_MASK
+    takeoff = FIFO_BIN[takeoff_count]
+    landing = FIFO_BIN[landing_count]
+    hits = self.hits
+    self.samples += 1
+    hits["packet"][kind] += 1
+    hits["takeoff_fifo"][takeoff] += 1
+    hits["landing_fifo"][landing] += 1
+    hits["runway_active"][runway_active] += 1
+    hits["all_id_popcount"][POPCOUNT_BIN[bin(all_id).count("1")]] += 1
+    hits["packet_x_id_full"][2 * kind + (all_id == ALL_IDS)] += 1
+    hits["packet_x_emergency"][2 * kind + emergency] += 1
+    if kind == EMERGENCY_DECLARE:
+      hits["emergency_x_fifos"][len(FIFO_BINS) * takeoff + landing] += 1
+
+  def merge(self, other):
+    self.samples += other.samples
+    for name, counts in other.hits.items():
+      mine = self.hits[name]
+      for i, count in enumerate(counts):
+        mine[i] += count
+    return self
+
+  def holes(self):
+    return {name: [COVERPOINTS[name][i] for i, count in enumerate(counts) if not count]
+            for name, counts in self.hits.items()}
+
+  def covered(self):
+    hit = sum(1 for counts in self.hits.values() for count in counts if count)
+    return hit / sum(len(bins) for bins in COVERPOINTS.values())
+
+  # Bins are saved by name, so files from before a coverpoint changed still merge
+  def to_json(self):
+    return {"samples": self.samples,
+            "hits": {name: dict(zip(COVERPOINTS[name], counts)) for name, counts in self.hits.items()}}
+
+  @classmethod
+  def from_json(cls, data):
+    coverage = cls()
+    coverage.samples = data["samples"]
+    for name, counts in data["hits"].items():
+      if name not in COVERPOINTS:
+        continue
+      index = {bin_name: i for i, bin_name in enumerate(COVERPOINTS[name])}
+      for bin_name, count in counts.items():
+        if bin_name in index:
+          coverage.hits[name][index[bin_name]] += count
+    return coverage
+
+  def summary(self, holes=False):
+    lines = [f"{'Coverpoint':<22}{'Bins':>6}{'Hit':>6}{'Covered':>9}"]
+    for name, counts in self.hits.items():
+      hit = sum(1 for count in counts if count)
+      lines.append(f"{name:<22}{len(counts):>6}{hit:>6}{100 * hit / len(counts):>8.1f}%")
+      if holes and hit < len(counts):
+        lines.append("  missing: " + ", ".join(self.holes()[name]))
+    lines.append(f"{self.samples} samples, {100 * self.covered():.1f}% of all bins")
+    return "\n".join(lines)
+
+def load(filename):
+  with open(filename) as fh:
+    return Coverage.from_json(json.load(fh))
+
+def save(coverage, filename):
+  os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+  with open(filename, "w") as fh:
+    json.dump(coverage.to_json(), fh, indent=1)
+
+class CoverageMonitor:
+  def __init__(self, dut, coverage):
+    self.bobby = dut.bobby
+    self.coverage = coverage
+    self.task = None
+
+  def start(self):
+    self.task = cocotb.start_soon(self.run())
+
+  def stop(self):
+    if self.task is not None:
+      self.task.kill()
+      self.task = None
+
+  async def run(self):
+    bobby = self.bobby
+    while True:
+      await RisingEdge(bobby.rx_packet_valid)
+      await ReadOnly()
+      self.coverage.sample(int(bobby.rx_packet.value), int(bobby.takeoff_fifo.count.value),
+                           int(bobby.landing_fifo.count.value), int(bobby.runway_active.value),
+                           int(bobby.all_id.value), int(bobby.emergency.value))
+
+# Coverage of the running test, merged with FCOV_MERGE
+active = None
+prior = None
+
+def closed(goal=FCOV_GOAL):
+  if active is None or not goal:
+    return False
+  return Coverage().merge(active).merge(prior or Coverage()).covered() >= goal
+
+# Wraps a test so that with FCOV=1 it samples coverage and writes it to FCOV_DIR
+def covered(test):
+  @functools.wraps(test)
+  async def run(dut):
+    global active, prior
+    if not FCOV:
+      return await test(dut)
+
+    active = Coverage()
+    prior = load(FCOV_MERGE) if FCOV_MERGE and os.path.exists(FCOV_MERGE) else None
+    monitor = CoverageMonitor(dut, active)
+    monitor.start()
+    try:
+      return await test(dut)
+    finally:
+      monitor.stop()
+      filename = os.path.join(FCOV_DIR, f"{test.__name__}_{os.getpid()}.json")
+      save(active, filename)
+      print(f"TB      : {test.__name__} covered {100 * active.covered():.1f}% of bins "
+            f"in {active.samples} samples, wrote {filename}")
+  return run
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Merge and report functional coverage from FCOV=1 runs")
+
+  parser.add_argument('inputs', nargs='*', help="coverage files or directories of them", default=[FCOV_DIR])
+  parser.add_argument('-o', '--output', help="write the merged coverage here")
+  parser.add_argument('--holes', help="list the bins nothing hit", action='store_true')
+  parser.add_argument('--goal', help="exit 1 below this fraction of bins", type=float, default=0)
+
+  args = parser.parse_args()
+
+  files = []
+  for path in args.inputs:
+    files += sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+  if not files:
+    sys.exit("No coverage files found, run the tests with FCOV=1 first")
+
+  merged = Coverage()
+  for filename in files:
+    merged.merge(load(filename))
+  print(f"Merged {len(files)} coverage files")
+  print(merged.summary(args.holes))
+  if args.output:
+    save(merged, args.output)
+
+  sys.exit(1 if merged.covered() < args.goal else 0)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Compares AircraftIDManager's free ID search in src/Bob.v, a find-first-zero
+# tree, against the case (1'b0) priority chain it replaced, which is
+# generated here for each ID width. Each is synthesized on its own with yosys
+# for its cell count and logic depth, the longest path in cells from the
+# taken_id register back to itself, and with --prove yosys also checks that
+# the two pick the same ID for every taken_id.
+#
+#   python3 id_search_depth.py --id-widths 4,5,6,8 --prove
+#   YOSYS=yowasp-yosys python3 id_search_depth.py --no-abc
+
+TESTBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOB_V = os.path.join(os.path.dirname(TESTBENCH_DIR), "src", "Bob.v")
+BUILD_DIR = os.path.join(TESTBENCH_DIR, "sim_build", "id_search")
+
+YOSYS = os.environ.get("YOSYS", "yosys")
+
+def int_list(text):
+  return [int(item) for item in text.split(",") if item]
+
+# The search AircraftIDManager had before the tree, one case item per ID
+def chain_module(id_width):
+  ids = 1 << id_width
+  items = "\n".join(f"\t\t\ttaken_id[{i}]: id_avail = {id_width}'d{i};" for i in range(ids))
+  return f"""module AircraftIDManagerChain (
+	clock,
+	reset,
+	id_in,
+	release_id,
+	take_id,
+	id_out,
+	all_id,
+	full
+);
+	input wire clock;
+	input wire reset;
+	input wire [{id_width - 1}:0] id_in;
+	input wire release_id;
+	input wire take_id;
+	output wire [{id_width - 1}:0] id_out;
+	output wire [{ids - 1}:0] all_id;
+	output wire full;
+	reg [{ids - 1}:0] taken_id;
+	reg [{id_width - 1}:0] id_avail;
+	assign all_id = taken_id;
+	assign id_out = id_avail;
+	assign full = &taken_id;
+	always @(*) begin
+		id_avail = {id_width}'d0;
+		case (1'b0)
+{items}
+			default: id_avail = {id_width}'d0;
+		endcase
+	end
+	always @(posedge clock)
+		if (reset)
+			taken_id <= 1'sb0;
+		else if (release_id)
+			taken_id[id_in] <= 1'b0;
+		else if (take_id && !full)
+			taken_id[id_avail] <= 1'b1;
+endmodule
+"""
+
+def yosys(point_dir, name, commands):
+  with open(os.path.join(point_dir, f"{name}.log"), "w") as fh:
+    return subprocess.run([YOSYS, "-p", "; ".join(commands)], cwd=point_dir, stdout=fh,
+                          stderr=subprocess.STDOUT).returncode == 0
+
+# Reports go into point_dir by relative path, which yowasp-yosys can write
+def synthesize(point_dir, name, read, abc):
+  if not yosys(point_dir, name, read + [
+      f"synth -flatten -top {name}" + ("" if abc else " -noabc"),
+      f"tee -q -o {name}_stat.json stat -json",
+      f"tee -q -o {name}_ltp.txt ltp -noff"]):
+    return None
+  with open(os.path.join(point_dir, f"{name}_stat.json")) as fh:
+    stat = next(iter(json.load(fh)["modules"].values()))
+  with open(os.path.join(point_dir, f"{name}_ltp.txt")) as fh:
+    depth = re.search(r"length=(\d+)", fh.read())
+  return {"cells": stat["num_cells"], "logic_depth": int(depth.group(1)) if depth else None}
+
+# equiv_make pairs up the taken_id registers, so this proves the next state
+# and outputs match for any taken_id, not only ones reachable from reset
+def prove(point_dir, read):
+  return yosys(point_dir, "prove", read + [
+    "proc", "opt_clean",
+    "equiv_make AircraftIDManagerChain AircraftIDManager equiv",
+    "hierarchy -top equiv", "flatten", "equiv_simple", "equiv_status -assert"])
+
+def compare(id_width, abc, check):
+  point_dir = os.path.join(BUILD_DIR, str(id_width))
+  os.makedirs(point_dir, exist_ok=True)
+  with open(os.path.join(point_dir, "chain.v"), "w") as fh:
+    fh.write(chain_module(id_width))
+
+  tree_read = [f"read_verilog {BOB_V}", f"chparam -set ID_WIDTH {id_width} AircraftIDManager"]
+  chain_read = ["read_verilog chain.v"]
+  return {
+    "id_width": id_width,
+    "tree": synthesize(point_dir, "AircraftIDManager", tree_read, abc),
+    "chain": synthesize(point_dir, "AircraftIDManagerChain", chain_read, abc),
+    "equivalent": prove(point_dir, tree_read + chain_read) if check else None,
+  }
+
+def report(rows):
+  lines = [
+    "| ID width | Chain cells | Chain depth | Tree cells | Tree depth | Equivalent |",
+    "| ---: | ---: | ---: | ---: | ---: | :---: |",
+  ]
+  for row in rows:
+    chain, tree = row["chain"] or {}, row["tree"] or {}
+    equivalent = {None: "", True: "yes", False: "NO"}[row["equivalent"]]
+    lines.append(f"| {row['id_width']} | {chain.get('cells', 'failed')} | {chain.get('logic_depth', '')} |"
+                 f" {tree.get('cells', 'failed')} | {tree.get('logic_depth', '')} | {equivalent} |")
+  print("\n".join(lines))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Compare the free ID search tree with the old priority chain")
+
+  parser.add_argument('--id-widths', help="comma separated ID_WIDTH values", type=int_list, default=[4, 5, 6, 7, 8])
+  parser.add_argument('--prove', help="also prove the two equivalent", action='store_true')
+  parser.add_argument('--no-abc', help="skip ABC, for yosys builds without it", action='store_true')
+
+  args = parser.parse_args()
+
+  rows = [compare(id_width, not args.no_abc, args.prove) for id_width in args.id_widths]
+  report(rows)
+  sys.exit(0 if all(row["tree"] and row["chain"] and row["equivalent"] is not False for row in rows) else 1)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import argparse
+import cProfile
+import functools
+import json
+import os
+import pstats
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+# Simulation speed instrumentation. With PERF=1 every test appends a record
+# of its simulated time, wall time, clock cycles per second and the number of
+# triggers it primed to perf_history.jsonl, one line per test. Each primed
+# trigger is one GPI callback from the simulator, counted by trigger type
+# and signal, so FallingEdge(clock) in BypassDriver shows up apart from
+# FallingEdge(tx) in UartMonitor. PERF_PROFILE=1 also runs cProfile over the
+# test and keeps its top Python hotspots.
+#
+# Run as a script it compares the latest run of each test with the median
+# of its previous runs, writes perf_report.md and exits 1 on a slowdown.
+# Callbacks per cycle does not depend on the machine, so a change to read(),
+# write() or the RTL that adds scheduler wakeups fails even on a noisy host.
+#
+#   make -f testbench.mk PERF=1 PERF_PROFILE=1 WAVES=0
+#   python3 perf.py --threshold 0.2
+
+TESTBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PERF = os.environ.get("PERF", "0") == "1"
+PERF_PROFILE = os.environ.get("PERF_PROFILE", "0") == "1"
+HISTORY = os.environ.get("PERF_HISTORY", os.path.join(TESTBENCH_DIR, "perf_history.jsonl"))
+REPORT = "perf_report.md"
+# Tests launched together, by regression.py or one make call, share a run
+RUN = os.environ.get("PERF_RUN", time.strftime("%Y%m%d-%H%M%S"))
+
+HOTSPOTS = 10
+BASELINE_RUNS = 5
+THRESHOLD = 0.2
+
+trigger_counts = Counter()
+
+def trigger_name(trigger):
+  signal = getattr(trigger, "signal", None)
+  if signal is None:
+    return type(trigger).__name__
+  return f"{type(trigger).__name__}({getattr(signal, '_name', '?')})"
+
+# Wraps prime() on the classes that define it, every await of a simulator
+# trigger goes through one of them. cocotb 2 renamed it to _prime().
+def count_triggers():
+  from cocotb import triggers
+  method = "prime" if hasattr(triggers.Timer, "prime") else "_prime"
+  patched = set()
+  for cls in (triggers.Timer, triggers.RisingEdge, triggers.FallingEdge, triggers.Edge,
+              triggers.ReadOnly, triggers.ReadWrite, triggers.NextTimeStep):
+    owner = next(base for base in cls.__mro__ if method in vars(base))
+    if owner in patched:
+      continue
+    patched.add(owner)
+
+    def prime(self, *args, _prime=getattr(owner, method)):
+      trigger_counts[trigger_name(self)] += 1
+      return _prime(self, *args)
+    setattr(owner, method, prime)
+
+def git_commit():
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=TESTBENCH_DIR,
+                          capture_output=True, text=True).stdout.strip() or None
+  except OSError:
+    return None
+
+def hotspots(profile, count=HOTSPOTS):
+  stats = pstats.Stats(profile).stats
+  top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:count]
+  return [{"function": f"{os.path.basename(filename)}:{line}({function})",
+           "calls": calls, "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)}
+          for (filename, line, function), (primitive, calls, tottime, cumtime, callers) in top]
+
+# Returns a decorator that, with PERF=1, measures a test on a clock of
+# clock_period ns and appends its record to HISTORY
+def measure(clock_period):
+  if PERF:
+    count_triggers()
+
+  def measured(test):
+    @functools.wraps(test)
+    async def run(dut):
+      if not PERF:
+        return await test(dut)
+
+      from cocotb.utils import get_sim_time
+      trigger_counts.clear()
+      profile = cProfile.Profile() if PERF_PROFILE else None
+      passed = False
+      sim_start = get_sim_time(units="ns")
+      wall_start = time.perf_counter()
+      if profile:
+        profile.enable()
+      try:
+        result = await test(dut)
+        passed = True
+        return result
+      finally:
+        if profile:
+          profile.disable()
+        wall = time.perf_counter() - wall_start
+        sim_ns = get_sim_time(units="ns") - sim_start
+        record(test.__name__, passed, sim_ns, wall, clock_period, profile)
+    return run
+  return measured
+
+def record(test, passed, sim_ns, wall, clock_period, profile):
+  cycles = sim_ns / clock_period
+  callbacks = sum(trigger_counts.values())
+  entry = {
+    "run": RUN,
+    "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    "commit": git_commit(),
+    "sim": os.environ.get("SIM", "icarus"),
+    "toplevel": os.environ.get("TOPLEVEL", "BobTop"),
+    "test": test,
+    "passed": passed,
+    "sim_ns": sim_ns,
+    "wall_s": round(wall, 4),
+    "cycles": int(cycles),
+    "cycles_per_s": round(cycles / wall, 1) if wall else 0.0,
+    "callbacks": callbacks,
+    "callbacks_per_s": round(callbacks / wall, 1) if wall else 0.0,
+    "callbacks_per_cycle": round(callbacks / cycles, 5) if cycles else 0.0,
+    "triggers": dict(trigger_counts.most_common()),
+  }
+  if profile:
+    entry["hotspots"] = hotspots(profile)
+
+  with open(HISTORY, "a") as fh:
+    fh.write(json.dumps(entry) + "\n")
+  print(f"TB      : {test} ran {cycles:.0f} cycles in {wall:.2f} s, "
+        f"{entry['cycles_per_s']:.0f} cycles/s, {entry['callbacks_per_cycle']:.3f} callbacks/cycle")
+
+def load(filename):
+  with open(filename) as fh:
+    return [json.loads(line) for line in fh if line.strip()]
+
+def key(entry):
+  return (entry["test"], entry["sim"], entry["toplevel"])
+
+# Pairs the latest run of every test with the median of up to baseline_runs
+# earlier passing runs of the same test, simulator and toplevel, or only
+# the tests of one run
+def compare(history, baseline_runs=BASELINE_RUNS, threshold=THRESHOLD, run=None):
+  latest = {}
+  for entry in history:
+    if run is None or entry["run"] == run:
+      latest[key(entry)] = entry
+
+  rows = []
+  for entry in latest.values():
+    previous = [old for old in history if key(old) == key(entry) and old["run"] != entry["run"] and old["passed"]]
+    previous = previous[-baseline_runs:]
+    row = {"entry": entry, "baseline": None, "speed": None, "callbacks": None, "regressed": []}
+    if previous:
+      speed = statistics.median(old["cycles_per_s"] for old in previous)
+      callbacks = statistics.median(old["callbacks_per_cycle"] for old in previous)
+      row["baseline"] = {"cycles_per_s": speed, "callbacks_per_cycle": callbacks, "runs": len(previous)}
+      if speed:
+        row["speed"] = entry["cycles_per_s"] / speed - 1
+        if row["speed"] < -threshold:
+          row["regressed"].append("cycles/s")
+      if callbacks:
+        row["callbacks"] = entry["callbacks_per_cycle"] / callbacks - 1
+        if row["callbacks"] > threshold:
+          row["regressed"].append("callbacks/cycle")
+    rows.append(row)
+  return rows
+
+def percent(change):
+  return "" if change is None else f"{change * 100:+.1f}%"
+
+def report(rows, filename):
+  lines = [
+    "| Test | Sim | Sim time (ms) | Wall (s) | kcycles/s | vs baseline | Callbacks/cycle | vs baseline | Top triggers |",
+    "| --- | --- | ---: | ---: | ---: | ---: | ---: | ---: | --- |",
+  ]
+  for row in rows:
+    entry = row["entry"]
+    top = ", ".join(f"{name} {count}" for name, count in list(entry["triggers"].items())[:3])
+    flag = " **slower**" if row["regressed"] else ""
+    lines.append(f"| {entry['test']}{flag} | {entry['sim']}/{entry['toplevel']} | {entry['sim_ns'] / 1e6:.3f} | "
+                 f"{entry['wall_s']:.2f} | {entry['cycles_per_s'] / 1e3:.1f} | {percent(row['speed'])} | "
+                 f"{entry['callbacks_per_cycle']:.4f} | {percent(row['callbacks'])} | {top} |")
+
+  for row in rows:
+    if "hotspots" not in row["entry"]:
+      continue
+    entry = row["entry"]
+    lines += ["", f"### {entry['test']} hotspots", "",
+              "| Function | Calls | Own time (s) | Total time (s) |", "| --- | ---: | ---: | ---: |"]
+    for spot in entry["hotspots"]:
+      lines.append(f"| `{spot['function']}` | {spot['calls']} | {spot['tottime']:.3f} | {spot['cumtime']:.3f} |")
+
+  with open(filename, "w") as fh:
+    fh.write("\n".join(lines) + "\n")
+  print("\n".join(lines))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Report simulation speed trends from PERF=1 runs")
+
+  parser.add_argument('--history', help="history written by PERF=1 runs", default=HISTORY)
+  parser.add_argument('--report', help="Markdown report to write", default=os.path.join(TESTBENCH_DIR, REPORT))
+  parser.add_argument('--baseline', help="earlier runs to take the median of", type=int, default=BASELINE_RUNS)
+  parser.add_argument('--threshold', help="relative slowdown that fails", type=float, default=THRESHOLD)
+  parser.add_argument('--run', help="only report this run, default the latest of each test")
+
+  args = parser.parse_args()
+
+  if not os.path.exists(args.history):
+    sys.exit(f"No history in {args.history}, run the tests with PERF=1 first")
+  rows = compare(load(args.history), args.baseline, args.threshold, args.run)
+  report(rows, args.report)
+
+  regressed = [f"{row['entry']['test']} ({', '.join(row['regressed'])})" for row in rows if row["regressed"]]
+  if regressed:
+    print()
+    print("Slower than baseline: " + ", ".join(regressed))
+  sys.exit(1 if regressed else 0)
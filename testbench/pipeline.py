@@ -0,0 +1,112 @@
+import cocotb
+from cocotb.triggers import *
+from cocotb.result import SimTimeoutError
+from cocotb.utils import get_sim_time
+
+from bobATC_codec import *
+from bobATC_helper import expects_reply
+from bobATC_model import S_QUEUE_REPLY, S_SEND_CLEAR
+
+# Pipelined request mode. stream_requests() sends a list of packets back to
+# back at line rate without waiting for replies, then matches the replies to
+# the requests by plane ID. It also counts requests lost to a full request
+# FIFO, and the cycles ReadRequestFsm stalls on a full reply FIFO, where it
+# waits rather than dropping the reply.
+
+class BurstResult:
+  def __init__(self):
+    self.sent = 0
+    self.replies = []
+    self.latencies = []
+    self.unanswered = []
+    self.unsolicited = []
+    self.request_fifo_drops = 0
+    self.reply_fifo_stalls = 0
+    self.start_time = 0
+    self.end_time = 0
+
+  def summary(self):
+    duration = self.end_time - self.start_time
+    lines = [
+      f"Sent {self.sent} requests, got {len(self.replies)} replies in {duration / 1e3:.1f} us",
+      f"Matched {len(self.latencies)} replies by plane ID, {len(self.unsolicited)} unsolicited "
+      f"(clears after a hold, emergency diverts)",
+      f"Unanswered requests {len(self.unanswered)}: {', '.join(f'{p:#04x}' for p in self.unanswered) or 'none'}",
+      f"Request FIFO overflows {self.request_fifo_drops}, {self.reply_fifo_stalls} cycles stalled on a full reply FIFO",
+    ]
+    if self.latencies:
+      lines.append(f"Reply latency min {min(self.latencies):.0f} ns, max {max(self.latencies):.0f} ns")
+    if duration:
+      lines.append(f"Throughput {self.sent / duration * 1e9:.0f} requests/s")
+    return "\n".join(lines)
+
+# A write into a full FIFO is dropped unless the same cycle also reads it
+async def watch_request_fifo(bobby, result):
+  while True:
+    await RisingEdge(bobby.uart_rx_valid)
+    await ReadOnly()
+    if bobby.uart_requests.full.value and not bobby.uart_rd_request.value:
+      result.request_fifo_drops += 1
+
+# Only wakes every clock while the reply FIFO is full
+async def watch_reply_fifo(bobby, result):
+  while True:
+    await RisingEdge(bobby.reply_fifo_full)
+    while bobby.reply_fifo_full.value:
+      await RisingEdge(bobby.clock)
+      await ReadOnly()
+      if bobby.reply_fifo_full.value and int(bobby.fsm.state.value) in (S_QUEUE_REPLY, S_SEND_CLEAR):
+        result.reply_fifo_stalls += 1
+
+def match_replies(result, sent):
+  # ID replies carry the new ID, so they answer ID requests in order. Every
+  # other reply answers the oldest open request from the plane it names.
+  waiting_id = [(time, packet) for time, packet in sent if PACKETS[packet].type == T_ID_PLEASE]
+  waiting = {}
+  for time, packet in sent:
+    if expects_reply(packet) and PACKETS[packet].type != T_ID_PLEASE:
+      waiting.setdefault(PACKETS[packet].id, []).append((time, packet))
+
+  for start, reply in result.replies:
+    decoded = PACKETS[reply]
+    if decoded.type == T_ID_PLEASE and waiting_id:
+      time, packet = waiting_id.pop(0)
+    elif decoded.type != T_ID_PLEASE and waiting.get(decoded.id):
+      time, packet = waiting[decoded.id].pop(0)
+    else:
+      result.unsolicited.append(reply)
+      continue
+    result.latencies.append(start - time)
+
+  result.unanswered = [packet for time, packet in waiting_id]
+  for requests in waiting.values():
+    result.unanswered += [packet for time, packet in requests]
+
+async def stream_requests(dut, driver, monitor, packets, idle_timeout):
+  result = BurstResult()
+  watchers = [
+    cocotb.start_soon(watch_request_fifo(dut.bobby, result)),
+    cocotb.start_soon(watch_reply_fifo(dut.bobby, result)),
+  ]
+
+  result.start_time = get_sim_time(units="ns")
+  sent = []
+  for packet in packets:
+    await driver.write(packet)
+    sent.append((driver.done_time, packet))
+  result.sent = len(sent)
+
+  # Replies queue up in the monitor while we send, collect until the line
+  # has been quiet for idle_timeout
+  while True:
+    try:
+      result.replies.append(await monitor.read_timed(idle_timeout))
+    except SimTimeoutError:
+      break
+  result.end_time = result.replies[-1][0] if result.replies else get_sim_time(units="ns")
+
+  for watcher in watchers:
+    watcher.kill()
+
+  match_replies(result, sent)
+  return result
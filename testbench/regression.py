@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import perf
+
+# Runs the cocotb tests in Bob_test_with_UART.py as separate simulator
+# processes, a few at a time, then merges their results.xml files. Icarus
+# shards each build their own model since that takes a second, Verilator
+# compiles once and every shard runs the same binary.
+#
+#   python3 regression.py -j 4
+#   python3 regression.py --toplevel BobBypassTop --tests basic_test,emergency_test
+#   python3 regression.py --sim verilator
+#   python3 regression.py --compare --tests random_traffic_test TRAFFIC_PACKETS=2000
+#   python3 regression.py --perf -j 1
+
+TESTBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_MODULE = "Bob_test_with_UART"
+BUILD_DIR = "sim_build/regression"
+SIMULATORS = ("icarus", "verilator")
+
+def find_tests(module):
+  with open(os.path.join(TESTBENCH_DIR, module + ".py")) as fh:
+    tree = ast.parse(fh.read())
+
+  tests = []
+  for node in tree.body:
+    if not isinstance(node, ast.AsyncFunctionDef):
+      continue
+    for decorator in node.decorator_list:
+      if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+      if ast.unparse(decorator) == "cocotb.test":
+        tests.append(node.name)
+  return tests
+
+def shared_build(sim):
+  return sim == "verilator"
+
+def build_model(sim, toplevel, extra_args):
+  build = os.path.join(BUILD_DIR, sim, toplevel, "model")
+  os.makedirs(os.path.join(TESTBENCH_DIR, build), exist_ok=True)
+  log = os.path.join(TESTBENCH_DIR, build, "build.log")
+  cmd = ["make", "-f", "testbench.mk", "build", f"SIM={sim}", f"TOPLEVEL={toplevel}", f"SIM_BUILD={build}"] + extra_args
+
+  start = time.monotonic()
+  with open(log, "w") as fh:
+    returncode = subprocess.run(cmd, cwd=TESTBENCH_DIR, stdout=fh, stderr=subprocess.STDOUT).returncode
+  if returncode:
+    sys.exit(f"{sim} build failed, see {log}")
+  return build, time.monotonic() - start
+
+def run_shard(name, tests, sim, toplevel, build, extra_args):
+  shard_dir = os.path.join(BUILD_DIR, sim, toplevel, name)
+  if build is None:
+    build = shard_dir
+  os.makedirs(os.path.join(TESTBENCH_DIR, shard_dir), exist_ok=True)
+  results = os.path.join(TESTBENCH_DIR, shard_dir, "results.xml")
+  log = os.path.join(TESTBENCH_DIR, shard_dir, "sim.log")
+
+  cmd = ["make", "-f", "testbench.mk",
+         f"SIM={sim}",
+         f"TOPLEVEL={toplevel}",
+         f"SIM_BUILD={build}",
+         f"TESTCASE={','.join(tests)}",
+         f"COCOTB_RESULTS_FILE={results}"] + extra_args
+
+  start = time.monotonic()
+  with open(log, "w") as fh:
+    returncode = subprocess.run(cmd, cwd=TESTBENCH_DIR, stdout=fh, stderr=subprocess.STDOUT).returncode
+  wall = time.monotonic() - start
+  return name, tests, returncode, wall, results, log
+
+def merge_results(shards, filename):
+  merged = ET.Element("testsuites", name="results")
+  suite = ET.SubElement(merged, "testsuite", name="all")
+  outcomes = {}
+
+  for name, tests, returncode, wall, results, log in shards:
+    found = set()
+    if os.path.exists(results):
+      for testcase in ET.parse(results).getroot().iter("testcase"):
+        suite.append(testcase)
+        failed = testcase.find("failure") is not None or testcase.find("error") is not None
+        outcomes[testcase.get("name")] = (not failed, float(testcase.get("sim_time_ns", 0)))
+        found.add(testcase.get("name"))
+
+    # A simulator that crashed before writing results still has to fail
+    for test in tests:
+      if test not in found:
+        testcase = ET.SubElement(suite, "testcase", name=test, classname=TEST_MODULE)
+        ET.SubElement(testcase, "error", message=f"no result, see {log}")
+        outcomes[test] = (False, 0.0)
+
+  ET.ElementTree(merged).write(filename)
+  return outcomes
+
+def report(shards, outcomes, wall):
+  print()
+  print(f"{'Test':<32}{'Result':<8}{'Sim time (ms)':>16}{'Wall time (s)':>16}")
+  for name, tests, returncode, shard_wall, results, log in shards:
+    for test in tests:
+      passed, sim_time = outcomes[test]
+      wall_text = f"{shard_wall:.2f}" if len(tests) == 1 else f"{shard_wall:.2f} ({name})"
+      print(f"{test:<32}{'PASS' if passed else 'FAIL':<8}{sim_time / 1e6:>16.3f}{wall_text:>16}")
+
+  serial = sum(shard[3] for shard in shards)
+  print()
+  print(f"Total wall time {wall:.2f} s, {serial:.2f} s if run serially")
+
+def run_regression(sim, tests, args):
+  extra_args = list(args.make_args)
+  # Parallel Verilator runs would all trace to the same dump file, and
+  # tracing would skew a speed comparison
+  if (shared_build(sim) or args.compare) and not any(arg.startswith("WAVES=") for arg in extra_args):
+    extra_args.append("WAVES=0")
+
+  build, build_wall = None, 0.0
+  if shared_build(sim):
+    build, build_wall = build_model(sim, args.toplevel, extra_args)
+    print(f"Built {sim} model in {build_wall:.2f} s")
+
+  groups = [tests[i:i + args.group] for i in range(0, len(tests), args.group)]
+  names = [group[0] if len(group) == 1 else f"group{i}" for i, group in enumerate(groups)]
+
+  start = time.monotonic()
+  with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    futures = [pool.submit(run_shard, name, group, sim, args.toplevel, build, extra_args)
+               for name, group in zip(names, groups)]
+    shards = [future.result() for future in futures]
+  wall = time.monotonic() - start
+
+  results = args.results if len(args.sims) == 1 else f"{sim}_{args.results}"
+  outcomes = merge_results(shards, os.path.join(TESTBENCH_DIR, results))
+  report(shards, outcomes, wall)
+  return shards, outcomes, build_wall
+
+# Markdown table of per-test wall time under each simulator
+def compare(runs, filename):
+  icarus, verilator = (runs[sim] for sim in SIMULATORS)
+  walls = {sim: {test: shard[3] for shard in runs[sim][0] for test in shard[1]} for sim in SIMULATORS}
+  lines = [
+    "| Test | Sim time (ms) | Icarus (s) | Verilator (s) | Speedup |",
+    "| --- | ---: | ---: | ---: | ---: |",
+  ]
+  for test in walls["icarus"]:
+    sim_time = icarus[1][test][1]
+    speedup = walls["icarus"][test] / walls["verilator"][test] if walls["verilator"][test] else 0
+    lines.append(f"| {test} | {sim_time / 1e6:.3f} | {walls['icarus'][test]:.2f} | {walls['verilator'][test]:.2f} | {speedup:.1f}x |")
+  lines.append("")
+  lines.append(f"Verilator build {verilator[2]:.2f} s, shared by every test.")
+
+  with open(filename, "w") as fh:
+    fh.write("\n".join(lines) + "\n")
+  print()
+  print("\n".join(lines))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Run the cocotb regression in parallel")
+
+  parser.add_argument('-j', '--jobs', help="simulators to run at once", type=int, default=os.cpu_count())
+  parser.add_argument('--tests', help="comma separated tests to run, default all")
+  parser.add_argument('--group', help="tests per simulator process", type=int, default=1)
+  parser.add_argument('--toplevel', help="BobTop or BobBypassTop", default="BobTop")
+  parser.add_argument('--sim', help="simulator", choices=SIMULATORS, default="icarus")
+  parser.add_argument('--compare', help="run under both simulators and write a speed table", metavar="FILE",
+                      nargs='?', const="sim_speed.md")
+  parser.add_argument('--results', help="merged results file", default="results.xml")
+  parser.add_argument('--perf', help="record test speed and fail on a slowdown, see perf.py", action='store_true')
+  parser.add_argument('make_args', nargs='*', help="extra make variables, e.g. WAVES=0")
+
+  args = parser.parse_args()
+
+  tests = args.tests.split(',') if args.tests else find_tests(TEST_MODULE)
+  args.sims = SIMULATORS if args.compare else (args.sim,)
+  if args.perf:
+    # Every shard of this regression shares one run in the history
+    args.run = time.strftime("%Y%m%d-%H%M%S")
+    args.make_args += ["PERF=1", f"PERF_RUN={args.run}"]
+
+  runs = {}
+  for sim in args.sims:
+    print(f"Running {len(tests)} tests under {sim}")
+    runs[sim] = run_regression(sim, tests, args)
+  if args.compare:
+    compare(runs, os.path.join(TESTBENCH_DIR, args.compare))
+
+  slower = []
+  if args.perf and os.path.exists(perf.HISTORY):
+    print()
+    rows = perf.compare(perf.load(perf.HISTORY), run=args.run)
+    perf.report(rows, os.path.join(TESTBENCH_DIR, perf.REPORT))
+    slower = [row["entry"]["test"] for row in rows if row["regressed"]]
+    if slower:
+      print(f"Slower than baseline: {', '.join(slower)}")
+
+  sys.exit(0 if all(passed for run in runs.values() for passed, sim_time in run[1].values()) and not slower else 1)
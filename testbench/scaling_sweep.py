@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import argparse
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Sweeps Bob's ID_WIDTH, QUEUE_DEPTH and RUNWAYS parameters. Every point is
+# synthesized with yosys for its cell count, flip-flops and logic depth, the
+# longest path through the netlist in cells, which stands in for the critical
+# path when there is no liberty file to time against. With --liberty the
+# netlist is mapped to that library and its area is reported too. Each point
+# is then simulated with scaling_test for the request rate and reply latency
+# the design sustains in its own packet format.
+#
+#   python3 scaling_sweep.py --id-widths 4,5,6 --depths 8,16 --runways 2,4
+#   python3 scaling_sweep.py --id-widths 4,8 --no-sim --max-cells 5000
+#   YOSYS=yowasp-yosys python3 scaling_sweep.py --no-abc --toplevel BobBypassTop
+
+TESTBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOB_V = os.path.join(os.path.dirname(TESTBENCH_DIR), "src", "Bob.v")
+BUILD_DIR = "sim_build/scaling"
+TESTCASE = "scaling_test"
+
+YOSYS = os.environ.get("YOSYS", "yosys")
+
+def int_list(text):
+  return [int(item) for item in text.split(",") if item]
+
+def packet_bytes(id_width, runways):
+  action_width = max(1, (runways - 1).bit_length())
+  return (id_width + 3 + action_width + 7) // 8
+
+# yosys writes its reports into point_dir, given as relative paths so that
+# yowasp-yosys, which only sees the directory it runs in, can write them
+def synthesize(point_dir, id_width, depth, runways, liberty, abc):
+  commands = [
+    f"read_verilog {BOB_V}",
+    f"chparam -set ID_WIDTH {id_width} -set QUEUE_DEPTH {depth} -set RUNWAYS {runways} Bob",
+    "synth -flatten -top Bob" + ("" if abc else " -noabc"),
+  ]
+  if liberty:
+    commands += [f"dfflibmap -liberty {liberty}", f"abc -liberty {liberty}", "opt_clean",
+                 f"tee -q -o stat.json stat -json -liberty {liberty}"]
+  else:
+    commands += ["tee -q -o stat.json stat -json"]
+  commands += ["tee -q -o ltp.txt ltp -noff"]
+
+  with open(os.path.join(point_dir, "synth.log"), "w") as fh:
+    if subprocess.run([YOSYS, "-p", "; ".join(commands)], cwd=point_dir, stdout=fh,
+                      stderr=subprocess.STDOUT).returncode:
+      return None
+
+  with open(os.path.join(point_dir, "stat.json")) as fh:
+    stat = next(iter(json.load(fh)["modules"].values()))
+  with open(os.path.join(point_dir, "ltp.txt")) as fh:
+    depth_match = re.search(r"length=(\d+)", fh.read())
+  cells = stat["num_cells_by_type"]
+  return {
+    "cells": stat["num_cells"],
+    "flip_flops": sum(count for cell, count in cells.items() if "DFF" in cell.upper()),
+    "area": stat.get("area"),
+    "logic_depth": int(depth_match.group(1)) if depth_match else None,
+  }
+
+def simulate(point_dir, sim, toplevel, id_width, depth, runways, packets):
+  result = os.path.join(point_dir, "scaling.json")
+  if os.path.exists(result):
+    os.remove(result)
+
+  cmd = ["make", "-f", "testbench.mk",
+         f"SIM={sim}", f"TOPLEVEL={toplevel}", "WAVES=0",
+         f"SIM_BUILD={os.path.relpath(os.path.join(point_dir, 'sim'), TESTBENCH_DIR)}",
+         f"TESTCASE={TESTCASE}",
+         f"COCOTB_RESULTS_FILE={os.path.join(point_dir, 'results.xml')}",
+         f"ID_WIDTH={id_width}", f"QUEUE_DEPTH={depth}", f"RUNWAYS={runways}",
+         f"SCALING_PACKETS={packets}", f"SCALING_RESULT={result}"]
+  with open(os.path.join(point_dir, "sim.log"), "w") as fh:
+    subprocess.run(cmd, cwd=TESTBENCH_DIR, stdout=fh, stderr=subprocess.STDOUT)
+
+  if not os.path.exists(result):
+    return None
+  with open(result) as fh:
+    return json.load(fh)
+
+def run_point(args, id_width, depth, runways):
+  point_dir = os.path.join(TESTBENCH_DIR, BUILD_DIR, f"{id_width}_{depth}_{runways}")
+  os.makedirs(point_dir, exist_ok=True)
+  synth = synthesize(point_dir, id_width, depth, runways, args.liberty, not args.no_abc)
+  sim = None if args.no_sim else simulate(point_dir, args.sim, args.toplevel, id_width, depth, runways,
+                                          args.packets)
+  return synth, sim
+
+def cell(value, fmt="{}"):
+  return "" if value is None else fmt.format(value)
+
+def report(rows, max_cells, filename):
+  lines = [
+    "| ID width | Queue depth | Runways | Packet bytes | Cells | Flip-flops | Area | Logic depth | Packets/s | Mean latency (us) | Fits |",
+    "| ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | :---: |",
+  ]
+  for id_width, depth, runways, synth, sim in rows:
+    prefix = f"| {id_width} | {depth} | {runways} | {packet_bytes(id_width, runways)} |"
+    if synth is None:
+      lines.append(prefix + " synthesis failed |  |  |  |  |  |  |")
+      continue
+    rate = cell(sim and sim["packet_rate"], "{:.0f}")
+    latency = cell(sim and sim["mean_latency"] / 1e3, "{:.1f}")
+    fits = "" if not max_cells else ("yes" if synth["cells"] <= max_cells else "no")
+    lines.append(prefix + f" {synth['cells']} | {synth['flip_flops']} | {cell(synth['area'], '{:.0f}')} |"
+                 f" {cell(synth['logic_depth'])} | {rate} | {latency} | {fits} |")
+
+  with open(filename, "w") as fh:
+    fh.write("\n".join(lines) + "\n")
+  print("\n".join(lines))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Sweep Bob's ID width, queue depth and runway count")
+
+  parser.add_argument('--id-widths', help="comma separated ID_WIDTH values", type=int_list, default=[4, 5, 6])
+  parser.add_argument('--depths', help="comma separated QUEUE_DEPTH values, powers of two", type=int_list,
+                      default=[8, 16])
+  parser.add_argument('--runways', help="comma separated RUNWAYS values", type=int_list, default=[2, 4])
+  parser.add_argument('--liberty', help="map to this liberty file and report its area")
+  parser.add_argument('--max-cells', help="mark the points that fit in this many cells", type=int, default=0)
+  parser.add_argument('--no-abc', help="skip ABC, for yosys builds without it", action='store_true')
+  parser.add_argument('--no-sim', help="synthesize only", action='store_true')
+  parser.add_argument('--packets', help="requests scaling_test sends at each point", type=int, default=100)
+  parser.add_argument('--sim', help="simulator", choices=("icarus", "verilator"), default="icarus")
+  parser.add_argument('--toplevel', help="BobTop or BobBypassTop", default="BobTop")
+  parser.add_argument('-j', '--jobs', help="points to run at once", type=int, default=os.cpu_count())
+  parser.add_argument('--output', help="Markdown table to write", default="scaling_sweep.md")
+
+  args = parser.parse_args()
+  if args.liberty:
+    args.liberty = os.path.abspath(args.liberty)
+
+  # FIFO's pointers wrap by overflowing, which needs a power of two depth
+  depths = []
+  for depth in args.depths:
+    if depth < 2 or depth & (depth - 1):
+      print(f"Skipping QUEUE_DEPTH={depth}, FIFO needs a power of two")
+    else:
+      depths.append(depth)
+  points = list(itertools.product(args.id_widths, depths, args.runways))
+
+  with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    results = list(pool.map(lambda point: run_point(args, *point), points))
+  rows = [point + result for point, result in zip(points, results)]
+
+  print()
+  report(rows, args.max_cells, os.path.join(TESTBENCH_DIR, args.output))
+  with open(os.path.join(TESTBENCH_DIR, os.path.splitext(args.output)[0] + ".json"), "w") as fh:
+    json.dump([{"id_width": id_width, "queue_depth": depth, "runways": runways, "synth": synth, "sim": sim}
+               for id_width, depth, runways, synth, sim in rows], fh, indent=1)
+  sys.exit(0 if rows and all(synth for *_, synth, sim in rows) else 1)
@@ -1,7 +1,75 @@
 TOPLEVEL_LANG = verilog
-VERILOG_SOURCES = $(shell pwd)/Bob.v
-TOPLEVEL = BobTop
+VERILOG_SOURCES = $(shell pwd)/Bob.v $(shell pwd)/BobBypass.v
+# TOPLEVEL=BobBypassTop drives Bob's byte interface directly, skipping the
+# UART serial path, e.g. make -f testbench.mk TOPLEVEL=BobBypassTop
+TOPLEVEL ?= BobTop
 MODULE = Bob_test_with_UART
-SIM=icarus 
-WAVES=1
-include $(shell cocotb-config --makefiles)/Makefile.sim
\ No newline at end of file
+# bobATC_model.py lives at the top of the repo
+export PYTHONPATH := $(shell pwd)/..:$(PYTHONPATH)
+# SIM=verilator compiles the design to C++ once, which pays off on long
+# runs, e.g. make -f testbench.mk SIM=verilator WAVES=0
+SIM ?= icarus
+# TRACE=1 keeps its own short windows of a few signals, see tracer.py, so it
+# turns the full dump off unless WAVES is given
+WAVES ?= $(if $(filter 1,$(TRACE)),0,1)
+# BobTop's clock and baud rate parameters, the tests read them too, e.g.
+# make -f testbench.mk CLK_HZ=12000000 BAUD_RATE=9600, see baud_sweep.py
+CLK_HZ ?= 25000000
+BAUD_RATE ?= 115200
+export CLK_HZ BAUD_RATE
+# Clocks per bit on BobTop's baud_divisor pins, picked at run time so every
+# value shares one build, e.g. BAUD_DIVISOR=27 for 921600 baud at 25 MHz.
+# Values below 16 keep BAUD_RATE.
+BAUD_DIVISOR ?= 0
+export BAUD_DIVISOR
+# Bob's size parameters on either toplevel, e.g. make -f testbench.mk
+# ID_WIDTH=6 QUEUE_DEPTH=16 RUNWAYS=4 TESTCASE=scaling_test, see scaling_sweep.py.
+# Only scaling_test speaks packets other than the default 4/8/2 ones.
+# REPLY_DEPTH=4 gives the reply FIFO of earlier builds, see divert_drain_test
+ID_WIDTH ?= 4
+QUEUE_DEPTH ?= 8
+RUNWAYS ?= 2
+REPLY_DEPTH ?= $(QUEUE_DEPTH)
+export ID_WIDTH QUEUE_DEPTH RUNWAYS REPLY_DEPTH
+# FIFO's pointers wrap at $clog2(DEPTH) bits, so any other depth corrupts
+# the queue instead of failing to build
+POWERS_OF_TWO = 1 2 4 8 16 32 64 128 256 512 1024
+ifeq ($(filter $(QUEUE_DEPTH),$(POWERS_OF_TWO)),)
+$(error QUEUE_DEPTH=$(QUEUE_DEPTH) is not a power of two)
+endif
+ifeq ($(filter $(REPLY_DEPTH),$(POWERS_OF_TWO)),)
+$(error REPLY_DEPTH=$(REPLY_DEPTH) is not a power of two)
+endif
+# One build per simulator, toplevel, waves, clock and size setting, so
+# switching between them reuses the model that is already compiled
+SIM_BUILD ?= sim_build/$(SIM)/$(TOPLEVEL)$(if $(filter-out 25000000_115200,$(CLK_HZ)_$(BAUD_RATE)),_$(CLK_HZ)_$(BAUD_RATE))$(if $(filter-out 4_8_2_8,$(ID_WIDTH)_$(QUEUE_DEPTH)_$(RUNWAYS)_$(REPLY_DEPTH)),_$(ID_WIDTH)_$(QUEUE_DEPTH)_$(RUNWAYS)_$(REPLY_DEPTH))$(if $(filter 1,$(WAVES)),_waves)
+
+ifeq ($(SIM),verilator)
+COMPILE_ARGS += -GID_WIDTH=$(ID_WIDTH) -GQUEUE_DEPTH=$(QUEUE_DEPTH) -GRUNWAYS=$(RUNWAYS) -GREPLY_DEPTH=$(REPLY_DEPTH)
+else
+COMPILE_ARGS += -P$(TOPLEVEL).ID_WIDTH=$(ID_WIDTH) -P$(TOPLEVEL).QUEUE_DEPTH=$(QUEUE_DEPTH) -P$(TOPLEVEL).RUNWAYS=$(RUNWAYS) -P$(TOPLEVEL).REPLY_DEPTH=$(REPLY_DEPTH)
+endif
+
+ifeq ($(TOPLEVEL),BobTop)
+ifeq ($(SIM),verilator)
+COMPILE_ARGS += -GCLK_HZ=$(CLK_HZ) -GBAUD_RATE=$(BAUD_RATE)
+else
+COMPILE_ARGS += -P$(TOPLEVEL).CLK_HZ=$(CLK_HZ) -P$(TOPLEVEL).BAUD_RATE=$(BAUD_RATE)
+endif
+endif
+
+ifeq ($(SIM),verilator)
+# sv2v output has width and unused signal warnings that do not matter here
+COMPILE_ARGS += -Wno-fatal -Wno-WIDTH -Wno-UNUSED -Wno-CASEINCOMPLETE
+endif
+
+include $(shell cocotb-config --makefiles)/Makefile.sim
+
+# Compiles the model without running any tests, regression.py uses this to
+# build once before starting several Verilator runs on the same model
+ifeq ($(SIM),verilator)
+build: $(SIM_BUILD)/Vtop
+else
+build: $(SIM_BUILD)/sim.vvp
+endif
+.PHONY: build
@@ -0,0 +1,160 @@
+import functools
+import os
+import shutil
+import subprocess
+from collections import deque
+
+import cocotb
+from cocotb.triggers import *
+from cocotb.utils import get_sim_time
+
+# Windowed waveform capture driven from cocotb, for runs where WAVES=1 would
+# dump gigabytes. WaveTracer records value changes of an allow-list of
+# signals under bobby into a ring buffer that only holds the last two
+# windows, and writes a VCD of the window around a trigger signal rising or
+# around an assertion failure. Memory and disk use stay the same however
+# long the test runs. Windows are converted to FST when vcd2fst is on the
+# PATH.
+#
+#   make -f testbench.mk TRACE=1 TRACE_ON=send_divert,takeoff_fifo_full
+
+TRACE = os.environ.get("TRACE", "0") == "1"
+
+DEFAULT_SIGNALS = [
+  "uart_rx_valid", "uart_rx_data", "uart_tx_send", "uart_tx_data",
+  "fsm.state", "all_id", "runway", "emergency",
+  "takeoff_fifo.count", "landing_fifo.count", "reply_fifo_full",
+  "send_hold", "send_divert", "send_clear",
+]
+
+# ns of history before a trigger, and of recording after it
+DEFAULT_WINDOW = 200000
+DEFAULT_MAX_WINDOWS = 10
+TRACE_DIR = "traces"
+
+def env_list(name, default):
+  value = os.environ.get(name)
+  return default if value is None else [item for item in value.split(",") if item]
+
+def resolve(root, path):
+  handle = root
+  for name in path.split("."):
+    handle = getattr(handle, name)
+  return handle
+
+class WaveTracer:
+  def __init__(self, root, signals, window=DEFAULT_WINDOW, max_windows=DEFAULT_MAX_WINDOWS, name="trace"):
+    self.root = root
+    self.handles = {signal: resolve(root, signal) for signal in signals}
+    self.window = window
+    self.max_windows = max_windows
+    self.name = name
+    # (time, signal, value) changes since baseline
+    self.ring = deque()
+    self.baseline = {}
+    self.windows = 0
+    self.tasks = []
+
+  def start(self, triggers=()):
+    for signal, handle in self.handles.items():
+      self.baseline[signal] = handle.value.binstr
+      self.tasks.append(cocotb.start_soon(self.watch(signal, handle)))
+    for trigger in triggers:
+      self.tasks.append(cocotb.start_soon(self.trigger_on(trigger)))
+
+  def stop(self):
+    for task in self.tasks:
+      task.kill()
+    self.tasks = []
+
+  async def watch(self, signal, handle):
+    while True:
+      await Edge(handle)
+      now = get_sim_time(units="ns")
+      self.ring.append((now, signal, handle.value.binstr))
+      # Two windows of history, so a window that opened one window ago can
+      # still be written in full when it closes
+      while self.ring and self.ring[0][0] < now - 2 * self.window:
+        time, old_signal, value = self.ring.popleft()
+        self.baseline[old_signal] = value
+
+  async def trigger_on(self, trigger):
+    handle = resolve(self.root, trigger)
+    while self.windows < self.max_windows:
+      await RisingEdge(handle)
+      at = get_sim_time(units="ns")
+      self.windows += 1
+      await Timer(self.window, units="ns", round_mode="round")
+      self.write(trigger, at - self.window, at + self.window)
+
+  # Writes whatever is buffered up to now, for failures
+  def dump(self, reason):
+    now = get_sim_time(units="ns")
+    return self.write(reason, now - self.window, now)
+
+  def write(self, reason, start, end):
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    filename = os.path.join(TRACE_DIR, f"{self.name}_{int(start)}_{reason.replace('.', '_')}.vcd")
+
+    values = dict(self.baseline)
+    changes = []
+    for time, signal, value in self.ring:
+      if time < start:
+        values[signal] = value
+      elif time <= end:
+        changes.append((time, signal, value))
+
+    codes = {signal: chr(33 + i) for i, signal in enumerate(self.handles)}
+    with open(filename, "w") as fh:
+      fh.write(f"$comment {reason} window of {self.name} $end\n$timescale 1ns $end\n$scope module bobby $end\n")
+      for signal, code in codes.items():
+        fh.write(f"$var wire {len(values[signal])} {code} {signal.replace('.', '_')} $end\n")
+      fh.write("$upscope $end\n$enddefinitions $end\n")
+      fh.write(f"#{int(start)}\n$dumpvars\n")
+      for signal, code in codes.items():
+        fh.write(vcd_value(values[signal], code))
+      fh.write("$end\n")
+      last = None
+      for time, signal, value in changes:
+        if time != last:
+          fh.write(f"#{int(time)}\n")
+          last = time
+        fh.write(vcd_value(value, codes[signal]))
+      fh.write(f"#{int(end)}\n")
+
+    if shutil.which("vcd2fst"):
+      fst = filename[:-len(".vcd")] + ".fst"
+      if subprocess.run(["vcd2fst", filename, fst], capture_output=True).returncode == 0:
+        os.remove(filename)
+        filename = fst
+    print(f"TB      : Wrote {reason} trace window to {filename}")
+    return filename
+
+def vcd_value(value, code):
+  value = value.lower()
+  if len(value) == 1:
+    return f"{value}{code}\n"
+  return f"b{value} {code}\n"
+
+# Wraps a test so that with TRACE=1 it records a WaveTracer on dut.bobby,
+# set up from TRACE_SIGNALS, TRACE_ON, TRACE_WINDOW and TRACE_MAX_WINDOWS,
+# and writes the last window when the test fails
+def traced(test):
+  @functools.wraps(test)
+  async def run(dut):
+    if not TRACE:
+      return await test(dut)
+
+    tracer = WaveTracer(dut.bobby, env_list("TRACE_SIGNALS", DEFAULT_SIGNALS),
+                        int(os.environ.get("TRACE_WINDOW", DEFAULT_WINDOW)),
+                        int(os.environ.get("TRACE_MAX_WINDOWS", DEFAULT_MAX_WINDOWS)),
+                        test.__name__)
+    tracer.start(env_list("TRACE_ON", []))
+    try:
+      return await test(dut)
+    except BaseException:
+      tracer.dump("failure")
+      raise
+    finally:
+      tracer.stop()
+  return run
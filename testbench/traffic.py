@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+
+from bobATC_codec import *
+
+# Seeded random traffic for Bob. TrafficGenerator picks the next packet from
+# the state of a BobModel that tracks the DUT, so requests are mostly ones a
+# real plane could make, in the model's packet format. TrafficStats collects
+# reply latency and throughput while the testbench plays the packets.
+
+# Poisson arrival rate of each kind of packet, in packets per simulated second
+DEFAULT_RATES = {
+  "id_please": 400,
+  "takeoff":   250,
+  "landing":   250,
+  "declare":   400,
+  "emergency":   5,
+  "resolve":    25,
+  "invalid":    10,
+}
+
+class TrafficGenerator:
+  def __init__(self, model, seed=0, rates=None, back_to_back=False):
+    self.model = model
+    self.format = model.format
+    self.rng = random.Random(seed)
+    self.rates = dict(DEFAULT_RATES if rates is None else rates)
+    self.kinds = [kind for kind in self.rates if self.rates[kind] > 0]
+    self.weights = [self.rates[kind] for kind in self.kinds]
+    self.total_rate = sum(self.weights)
+    self.back_to_back = back_to_back
+
+  # Idle time before the next packet in ns
+  def next_gap(self):
+    if self.back_to_back:
+      return 0
+    return self.rng.expovariate(self.total_rate) * 1e9
+
+  def live_ids(self):
+    all_id = self.model.all_id
+    return [i for i in range(self.format.ids) if all_id >> i & 1]
+
+  def cleared_ids(self):
+    return self.model.cleared_ids()
+
+  def idle_ids(self):
+    busy = set(self.model.takeoff_fifo.queue) | set(self.model.landing_fifo.queue) | set(self.cleared_ids())
+    return [i for i in self.live_ids() if i not in busy]
+
+  # Returns (kind, packet), falling back to an ID request when the chosen
+  # kind has no plane that could send it
+  def next_packet(self):
+    kind = self.rng.choices(self.kinds, self.weights)[0]
+    encode = self.format.encode
+
+    if kind in ("takeoff", "landing"):
+      idle = self.idle_ids()
+      if idle:
+        action = R_TAKEOFF if kind == "takeoff" else R_LANDING
+        return kind, encode(self.rng.choice(idle), T_REQUEST, action)
+
+    elif kind == "declare":
+      cleared = self.cleared_ids()
+      if cleared:
+        id = self.rng.choice(list(cleared))
+        return kind, encode(id, T_DECLARE, cleared[id])
+
+    elif kind == "emergency":
+      live = self.live_ids()
+      if live and not self.model.emergency:
+        return kind, encode(self.rng.choice(live), T_EMERGENCY, E_DECLARE)
+
+    elif kind == "resolve":
+      if self.model.emergency_reg:
+        return kind, encode(self.model.emergency_id, T_EMERGENCY, E_RESOLVE)
+
+    elif kind == "invalid":
+      # SAY_AGAIN with the action bit set is a status query, whose reply
+      # FIFO high-water mark the model cannot predict
+      type = self.rng.choice([T_CLEAR, T_HOLD, T_SAY_AGAIN, T_DIVERT])
+      action = 0 if type == T_SAY_AGAIN else self.rng.randrange(2)
+      return kind, encode(self.rng.randrange(self.format.ids), type, action)
+
+    return "id_please", encode(0, T_ID_PLEASE, 0)
+
+class TrafficStats:
+  def __init__(self):
+    self.latency = {}
+    self.packets = 0
+    self.replies = 0
+    self.sim_start = None
+    self.sim_end = None
+    self.wall_start = time.perf_counter()
+    self.wall_end = None
+
+  def start(self, sim_time):
+    self.sim_start = sim_time
+    self.wall_start = time.perf_counter()
+
+  def record(self, kind, latencies):
+    self.packets += 1
+    self.replies += len(latencies)
+    if latencies:
+      self.latency.setdefault(kind, []).append(latencies[0])
+
+  def stop(self, sim_time):
+    self.sim_end = sim_time
+    self.wall_end = time.perf_counter()
+
+  def summary(self):
+    sim_seconds = (self.sim_end - self.sim_start) / 1e9
+    wall_seconds = self.wall_end - self.wall_start
+    lines = [
+      f"{'Kind':<12}{'Count':>8}{'Mean (ns)':>12}{'p50 (ns)':>12}{'p99 (ns)':>12}{'Max (ns)':>12}",
+    ]
+    for kind, samples in sorted(self.latency.items()):
+      samples = sorted(samples)
+      p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+      lines.append(f"{kind:<12}{len(samples):>8}{statistics.mean(samples):>12.0f}"
+                   f"{statistics.median(samples):>12.0f}{p99:>12.0f}{samples[-1]:>12.0f}")
+    lines.append("")
+    lines.append(f"{self.packets} requests and {self.replies} replies in {sim_seconds * 1e3:.3f} ms simulated, "
+                 f"{wall_seconds:.2f} s wall")
+    if sim_seconds > 0:
+      lines.append(f"Sustained {self.packets / sim_seconds:.0f} requests/s simulated, "
+                   f"{self.packets / wall_seconds:.0f} requests/s wall")
+    return "\n".join(lines)
@@ -0,0 +1,153 @@
+import cocotb
+from cocotb.triggers import *
+from cocotb.queue import Queue
+from cocotb.utils import get_sim_time
+from cocotb.result import SimTimeoutError
+
+# Bit-level UART components for the testbench. Both sides wait on Timer and
+# edge triggers only, so a byte costs about a dozen scheduler wakeups instead
+# of one per clock edge. Drivers record done_time, when Bob sees the byte,
+# and monitors queue (start time, byte) pairs so latency can be measured.
+
+class UartDriver:
+  # idle_bits adds idle line time after each stop bit
+  def __init__(self, rx, period, idle_bits=0):
+    self.rx = rx
+    self.period = period
+    self.idle_bits = idle_bits
+    self.done_time = None
+    self.rx.value = 1
+
+  async def bit(self, value):
+    self.rx.value = value
+    await Timer(self.period, units="ns", round_mode="round")
+
+  async def write(self, data):
+    await self.bit(0)
+    for i in range(8):
+      await self.bit((data >> i) & 1)
+    # UartRX flags the byte as done when it samples the stop bit
+    self.done_time = get_sim_time(units="ns") + self.period / 2
+    await self.bit(1)
+    if self.idle_bits:
+      await Timer(self.idle_bits * self.period, units="ns", round_mode="round")
+
+class UartMonitor:
+  def __init__(self, tx, period):
+    self.tx = tx
+    self.period = period
+    self.queue = Queue()
+    self.framing_errors = 0
+    self.task = None
+
+  def start(self):
+    self.task = cocotb.start_soon(self.run())
+
+  def stop(self):
+    if self.task is not None:
+      self.task.kill()
+      self.task = None
+
+  async def run(self):
+    while True:
+      await FallingEdge(self.tx)
+      start = get_sim_time(units="ns")
+
+      # Sample the middle of the start bit, a glitch is a spurious start
+      await Timer(self.period / 2, units="ns", round_mode="round")
+      if self.tx.value != 0:
+        continue
+
+      data = 0
+      for i in range(8):
+        await Timer(self.period, units="ns", round_mode="round")
+        data |= int(self.tx.value) << i
+
+      await Timer(self.period, units="ns", round_mode="round")
+      if self.tx.value != 1:
+        self.framing_errors += 1
+
+      self.queue.put_nowait((start, data))
+
+  # read() returns the oldest byte not read yet, which may have arrived long
+  # before the call. Tests that leave replies unread drain() them at the end
+  # of the exchange so a later read() does not return them.
+  async def read_timed(self, timeout):
+    return await with_timeout(self.queue.get(), timeout, "ns", round_mode="round")
+
+  async def read(self, timeout):
+    return (await self.read_timed(timeout))[1]
+
+  # Reads until nothing arrives for quiet ns and returns what was read
+  async def drain(self, quiet):
+    drained = []
+    while True:
+      try:
+        drained.append(await self.read_timed(quiet))
+      except SimTimeoutError:
+        return drained
+
+# Byte-level stand-ins for the two classes above, used with BobBypassTop
+# where the testbench talks to Bob's uart_rx_*/uart_tx_* ports directly.
+
+class BypassDriver:
+  # gap leaves ReadRequestFsm time to finish a request before the next one,
+  # the worst case is an emergency diverting a full landing_fifo
+  def __init__(self, dut, gap=32):
+    self.dut = dut
+    self.gap = gap
+    self.done_time = None
+    self.dut.uart_rx_valid.value = 0
+
+  async def write(self, data):
+    await FallingEdge(self.dut.clock)
+    self.dut.uart_rx_data.value = data
+    self.dut.uart_rx_valid.value = 1
+    await FallingEdge(self.dut.clock)
+    self.done_time = get_sim_time(units="ns")
+    self.dut.uart_rx_valid.value = 0
+    await ClockCycles(self.dut.clock, self.gap, rising=False)
+
+class BypassMonitor:
+  # busy_cycles holds uart_tx_ready low after each reply to mimic UartTX,
+  # 0 lets replies leave as fast as SendReplyFsm can send them
+  def __init__(self, dut, busy_cycles=0):
+    self.dut = dut
+    self.busy_cycles = busy_cycles
+    self.queue = Queue()
+    self.framing_errors = 0
+    self.task = None
+    self.dut.uart_tx_ready.value = 1
+
+  def start(self):
+    self.task = cocotb.start_soon(self.run())
+
+  def stop(self):
+    if self.task is not None:
+      self.task.kill()
+      self.task = None
+
+  async def run(self):
+    while True:
+      await RisingEdge(self.dut.uart_tx_send)
+      await ReadOnly()
+      self.queue.put_nowait((get_sim_time(units="ns"), int(self.dut.uart_tx_data.value)))
+      if self.busy_cycles:
+        await FallingEdge(self.dut.clock)
+        self.dut.uart_tx_ready.value = 0
+        await ClockCycles(self.dut.clock, self.busy_cycles, rising=False)
+        self.dut.uart_tx_ready.value = 1
+
+  async def read_timed(self, timeout):
+    return await with_timeout(self.queue.get(), timeout, "ns", round_mode="round")
+
+  async def read(self, timeout):
+    return (await self.read_timed(timeout))[1]
+
+  async def drain(self, quiet):
+    drained = []
+    while True:
+      try:
+        drained.append(await self.read_timed(quiet))
+      except SimTimeoutError:
+        return drained